@@ -3,12 +3,18 @@
 import os
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QFileDialog,
-    QVBoxLayout, QHBoxLayout, QMessageBox, QCheckBox, QSizePolicy
+    QVBoxLayout, QHBoxLayout, QMessageBox, QCheckBox, QSizePolicy,
+    QTableView, QHeaderView, QAbstractItemView
 )
 from PyQt5.QtGui import QFont, QColor, QPalette
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
-from .worker import WorkerThread  # Ensure WorkerThread is correctly imported
+from .worker import ExportWorker, WarmupThread, WorkerThread  # Ensure WorkerThread is correctly imported
+from .results_model import ResultsTableModel
+from processing.journal import count_journaled_rows, run_fingerprint
+from processing.results import OUTPUT_COLUMNS
+from config.settings import CATALOG_PATH
+from utils.writers import OUTPUT_EXTENSIONS
 
 class App(QWidget):
     def __init__(self):
@@ -28,6 +34,7 @@ class App(QWidget):
         # In-Memory Storage for Categorized Products and Results
         self.categorized_df = None
         self.results_df = None
+        self.export_worker = None
 
         self.initUI()
 
@@ -94,7 +101,32 @@ class App(QWidget):
             }
         """)
         self.process_btn.clicked.connect(self.process_files)
-        main_layout.addWidget(self.process_btn)
+
+        # Cancel Button
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setFont(QFont('Arial', 12, QFont.Bold))
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #f44336; 
+                color: white; 
+                padding: 10px; 
+                border: none; 
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #da190b;
+            }
+            QPushButton:disabled {
+                background-color: #e0a8a4;
+            }
+        """)
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        self.cancel_btn.setEnabled(False)
+
+        process_layout = QHBoxLayout()
+        process_layout.addWidget(self.process_btn, stretch=3)
+        process_layout.addWidget(self.cancel_btn, stretch=1)
+        main_layout.addLayout(process_layout)
 
         # Download Button
         self.download_btn = QPushButton("Download Output")
@@ -120,13 +152,36 @@ class App(QWidget):
         self.status_label.setFont(QFont('Arial', 10))
         main_layout.addWidget(self.status_label)
 
+        # Results Table, filled in as rows finish
+        self.results_model = ResultsTableModel(self)
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_model)
+        self.results_view.setSortingEnabled(True)
+        self.results_view.setWordWrap(False)
+        self.results_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_view.verticalHeader().setVisible(False)
+        # Fixed row heights and column widths keep the view from measuring every row
+        self.results_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_view.verticalHeader().setDefaultSectionSize(22)
+        header = self.results_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setStretchLastSection(True)
+        header.resizeSection(0, 60)
+        header.resizeSection(1, 320)
+        header.resizeSection(2, 220)
+        main_layout.addWidget(self.results_view, stretch=1)
+
         self.setLayout(main_layout)
         self.show()
 
+        # Load the processing stack once the event loop has drawn the window
+        self.warmup_thread = WarmupThread()
+        QTimer.singleShot(0, self.warmup_thread.start)
+
     def browse_product_type(self):
         options = QFileDialog.Options()
         fileName, _ = QFileDialog.getOpenFileName(self, "Select Product Type Excel File", "",
-                                                  "Excel Files (*.xlsx *.xls)", options=options)
+                                                  "Data Files (*.xlsx *.xls *.csv *.parquet)", options=options)
         if fileName:
             self.product_type_path = os.path.abspath(fileName)
             self.pt_path_label.setText(os.path.basename(fileName))
@@ -134,7 +189,7 @@ class App(QWidget):
     def browse_sample_file(self):
         options = QFileDialog.Options()
         fileName, _ = QFileDialog.getOpenFileName(self, "Select Sample Excel File", "",
-                                                  "Excel Files (*.xlsx *.xls)", options=options)
+                                                  "Data Files (*.xlsx *.xls *.csv *.parquet)", options=options)
         if fileName:
             self.sample_file_path = os.path.abspath(fileName)
             self.sample_path_label.setText(os.path.basename(fileName))
@@ -146,6 +201,9 @@ class App(QWidget):
         elif self.categorized_df and self.sample_file_path:
             # User wants to process a Sample file using existing categorized_df
             use_previous = True
+        elif self.sample_file_path and os.path.exists(CATALOG_PATH):
+            # No Product Type file selected: match against the catalog saved by an earlier run
+            use_previous = True
         elif self.product_type_path and self.categorized_df:
             # User wants to re-categorize with a new Product Type file
             reply = QMessageBox.question(
@@ -161,32 +219,85 @@ class App(QWidget):
             QMessageBox.critical(self, "Error", "Please select the appropriate files.")
             return
 
+        resume = self.ask_resume(use_previous)
+
         self.process_btn.setEnabled(False)
+        self.download_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.results_model.clear()
         self.status_label.setText("Processing... Please wait.")
         self.worker = WorkerThread(
             self.product_type_path,
             self.sample_file_path,
             use_previous,
-            self.categorized_df  # Pass the in-memory DataFrame
+            self.categorized_df,  # Pass the in-memory DataFrame
+            resume
         )
         self.worker.progress.connect(self.update_status)
         self.worker.finished.connect(self.processing_finished)
         self.worker.error.connect(self.processing_error)
         self.worker.results_ready.connect(self.update_results_df)  # Connect the new signal
+        self.worker.rows_ready.connect(self.results_model.append_rows)
         self.worker.start()
 
+    def ask_resume(self, use_previous):
+        """
+        Offers to resume when an interrupted run over the same files left a journal.
+        Returns False (start over) when there is nothing to resume or the user declines.
+        """
+        if not self.sample_file_path:
+            return False
+        try:
+            catalog_df = self.categorized_df
+            if use_previous and catalog_df is None:
+                from processing.catalog import load_catalog
+                catalog_df = load_catalog(CATALOG_PATH)
+            fingerprint = run_fingerprint(
+                self.sample_file_path,
+                product_type_path=None if use_previous else self.product_type_path,
+                categorized_df=catalog_df if use_previous else None
+            )
+            finished_rows = count_journaled_rows(fingerprint)
+        except OSError:
+            return False
+        if not finished_rows:
+            return False
+
+        reply = QMessageBox.question(
+            self, 'Resume Interrupted Run',
+            f"An interrupted run of these files already finished {finished_rows} rows. "
+            "Resume it? Choosing No starts over.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        return reply == QMessageBox.Yes
+
+    def cancel_processing(self):
+        """
+        Stops the run after the rows in flight; finished rows stay in the table.
+        During an export, stops the export instead and leaves no partial file.
+        """
+        self.cancel_btn.setEnabled(False)
+        if self.export_worker is not None and self.export_worker.isRunning():
+            self.status_label.setText("Cancelling export...")
+            self.export_worker.cancel()
+            return
+        self.status_label.setText("Cancelling... Finished rows are kept.")
+        self.worker.cancel()
+
     def update_status(self, message):
         self.status_label.setText(message)
 
     def processing_finished(self, message):
         self.status_label.setText(message)
         self.process_btn.setEnabled(True)
-        self.download_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.download_btn.setEnabled(self.results_model.rowCount() > 0)
         QMessageBox.information(self, "Success", message)
 
     def processing_error(self, error_message):
         self.status_label.setText("Error occurred during processing.")
         self.process_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
         QMessageBox.critical(self, "Error", error_message)
 
     def update_results_df(self, results_df):
@@ -197,16 +308,49 @@ class App(QWidget):
         print("Processed DataFrame updated in memory.")
 
     def download_output(self):
-        if self.results_df is None:
+        if not self.results_model.rowCount():
             QMessageBox.critical(self, "Error", "No processed results available to download.")
             return
 
         options = QFileDialog.Options()
-        savePath, _ = QFileDialog.getSaveFileName(self, "Save Output File", "processed_output.xlsx",
-                                                  "Excel Files (*.xlsx *.xls)", options=options)
+        savePath, selectedFilter = QFileDialog.getSaveFileName(
+            self, "Save Output File", "processed_output.xlsx",
+            "Excel Files (*.xlsx);;CSV Files (*.csv);;Parquet Files (*.parquet)", options=options
+        )
         if savePath:
-            try:
-                self.results_df.to_excel(os.path.abspath(savePath), index=False)
-                QMessageBox.information(self, "Success", f"File saved to {savePath}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to save file: {str(e)}")
+            path = os.path.abspath(savePath)
+            if os.path.splitext(path)[1].lower() not in OUTPUT_EXTENSIONS:
+                # Take the extension from the chosen filter, e.g. 'CSV Files (*.csv)'
+                path += selectedFilter.rsplit('*', 1)[-1].rstrip(')') if '*' in selectedFilter else '.xlsx'
+            # Written from the rows streamed into the table, in input order, off the UI thread
+            columns = OUTPUT_COLUMNS + (['Error'] if self.results_model.has_failures() else [])
+            self.export_worker = ExportWorker(path, columns, self.results_model.export_chunks(columns),
+                                              self.results_model.rowCount())
+            self.export_worker.progress.connect(self.update_status)
+            self.export_worker.finished.connect(self.export_finished)
+            self.export_worker.error.connect(self.export_error)
+            # The table must not be cleared by a new run while its rows are written
+            self.process_btn.setEnabled(False)
+            self.download_btn.setEnabled(False)
+            self.cancel_btn.setEnabled(True)
+            self.status_label.setText("Exporting...")
+            self.export_worker.start()
+
+    def export_finished(self, message):
+        self.status_label.setText(message)
+        self.process_btn.setEnabled(True)
+        self.download_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        QMessageBox.information(self, "Success", message)
+
+    def export_error(self, error_message):
+        self.status_label.setText("Export failed.")
+        self.process_btn.setEnabled(True)
+        self.download_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        QMessageBox.critical(self, "Error", f"Failed to save file: {error_message}")
+
+    def closeEvent(self, event):
+        # A QThread must not be destroyed while it runs; the warmup only takes a moment
+        self.warmup_thread.wait()
+        super().closeEvent(event)
@@ -0,0 +1,78 @@
+# gui/results_model.py
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from processing.results import format_failure
+from utils.writers import EXPORT_CHUNK_ROWS
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Table model over the finished result rows.
+    Rows are plain tuples appended as chunks arrive from the worker, and the
+    view only asks for the cells it shows, so it stays responsive at 100k+ rows.
+    """
+
+    COLUMNS = ['Row', 'Product Title', 'Product Type', 'Category', 'Error']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = self.rows[index.row()][index.column()]
+        return str(value) if value is not None else ''
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def append_rows(self, rows):
+        """Appends a chunk of (row index, result dict) pairs as emitted by the worker."""
+        if not rows:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self.rows.extend(
+            (index + 1, result.get('Product Title'), result.get('Product Type'), result.get('Category'),
+             format_failure(result['Error']) if 'Error' in result else None)
+            for index, result in rows
+        )
+        self.endInsertRows()
+
+    def has_failures(self):
+        return any(row[-1] for row in self.rows)
+
+    def export_chunks(self, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+        """
+        Chunks of `columns` values in input row order, for utils.writers.write_rows.
+        The rows are snapshotted now, so the chunks can be written from another
+        thread while the table keeps changing.
+        """
+        positions = [self.COLUMNS.index(column) for column in columns]
+        rows = sorted(self.rows, key=lambda row: row[0])
+        return (
+            [tuple(row[position] for position in positions) for row in rows[start:start + chunk_rows]]
+            for start in range(0, len(rows), chunk_rows)
+        )
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.rows.sort(
+            key=lambda row: (row[column] is None, row[column] if column == 0 else str(row[column] or '')),
+            reverse=order == Qt.DescendingOrder
+        )
+        self.layoutChanged.emit()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
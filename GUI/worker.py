@@ -1,36 +1,111 @@
 # gui/worker.py
 
+import importlib
+import threading
+
 from PyQt5.QtCore import QThread, pyqtSignal
-import pandas as pd
-from processing.processor import process_files  
+from utils.writers import write_rows
+
+# Loaded by WarmupThread after the window is shown rather than at startup
+PROCESSING_MODULES = ('processing.processor',)
 
 class WorkerThread(QThread):
     progress = pyqtSignal(str)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
-    results_ready = pyqtSignal(pd.DataFrame)  
+    results_ready = pyqtSignal(object)  # The results DataFrame
+    rows_ready = pyqtSignal(list)  # Chunks of (row index, result) pairs as rows finish
 
-    def __init__(self, product_type_path, sample_file_path, use_previous, categorized_df):
+    def __init__(self, product_type_path, sample_file_path, use_previous, categorized_df, resume=True):
         super().__init__()
         self.product_type_path = product_type_path
         self.sample_file_path = sample_file_path
         self.use_previous = use_previous
         self.categorized_df = categorized_df  
+        self.resume = resume
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Asks the run to stop; rows already finished are kept and emitted."""
+        self.cancel_event.set()
 
     def run(self):
         try:
+            # Imported here so that pandas and the LLM client are not loaded before the window appears
+            from processing.processor import process_files
+
             # Call the updated process_files function
             results_df = process_files(
                 product_type_path=self.product_type_path,
                 sample_file_path=self.sample_file_path,
                 use_previous=self.use_previous,
-                categorized_df=self.categorized_df  # Pass the in-memory DataFrame
+                categorized_df=self.categorized_df,  # Pass the in-memory DataFrame
+                resume=self.resume,
+                progress_callback=self.progress.emit,  # Streams rows done, rate and ETA to the status bar
+                result_callback=self.rows_ready.emit,
+                cancel_event=self.cancel_event
             )
+            run_stats = results_df.attrs['run_stats']
+            if run_stats['cancelled']:
+                message = (f"Processing cancelled. {len(results_df)} finished rows were kept; "
+                           "process the same files again to resume.")
+            elif run_stats['failed_rows']:
+                message = (f"Processing finished with {len(run_stats['failed_rows'])} failed rows; "
+                           "process the same files again to retry them.")
+            else:
+                message = "Processing completed successfully."
             # Emit progress
-            self.progress.emit("Processing completed successfully.")
+            self.progress.emit(message)
             # Emit the processed results DataFrame
             self.results_ready.emit(results_df)
             # Emit finished signal
-            self.finished.emit("Processing completed successfully.")
+            self.finished.emit(message)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class WarmupThread(QThread):
+    """
+    Imports the processing stack (pandas, pyarrow, the LLM client) in the
+    background once the window is up, so the first run does not wait for it.
+    Import errors are left for WorkerThread to report when processing starts.
+    """
+
+    def run(self):
+        for module in PROCESSING_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception:
+                return
+
+class ExportWorker(QThread):
+    """Writes result rows to an .xlsx, .csv or .parquet file off the UI thread."""
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, path, columns, chunks, total):
+        super().__init__()
+        self.path = path
+        self.columns = columns
+        self.chunks = chunks
+        self.total = total
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stops the export after the current chunk; no partial file is left behind."""
+        self.cancel_event.set()
+
+    def report_progress(self, written, total):
+        self.progress.emit(f"Exporting... {written}/{total} rows ({written / total:.0%})" if total
+                           else f"Exporting... {written} rows")
+
+    def run(self):
+        try:
+            written = write_rows(self.path, self.columns, self.chunks, self.total,
+                                 progress_callback=self.report_progress, cancel_event=self.cancel_event)
+            if written is None:
+                self.finished.emit("Export cancelled.")
+            else:
+                self.finished.emit(f"Saved {written} rows to {self.path}")
         except Exception as e:
             self.error.emit(str(e))
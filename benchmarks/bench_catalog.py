@@ -0,0 +1,111 @@
+# benchmarks/bench_catalog.py
+"""
+Compares per-row catalog lookups on the categorized DataFrame (a boolean
+scan per row, as process_files used to do) with the CatalogIndex, and the
+memory a run holds for the catalog either way.
+
+The catalog is written and loaded with save_catalog/load_catalog so its
+strings are laid out as in a real run, and memory is measured with the
+DataFrame holding Python string objects (pandas 2 default) and Arrow strings
+(pandas 3 default, or future.infer_string).
+
+Usage:
+    python -m benchmarks.bench_catalog [--products 500000] [--categories 300] [--lookups 500]
+"""
+
+import argparse
+import gc
+import hashlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.bench_matcher import make_catalog
+from processing.catalog import load_catalog, save_catalog
+from processing.catalog_index import CatalogIndex
+
+def make_catalog_file(path, products, categories, rng):
+    names = [f"Categorie {rng.choice(['Frane', 'Motor', 'Caroserie', 'Electrice'])} {i}" for i in range(categories)]
+    df = pd.DataFrame({
+        'Product': products,
+        'Category': [rng.choice(names) for _ in products],
+        'Hash': [hashlib.sha1(product.encode('utf-8')).hexdigest() for product in products]
+    })
+    save_catalog(df, path)
+
+def held_memory(build):
+    """MB of Python objects and Arrow buffers still allocated once `build` returned."""
+    gc.collect()
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes() - arrow_before
+    tracemalloc.stop()
+    del held
+    return current / 2 ** 20
+
+def dataframe_run(path):
+    """What process_files held: the loaded catalog and its copy."""
+    df = load_catalog(path)
+    return df, df.copy()
+
+def index_run(path):
+    """What process_files holds now: the index; the loaded DataFrame is released."""
+    df = load_catalog(path)
+    catalog = CatalogIndex(df)
+    del df
+    return catalog
+
+def timed(function, lookups):
+    start = time.perf_counter()
+    results = [function(category) for category in lookups]
+    return results, (time.perf_counter() - start) / len(lookups) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500000)
+    parser.add_argument("--categories", type=int, default=300)
+    parser.add_argument("--lookups", type=int, default=500, help="Sample rows to look up")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'catalog.json')
+        make_catalog_file(path, make_catalog(args.products, rng), args.categories, rng)
+
+        print(f"{args.products} products in {args.categories} categories")
+        for label, arrow_strings in (('object strings', False), ('Arrow strings', True)):
+            with pd.option_context('future.infer_string', arrow_strings):
+                dataframe_mb = held_memory(lambda: dataframe_run(path))
+                index_mb = held_memory(lambda: index_run(path))
+            change = index_mb / dataframe_mb - 1
+            print(f"{'catalog memory, ' + label:<32} DataFrame {dataframe_mb:8.1f} MB  index {index_mb:8.1f} MB  "
+                  f"({abs(change):.0%} {'more' if change > 0 else 'less'})")
+        df = load_catalog(path)
+
+    start = time.perf_counter()
+    catalog = CatalogIndex(df)
+    print(f"{'index build':<32} {time.perf_counter() - start:8.2f}s")
+
+    lookups = [rng.choice(catalog.categories) for _ in range(args.lookups)]
+    scanned, scan_us = timed(lambda category: df[df['Category'] == category]['Product'].tolist(), lookups)
+    indexed, index_us = timed(catalog.category_products, lookups)
+    mismatches = sum(list(a) != list(b) for a, b in zip(scanned, indexed))
+    print(f"{'category products per row':<32} scan {scan_us:10.1f} us  index {index_us:8.2f} us  "
+          f"speedup {scan_us / index_us:8.0f}x  mismatches {mismatches}")
+
+    categories = df['Category'].unique()
+    joined, join_us = timed(lambda _: ', '.join(categories), lookups)
+    prebuilt, prebuilt_us = timed(lambda _: catalog.categories_text, lookups)
+    print(f"{'category prompt text per row':<32} join {join_us:10.1f} us  index {prebuilt_us:8.2f} us  "
+          f"speedup {join_us / prebuilt_us:8.0f}x  mismatches {sum(a != b for a, b in zip(joined, prebuilt))}")
+
+if __name__ == '__main__':
+    main()
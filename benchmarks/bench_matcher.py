@@ -0,0 +1,107 @@
+# benchmarks/bench_matcher.py
+"""
+Compares KeywordMatcher against the original linear keyword scans.
+
+Usage:
+    python -m benchmarks.bench_matcher [--sizes 1000 10000 100000] [--queries 20]
+"""
+
+import argparse
+import random
+import time
+
+from fuzzywuzzy import fuzz
+
+from processing.matcher import KeywordMatcher
+
+WORDS = [
+    "disc", "frana", "amortizor", "filtru", "ulei", "aer", "bujie", "curea", "distributie",
+    "pompa", "apa", "senzor", "abs", "far", "stop", "oglinda", "radiator", "termostat",
+    "bieleta", "bascula", "rulment", "butuc", "planetara", "ambreiaj", "volanta", "injector"
+]
+
+def legacy_find_category_by_keywords(llm_output, categories):
+    """The original linear scan, kept as the reference implementation."""
+    llm_output = llm_output.lower()
+    category_keywords = {cat.lower(): cat for cat in categories}
+    for keyword, original_category in category_keywords.items():
+        if keyword in llm_output:
+            return original_category
+    return None
+
+def legacy_find_product_by_keywords(llm_output, category_products):
+    """The original exact + quadratic fuzzy scan, kept as the reference implementation."""
+    llm_output = llm_output.lower()
+    product_keywords = {prod.lower(): prod for prod in category_products}
+    for keyword, original_product in product_keywords.items():
+        if keyword in llm_output:
+            return original_product
+    llm_words = llm_output.split()
+    best_match = None
+    highest_ratio = 0
+    for word in llm_words:
+        for keyword, original_product in product_keywords.items():
+            ratio = fuzz.ratio(word, keyword)
+            if ratio > highest_ratio and ratio > 80:
+                highest_ratio = ratio
+                best_match = original_product
+    return best_match if best_match else None
+
+def make_catalog(size, rng):
+    products = []
+    for i in range(size):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        products.append(f"{name.capitalize()} {i}" if rng.random() < 0.7 else name.title())
+    return products
+
+def make_queries(products, count, rng):
+    queries = []
+    for i in range(count):
+        product = rng.choice(products)
+        kind = i % 3
+        if kind == 0:
+            queries.append(f"The closest product is {product}.")
+        elif kind == 1:
+            # One typo so only the fuzzy path can find it
+            word = rng.choice(product.split())
+            position = rng.randrange(len(word))
+            queries.append(f"Answer: {word[:position] + 'x' + word[position + 1:]}")
+        else:
+            queries.append("nothing relevant here")
+    return queries
+
+def timed(function, queries, items):
+    start = time.perf_counter()
+    answers = [function(query, items) for query in queries]
+    return answers, (time.perf_counter() - start) / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'catalog':>8} {'build ms':>9} {'legacy ms/q':>12} {'matcher ms/q':>13} {'speedup':>8}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        products = make_catalog(size, rng)
+        queries = make_queries(products, args.queries, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(products)
+        build = time.perf_counter() - start
+
+        legacy, legacy_time = timed(legacy_find_product_by_keywords, queries, products)
+        compiled, compiled_time = timed(lambda query, _: matcher.find(query), queries, products)
+        if legacy != compiled:
+            raise AssertionError(f"KeywordMatcher disagrees with the legacy scan at catalog size {size}")
+        for query in queries:
+            if legacy_find_category_by_keywords(query, products) != matcher.find_exact(query):
+                raise AssertionError(f"find_exact disagrees with the legacy scan for {query!r}")
+
+        print(f"{size:>8} {build * 1000:>9.1f} {legacy_time * 1000:>12.2f} "
+              f"{compiled_time * 1000:>13.3f} {legacy_time / compiled_time:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_memo.py
+"""
+Benchmarks the result memo (processing/memo.py) that reuses rows resolved in
+earlier runs for identical and near-identical titles.
+
+Stores --entries synthetic sample titles, reopens the memo from disk as a new
+run would, then looks up identical titles, titles with an extra word, titles
+with their words reordered, titles with another part number suffix (which
+must not be reused) and unrelated titles. Reports the
+load time, the time per lookup and store, the share of each kind of title
+that was reused, how many near matches the LSH index found compared to
+scanning every stored title, and the entries evicted once the memo is capped.
+
+Usage:
+    python -m benchmarks.bench_memo [--entries 100000] [--lookups 2000] [--threshold 0.85]
+"""
+
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.bench_matcher import make_catalog
+from benchmarks.bench_pipeline import make_samples
+from processing.memo import ResultMemo, jaccard, numeric_tokens, shingles
+from utils.helpers import normalize_title
+
+EXTRA_WORDS = ["nou", "original", "set", "calitate"]
+
+def next_suffix(title):
+    """The same title with the last digit of its part number changed."""
+    return re.sub(r'(\d)$', lambda match: str((int(match.group(1)) + 1) % 10), title)
+
+def extra_word(title, rng):
+    return f"{title} {rng.choice(EXTRA_WORDS)}"
+
+def reordered(title, rng):
+    words = title.split()
+    rng.shuffle(words)
+    return ' '.join(words)
+
+def timed_lookups(memo, titles):
+    """(results, microseconds per lookup)."""
+    start = time.perf_counter()
+    results = [memo.lookup(title)[0] for title in titles]
+    return results, (time.perf_counter() - start) / len(titles) * 1e6
+
+def scan_match(stored_keys, title, threshold):
+    """
+    Whether any stored title is within `threshold` and has the same numbers, by
+    comparing against all of them. `stored_keys` are (shingles, numeric tokens) pairs.
+    """
+    key = normalize_title(title)
+    grams, numbers = shingles(key), numeric_tokens(key)
+    return any(stored_numbers == numbers and jaccard(grams, stored) >= threshold
+               for stored, stored_numbers in stored_keys)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000, help="Resolved rows stored before the lookups")
+    parser.add_argument("--lookups", type=int, default=2000, help="Titles looked up per kind")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--scan", type=int, default=50, help="Near-identical titles also checked by a full scan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    products = make_catalog(2000, rng)
+    # Titles seen in earlier runs, and new ones that were not
+    titles = list(dict.fromkeys(make_samples(products, args.entries + args.lookups, rng)))
+    stored, unseen = titles[:args.entries], titles[args.entries:]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'memo.sqlite3')
+        memo = ResultMemo(path, enabled=True, threshold=args.threshold, max_entries=0, max_age_days=0)
+        start = time.perf_counter()
+        for title in stored:
+            memo.store(title, {'Product Title': title, 'Category': 'Frane', 'Product Type': title.split(' VW')[0]})
+        store_us = (time.perf_counter() - start) / len(stored) * 1e6
+        memo.conn.close()
+
+        start = time.perf_counter()
+        memo = ResultMemo(path, enabled=True, threshold=args.threshold, max_entries=0, max_age_days=0)
+        load_seconds = time.perf_counter() - start
+        tracemalloc.start()
+        held = ResultMemo(path, enabled=True, threshold=args.threshold, max_entries=0, max_age_days=0)
+        memory_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+        held.conn.close()
+        del held
+        print(f"{len(stored)} rows stored ({store_us:.0f} us each), loaded in {load_seconds:.2f}s, "
+              f"{memory_mb:.1f} MB in memory, {os.path.getsize(path) / 2 ** 20:.1f} MB on disk")
+
+        sample = rng.sample(stored, min(args.lookups, len(stored)))
+        kinds = (
+            ('identical', sample),
+            ('extra word', [extra_word(title, rng) for title in sample]),
+            ('reordered words', [reordered(title, rng) for title in sample]),
+            ('other part number suffix', [next_suffix(title) for title in sample]),
+            ('unrelated', unseen[:args.lookups])
+        )
+        for label, queries in kinds:
+            results, lookup_us = timed_lookups(memo, queries)
+            reused = sum(result is not None for result in results)
+            print(f"{label:<28} reused {reused / len(queries):6.1%}  {lookup_us:8.1f} us per lookup")
+
+        # Near matches the LSH index missed, against comparing each title with every stored one
+        stored_keys = [(shingles(key), numeric_tokens(key)) for key in map(normalize_title, stored)]
+        near = [extra_word(title, rng) for title in sample[:args.scan]]
+        expected = [scan_match(stored_keys, title, args.threshold) for title in near]
+        found = [memo.lookup(title)[0] is not None for title in near]
+        both = sum(a and b for a, b in zip(expected, found))
+        print(f"{'LSH recall vs full scan':<28} {both}/{sum(expected)} near-identical titles found")
+
+        hits = np.array([row[0] for row in memo.conn.execute("SELECT hits FROM memo")])
+        print(f"{'hit counts':<28} {int((hits > 0).sum())} entries hit, {int(hits.sum())} hits in total")
+
+        memo.max_entries = len(stored) // 2
+        memo.evict()
+        print(f"{'eviction':<28} capped at {memo.max_entries}: {memo.stats()['evicted']} least recently used "
+              f"entries evicted")
+
+if __name__ == '__main__':
+    main()
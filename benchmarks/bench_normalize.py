@@ -0,0 +1,84 @@
+# benchmarks/bench_normalize.py
+"""
+Compares the columnar text normalization in utils.normalize against the
+per-row helpers in utils.helpers, and checks that both give the same text.
+
+Usage:
+    python -m benchmarks.bench_normalize [--rows 1000000] [--seed 0]
+"""
+
+import argparse
+import html
+import random
+import time
+
+import pandas as pd
+
+from benchmarks.bench_matcher import WORDS
+from utils.helpers import clean_text, normalize_title
+from utils.normalize import normalize_column
+
+DIACRITIC_WORDS = ["frână", "față", "ștergător", "țeavă", "oglindă", "încălzire", "răcire", "bară"]
+MAKES = ["VW Golf", "Audi A4", "BMW Seria 3", "Dacia Logan", "Škoda Octavia"]
+
+def make_cells(rows, rng):
+    """Excel-like title cells: plain and diacritic text, some HTML and entities, numbers and blanks."""
+    cells = []
+    for _ in range(rows):
+        roll = rng.random()
+        if roll < 0.02:
+            cells.append(None)
+            continue
+        if roll < 0.03:
+            cells.append(rng.randint(1000, 99999))
+            continue
+        words = rng.sample(WORDS, 2) + ([rng.choice(DIACRITIC_WORDS)] if rng.random() < 0.3 else [])
+        title = f"{' '.join(words).capitalize()} {rng.choice(MAKES)} {rng.randint(1998, 2022)}"
+        if rng.random() < 0.1:
+            title = f"<b>{title}</b><br/>"
+        if rng.random() < 0.05:
+            title = title.replace(' ', '&nbsp;', 1) + " &amp; set"
+        if rng.random() < 0.1:
+            title = f"  {title}\t "
+        cells.append(title)
+    return cells
+
+def legacy_normalize(cells):
+    """The per-row helpers, called once per cell."""
+    display, keys = [], []
+    for cell in cells:
+        if cell is None:
+            display.append(None)
+            keys.append(None)
+            continue
+        text = str(cell)
+        display.append(' '.join(html.unescape(clean_text(text)).split()) or None)
+        keys.append(normalize_title(text) or None)
+    return display, keys
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cells = make_cells(args.rows, rng)
+    print(f"{args.rows} rows")
+
+    (legacy_display, legacy_keys), legacy_seconds = timed(legacy_normalize, cells)
+    (display, keys), column_seconds = timed(normalize_column, pd.Series(cells, dtype=object))
+    mismatches = sum(
+        a != b or c != d
+        for a, b, c, d in zip(legacy_display, display.to_pylist(), legacy_keys, keys.to_pylist())
+    )
+    print(f"{'normalize (display + key)':<28} per-row {legacy_seconds:7.2f}s  columnar {column_seconds:7.2f}s  "
+          f"speedup {legacy_seconds / column_seconds:5.1f}x  mismatches {mismatches}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end throughput benchmark against the local mock LLM server.
+
+Starts benchmarks.mock_server, then for every size runs categorize_products
+over a synthetic catalog and process_files over a synthetic sample file,
+each size in a fresh process so peak RSS is measured per size. Prints (or
+writes) a JSON report that can be diffed between versions.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 100 1000 5000] [--mode async]
+                                        [--latency lognormal:80:0.5] [--error-429 0.02]
+                                        [--output report.json] [--compare baseline.json]
+
+The model cascade runs against the stub playing a fast model that gets some
+answers wrong and a slower one that does not, e.g.
+    LLM_PRICES=small=0.05/0.08,large=0.59/0.79 python -m benchmarks.bench_pipeline --sizes 1000 \
+        --tiers small,large --model small=fixed:40,0.2 --model large=lognormal:300:0.4,0
+and the report shows the calls, escalations, latency and cost of each tier.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+from benchmarks.bench_matcher import make_catalog
+from benchmarks.mock_server import MockLLMServer, parse_model
+
+MAKES = {
+    "VW": ["Golf", "Passat", "Polo"],
+    "Audi": ["A3", "A4", "A6"],
+    "BMW": ["Seria 3", "Seria 5", "X3"],
+    "Dacia": ["Logan", "Duster", "Sandero"]
+}
+
+def make_samples(products, count, rng):
+    """Sample descriptions built from catalog products with car and part details."""
+    samples = []
+    for _ in range(count):
+        make = rng.choice(list(MAKES))
+        samples.append(
+            f"{rng.choice(products)} {make} {rng.choice(MAKES[make])} {rng.randint(1998, 2022)} "
+            f"cod {rng.randint(10, 99)}{rng.choice('ABCDEFGH')}{rng.randint(10000, 99999)}"
+        )
+    return samples
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read."""
+    # The stdlib `resource` module is shadowed by the project's resource/ package
+    if sys.platform.startswith('linux'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    elif sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                    'PagefileUsage', 'PeakPagefileUsage'
+                )
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+    return None
+
+def server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url.rsplit('/v1', 1)[0]}/stats") as response:
+        return json.load(response)
+
+def instrument_client(client):
+    """
+    Times every chat call of `client`, including its retries and rate-limit waits;
+    streamed calls are timed until their stream is closed.
+    """
+    latencies = []
+    chat, achat, astream_chat = client.chat, client.achat, client.astream_chat
+
+    def timed_chat(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return chat(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    async def timed_achat(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await achat(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    async def timed_astream_chat(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await astream_chat(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    client.chat = timed_chat
+    client.achat = timed_achat
+    client.astream_chat = timed_astream_chat
+    return latencies
+
+def measure(function, rows, latencies, base_url):
+    """Runs `function` and returns its result with throughput, latency and request metrics."""
+    del latencies[:]
+    statuses_before = server_stats(base_url)['statuses']
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    statuses_after = server_stats(base_url)['statuses']
+
+    statuses = {
+        status: count - statuses_before.get(status, 0)
+        for status, count in sorted(statuses_after.items())
+        if count - statuses_before.get(status, 0)
+    }
+    latencies_ms = np.array(latencies) * 1000
+    return result, {
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 2) if elapsed else None,
+        'calls': len(latencies),
+        'requests': sum(statuses.values()),
+        'statuses': statuses,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 1) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 1) if len(latencies) else None,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_size(args):
+    """Benchmarks one size; runs in its own process with the environment set by main()."""
+    from processing.llm_client import get_client
+    from processing.processor import categorize_products, process_files
+
+    rng = random.Random(args.seed)
+    products = make_catalog(args.size, rng)
+    samples = make_samples(products, args.size, rng)
+    sample_path = os.path.join(args.work_dir, f"sample_{args.size}.csv")
+    with open(sample_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows([sample] for sample in samples)
+
+    latencies = instrument_client(get_client())
+    base_url = os.environ['LLM_BASE_URL']
+
+    categorized_df, categorize = measure(
+        lambda: categorize_products([product] for product in products),
+        len(products), latencies, base_url
+    )
+    results_df, process = measure(
+        lambda: process_files(
+            None, sample_path, True, categorized_df,
+            async_mode=args.mode != 'sync',
+            max_concurrency=args.concurrency,
+            batch_size=args.batch_size if args.mode == 'batched' else 0,
+            resume=False,
+            catalog_path=os.path.join(args.work_dir, 'catalog.json')
+        ),
+        len(samples), latencies, base_url
+    )
+    process['tiers'] = results_df.attrs['run_stats']['report']['tiers']
+
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump({'size': args.size, 'categorize_products': categorize, 'process_files': process}, f)
+
+def compare(report, baseline):
+    """Prints throughput and p99 changes against an earlier report."""
+    earlier = {result['size']: result for result in baseline['results']}
+    print(f"{'size':>7} {'stage':<20} {'rows/s':>9} {'before':>9} {'change':>8} {'p99 ms':>8} {'before':>8}")
+    for result in report['results']:
+        before = earlier.get(result['size'])
+        if before is None:
+            continue
+        for stage in ('categorize_products', 'process_files'):
+            now, then = result[stage], before[stage]
+            change = (now['rows_per_sec'] / then['rows_per_sec'] - 1) if then['rows_per_sec'] else 0.0
+            print(f"{result['size']:>7} {stage:<20} {now['rows_per_sec']:>9} {then['rows_per_sec']:>9} "
+                  f"{change:>+8.1%} {now['p99_ms']!s:>8} {then['p99_ms']!s:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="Catalog products and sample rows per run")
+    parser.add_argument("--mode", choices=['sync', 'async', 'batched'], default='async')
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=20, help="Rows per request in batched mode")
+    parser.add_argument("--latency", default="lognormal:80:0.5",
+                        help="Mock latency: fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-429", type=float, default=0.02)
+    parser.add_argument("--error-500", type=float, default=0.01)
+    parser.add_argument("--chatter", type=int, default=0,
+                        help="Lines of commentary the stub adds after every categorization answer")
+    parser.add_argument("--rpm", type=int, default=1000000, help="RPM_PER_KEY for the run")
+    parser.add_argument("--tpm", type=int, default=1000000000, help="TPM_PER_KEY for the run")
+    parser.add_argument("--model", action='append', default=[], type=parse_model,
+                        help="Mock model NAME=LATENCY,WRONG with its own latency and share of wrong answers")
+    parser.add_argument("--tiers", help="LLM_TIERS for the run, e.g. small,large")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    # Internal: run one size in a child process
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size is not None:
+        run_size(args)
+        return
+
+    report = {
+        'config': {
+            'sizes': args.sizes,
+            'mode': args.mode,
+            'concurrency': args.concurrency,
+            'batch_size': args.batch_size,
+            'latency': args.latency,
+            'error_429': args.error_429,
+            'error_500': args.error_500,
+            'chatter': args.chatter,
+            'rpm_per_key': args.rpm,
+            'tpm_per_key': args.tpm,
+            'models': [f"{name}={latency},{wrong}" for name, latency, wrong in args.model],
+            'tiers': args.tiers,
+            'seed': args.seed,
+            'python': platform.python_version()
+        },
+        'results': []
+    }
+
+    models = {name: (latency, wrong) for name, latency, wrong in args.model}
+    with MockLLMServer(latency=args.latency, error_429=args.error_429, error_500=args.error_500,
+                       seed=args.seed, models=models, chatter=args.chatter) as server, tempfile.TemporaryDirectory() as work_dir:
+        # Real keys, caches and journals stay out of the benchmark
+        env = {name: value for name, value in os.environ.items() if not name.startswith('API')}
+        env.update({
+            'LLM_BASE_URL': server.url,
+            'API': 'benchmark',
+            'LLM_CACHE': '0',
+            'MEMO': '0',
+            'RPM_PER_KEY': str(args.rpm),
+            'TPM_PER_KEY': str(args.tpm),
+            'RETRY_BASE_DELAY': '0.05',
+            'JOURNAL_DIR': os.path.join(work_dir, 'journal'),
+            'CATALOG_PATH': os.path.join(work_dir, 'catalog.json'),
+            'RUN_REPORT_DIR': os.path.join(work_dir, 'reports'),
+            'PYTHONWARNINGS': 'ignore'
+        })
+        if args.tiers:
+            env['LLM_TIERS'] = args.tiers
+        for size in args.sizes:
+            result_path = os.path.join(work_dir, f"result_{size}.json")
+            log_path = os.path.join(work_dir, f"log_{size}.txt")
+            command = [
+                sys.executable, '-m', 'benchmarks.bench_pipeline', '--size', str(size),
+                '--work-dir', work_dir, '--result', result_path, '--mode', args.mode,
+                '--concurrency', str(args.concurrency), '--batch-size', str(args.batch_size),
+                '--seed', str(args.seed)
+            ]
+            print(f"Running size {size}...", file=sys.stderr)
+            with open(log_path, 'w', encoding='utf-8') as log:
+                completed = subprocess.run(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+            if completed.returncode != 0:
+                with open(log_path, encoding='utf-8') as log:
+                    sys.stderr.write(log.read()[-4000:])
+                raise SystemExit(f"Benchmark run for size {size} failed.")
+            with open(result_path, encoding='utf-8') as f:
+                report['results'].append(json.load(f))
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
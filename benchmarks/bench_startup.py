@@ -0,0 +1,127 @@
+# benchmarks/bench_startup.py
+"""
+Cold start benchmark for the desktop app.
+
+Imports the GUI module (what main.py loads before the window appears) in a
+fresh interpreter with `-X importtime`, several times, and reports the median
+import time, the packages that cost the most and whether any of the heavy
+processing dependencies were loaded. With --window it also times a fresh
+process from first import to the window being shown (offscreen by default).
+Exits with status 1 when the median import time is over --budget-ms or a
+heavy module is loaded at startup, so the budget can be tracked in CI.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 250] [--window]
+                                       [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded in the background after the window is shown, never before it
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'openai', 'httpx', 'fuzzywuzzy', 'openpyxl')
+
+WINDOW_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from {module} import App
+app = QApplication(sys.argv)
+window = App()
+app.processEvents()
+print(time.perf_counter() - start)
+"""
+
+def run_python(args):
+    """Runs a fresh interpreter from the repository root; returns (stdout, stderr, seconds)."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BASE_DIR, env.get('PYTHONPATH')]))
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+    return completed.stdout, completed.stderr, seconds
+
+def parse_importtime(text):
+    """(module, self microseconds, cumulative microseconds) for every line of `-X importtime` output."""
+    imports = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+def profile_import(module):
+    """Import time of `module` and the cost of every top-level package, from one fresh process."""
+    _, stderr, seconds = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    imports = parse_importtime(stderr)
+    packages = Counter()
+    for name, self_us, _ in imports:
+        packages[name.split('.')[0]] += self_us
+    loaded = {name for name, _, _ in imports}
+    return {
+        'import_ms': next(cumulative for name, _, cumulative in imports if name == module) / 1000,
+        'process_ms': seconds * 1000,
+        'packages_ms': {package: us / 1000 for package, us in packages.items()},
+        'heavy_modules': [name for name in HEAVY_MODULES if name in loaded]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="gui.app", help="Module main.py imports the App window from")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=250, help="Budget for the median import time")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list by import time")
+    parser.add_argument("--window", action='store_true', help="Also time a process until the window is shown")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # One untimed run so the results do not include writing .pyc files
+    profile_import(args.module)
+    profiles = [profile_import(args.module) for _ in range(args.runs)]
+
+    packages = Counter()
+    for profile in profiles:
+        packages.update(profile['packages_ms'])
+    report = {
+        'module': args.module,
+        'runs': args.runs,
+        'python': sys.version.split()[0],
+        'import_ms': round(statistics.median(profile['import_ms'] for profile in profiles), 1),
+        'process_ms': round(statistics.median(profile['process_ms'] for profile in profiles), 1),
+        'budget_ms': args.budget_ms,
+        'top_packages_ms': {package: round(ms / args.runs, 1) for package, ms in packages.most_common(args.top)},
+        'heavy_modules': sorted({name for profile in profiles for name in profile['heavy_modules']})
+    }
+    if args.window:
+        report['window_ms'] = round(statistics.median(
+            float(run_python(['-c', WINDOW_SCRIPT.format(module=args.module)])[0].split()[-1]) * 1000
+            for _ in range(args.runs)
+        ), 1)
+    report['within_budget'] = report['import_ms'] <= args.budget_ms and not report['heavy_modules']
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+    if not report['within_budget']:
+        print(f"Startup over budget: {report['import_ms']} ms import (budget {args.budget_ms} ms), "
+              f"heavy modules loaded: {', '.join(report['heavy_modules']) or 'none'}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+# benchmarks/mock_server.py
+"""
+Local OpenAI-compatible chat completion stub for benchmarks.
+
+Answers every prompt the processor sends with a canned response in the
+format its parsers expect, after a latency drawn from a configurable
+distribution, and injects 429/500 errors at configurable rates. It can play
+several models, each with its own latency and share of unusable answers, to
+exercise the model cascade.
+
+Usage:
+    python -m benchmarks.mock_server [--port 8765] [--latency lognormal:80:0.5]
+                                     [--error-429 0.02] [--error-500 0.01] [--chatter 20]
+                                     [--model llama-3.1-8b-instant=fixed:40,0.2]
+
+Point the processor at it with LLM_BASE_URL=http://127.0.0.1:8765/v1.
+Requests with "stream": true are answered with server-sent chunks: the
+first after a share of the latency, the rest spread over the remainder.
+GET /stats returns the request and status counts as JSON.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORIES = [
+    "Sistem de frânare",
+    "Suspensie și direcție",
+    "Componente motor",
+    "Transmisie și ambreiaj",
+    "Sistem de răcire și încălzire",
+    "Sistem electric și senzori",
+    "Caroserie și interior",
+    "Sistem de combustibil și emisii",
+    "Sistem de evacuare",
+    "Diverse"
+]
+
+# Words that decide a product's category, so categories are learnable rather than random
+CATEGORY_KEYWORDS = {
+    "disc": "Sistem de frânare", "frana": "Sistem de frânare",
+    "amortizor": "Suspensie și direcție", "bieleta": "Suspensie și direcție",
+    "bascula": "Suspensie și direcție", "rulment": "Suspensie și direcție", "butuc": "Suspensie și direcție",
+    "filtru": "Componente motor", "ulei": "Componente motor", "bujie": "Componente motor",
+    "curea": "Componente motor", "distributie": "Componente motor",
+    "planetara": "Transmisie și ambreiaj", "ambreiaj": "Transmisie și ambreiaj", "volanta": "Transmisie și ambreiaj",
+    "pompa": "Sistem de răcire și încălzire", "apa": "Sistem de răcire și încălzire",
+    "radiator": "Sistem de răcire și încălzire", "termostat": "Sistem de răcire și încălzire",
+    "senzor": "Sistem electric și senzori", "abs": "Sistem electric și senzori", "far": "Sistem electric și senzori",
+    "stop": "Sistem electric și senzori",
+    "oglinda": "Caroserie și interior",
+    "injector": "Sistem de combustibil și emisii"
+}
+
+INDEXED_LINE = re.compile(r'^\s*(\d+)\|(.*)$', re.M)
+
+# Share of a streamed answer's latency spent before its first chunk
+FIRST_CHUNK_SHARE = 0.2
+
+def stable_fraction(text):
+    """A number in [0, 1) that is the same for the same text in every run and process."""
+    return int.from_bytes(hashlib.md5(text.encode('utf-8')).digest()[:4], 'little') / 2 ** 32
+
+def stable_choice(text, options):
+    """Picks the same option for the same text in every run and process."""
+    digest = hashlib.md5(text.encode('utf-8')).digest()
+    return options[int.from_bytes(digest[:4], 'little') % len(options)]
+
+def category_answer(text, options=CATEGORIES):
+    """The category of the first keyword in `text`, or a stable pick for texts without one."""
+    for word in re.findall(r'\w+', text.lower()):
+        category = CATEGORY_KEYWORDS.get(word)
+        if category in options:
+            return category
+    return stable_choice(text, options)
+
+def parse_latency(spec):
+    """
+    Parses a latency distribution in milliseconds:
+    'fixed:MS', 'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA'.
+    """
+    kind, *values = spec.split(':')
+    values = [float(value) for value in values]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: values[0] * rng.lognormvariate(0.0, values[1])
+    raise ValueError(f"Invalid latency '{spec}'. Use fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA.")
+
+TITLE_LABELS = ['product type', 'brand', 'car make', 'car model', 'year range', 'additional information',
+                'part number']
+
+def title_answer(description):
+    """A 7-part product title like the title generation prompts ask for."""
+    words = description.lower().split()
+    product_type = ' '.join(words[:2]) or 'null'
+    years = re.search(r'\b(19|20)\d{2}\b', description)
+    year_range = f"{years.group(0)}-{int(years.group(0)) + 5}" if years else 'null'
+    part_number = re.search(r'\b[A-Z0-9]*\d[A-Z0-9-]{4,}\b', description)
+    return (f"{product_type}, MODECAR, {stable_choice(description, ['vw', 'audi', 'bmw', 'dacia'])}, null, "
+            f"{year_range}, null, {part_number.group(0) if part_number else 'null'}")
+
+def closest_product(product_title, candidates):
+    """The candidate sharing the most words with the title, first on ties."""
+    title_words = set(product_title.lower().split())
+    return max(candidates, key=lambda candidate: len(title_words & set(candidate.lower().split())))
+
+def canned_response(prompt):
+    """Answers a processor prompt in the format its parser expects."""
+    if '**Produse:**' in prompt:
+        listed = prompt.split('**Produse:**', 1)[1].split('**Formatul', 1)[0]
+        products = [line[2:].strip() for line in listed.split('\n') if line.startswith('- ')]
+        return '\n'.join(f"{product}: {category_answer(product)}" for product in products)
+
+    if 'Descriptions:' in prompt:
+        return '\n'.join(f"{index}|{title_answer(text)}" for index, text in INDEXED_LINE.findall(prompt))
+
+    if '<number>|<category name>' in prompt:
+        options = prompt.split('Use only category names from the following options:\n', 1)[1].split('\n', 1)[0]
+        options = options.split(', ')
+        return '\n'.join(f"{index}|{category_answer(title, options)}" for index, title in INDEXED_LINE.findall(prompt))
+
+    if 'Respond with only the category name' in prompt:
+        title = prompt.split('Product: ', 1)[1].split('\n', 1)[0]
+        options = prompt.split('following options:\n', 1)[1].strip().split(', ')
+        return category_answer(title, options)
+
+    if 'Extract only the following product information' in prompt:
+        labels = prompt.split('exact format:\n', 1)[1].split('\n', 1)[0].strip()[1:-1].split('], [')
+        description = prompt.rsplit('Text to process:\n', 1)[-1]
+        parts = dict(zip(TITLE_LABELS, [part.strip() for part in title_answer(description).split(',')]))
+        return ', '.join(parts.get(label, 'null') for label in labels)
+
+    if 'Return exactly ONE product' in prompt:
+        title = prompt.split('Given the following product: ', 1)[1].split('\n', 1)[0]
+        candidates = prompt.split('same category:\n', 1)[1].split('\n', 1)[0].split(', ')
+        return closest_product(title, candidates)
+
+    description = prompt.rsplit('Text to process:\n', 1)[-1]
+    return title_answer(description)
+
+def wrong_response(prompt, content, rate, model):
+    """
+    A weaker model's take on `content`: a `rate` share of the answers (of the
+    lines of a batch answer) is replaced with text that fails the processor's
+    checks. Which answers are wrong is stable per model and prompt.
+    """
+    if '**Produse:**' in prompt:
+        return content
+    if INDEXED_LINE.search(content):
+        return '\n'.join(
+            f"{index}|nu stiu" if stable_fraction(f"{model}\n{prompt}\n{index}") < rate else f"{index}|{answer}"
+            for index, answer in INDEXED_LINE.findall(content)
+        )
+    if stable_fraction(f"{model}\n{prompt}") >= rate:
+        return content
+    if 'Extract only the following product information' in prompt:
+        # One part too many, so the answer does not fit the fields asked for
+        return ', '.join(['nu stiu'] * (content.count(',') + 2))
+    return "Nu sunt sigur."
+
+def stream_pieces(content):
+    """Splits an answer into stream chunks: every line in two halves, so lines arrive in parts."""
+    pieces = []
+    for line in content.splitlines(keepends=True):
+        middle = len(line) // 2
+        pieces.extend(piece for piece in (line[:middle], line[middle:]) if piece)
+    return pieces or ['']
+
+def parse_model(spec):
+    """Parses 'NAME=LATENCY,WRONG' into (name, latency spec, share of wrong answers)."""
+    name, _, profile = spec.partition('=')
+    latency, _, wrong = profile.rpartition(',')
+    if not name or not latency:
+        raise ValueError(f"Invalid model '{spec}'. Use NAME=LATENCY,WRONG, e.g. small=fixed:40,0.2.")
+    parse_latency(latency)
+    return name, latency, float(wrong)
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # Many async clients connect at once
+
+class MockLLMServer:
+    """
+    Threaded stub server. Use as a context manager or call start()/stop().
+    `latency` is a parse_latency spec; `error_429` and `error_500` are the
+    fractions of requests answered with that status instead. `models` maps
+    model names to (latency spec, share of wrong answers); requests for
+    other models use `latency` and always answer correctly. `chatter` lines
+    of commentary follow every categorization answer, as some models add;
+    the latency covers them, so a stream closed after the answer is shorter.
+    """
+
+    def __init__(self, port=0, latency='fixed:0', error_429=0.0, error_500=0.0,
+                 retry_after=0.1, seed=0, models=None, chatter=0):
+        self.sample_latency = parse_latency(latency)
+        self.models = {
+            name: (parse_latency(model_latency), wrong) for name, (model_latency, wrong) in (models or {}).items()
+        }
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.retry_after = retry_after
+        self.chatter = chatter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.model_requests = {}
+        self.streams = {'completed': 0, 'cut_off': 0}
+        self.server = _Server(('127.0.0.1', port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def stats(self):
+        with self.lock:
+            return {'requests': sum(self.statuses.values()), 'statuses': dict(self.statuses),
+                    'models': dict(self.model_requests), 'streams': dict(self.streams)}
+
+    def _draw(self, model=None):
+        """Returns (status, latency in seconds) for the next request to `model`."""
+        sample_latency = self.models[model][0] if model in self.models else self.sample_latency
+        with self.lock:
+            self.model_requests[model] = self.model_requests.get(model, 0) + 1
+            roll = self.rng.random()
+            latency = max(sample_latency(self.rng), 0.0) / 1000
+        if roll < self.error_429:
+            return 429, 0.0
+        if roll < self.error_429 + self.error_500:
+            return 500, latency
+        return 200, latency
+
+    def _count(self, status):
+        with self.lock:
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def _count_stream(self, outcome):
+        with self.lock:
+            self.streams[outcome] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, payload, headers=()):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the request, e.g. a cancelled hedged request or a timeout
+                    self.close_connection = True
+
+            def send_event(self, payload):
+                data = f"data: {payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)}\n\n"
+                data = data.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def send_stream(self, model, content, seconds, usage):
+                """Sends `content` as chat.completion.chunk events spread over `seconds`."""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                def chunk(delta, finish_reason=None):
+                    return {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                            'model': model,
+                            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+                pieces = stream_pieces(content)
+                try:
+                    for i, piece in enumerate(pieces):
+                        if i:
+                            time.sleep(seconds / len(pieces))
+                        self.send_event(chunk({'role': 'assistant', 'content': piece} if i == 0
+                                              else {'content': piece}))
+                    self.send_event(chunk({}, 'stop'))
+                    if usage is not None:
+                        self.send_event({**chunk({}), 'choices': [], 'usage': usage})
+                    self.send_event('[DONE]')
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream once it had what it needed
+                    self.close_connection = True
+                    server._count_stream('cut_off')
+                    return
+                server._count_stream('completed')
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/stats':
+                    self.send_json(200, server.stats())
+                else:
+                    self.send_json(404, {'error': {'message': 'Not found'}})
+
+            def do_POST(self):
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                except ValueError:
+                    # The client went away while sending the request
+                    self.close_connection = True
+                    return
+                model = request.get('model', 'mock')
+                status, latency = server._draw(model)
+                stream = bool(request.get('stream')) and status == 200
+                time.sleep(latency * FIRST_CHUNK_SHARE if stream else latency)
+                server._count(status)
+
+                if status == 429:
+                    self.send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit'}},
+                                   [('Retry-After', str(server.retry_after))])
+                    return
+                if status == 500:
+                    self.send_json(500, {'error': {'message': 'Injected server error'}})
+                    return
+
+                prompt = request['messages'][-1]['content']
+                content = canned_response(prompt)
+                if model in server.models and server.models[model][1]:
+                    content = wrong_response(prompt, content, server.models[model][1], model)
+                if server.chatter and '**Produse:**' in prompt:
+                    content += '\n\n' + '\n'.join(
+                        f"Nota {i + 1}: produsele au fost clasificate dupa functia lor principala."
+                        for i in range(server.chatter)
+                    )
+                prompt_tokens = sum(len(message['content']) for message in request['messages']) // 4 + 1
+                completion_tokens = len(content) // 4 + 1
+                usage = {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens
+                }
+                if stream:
+                    include_usage = (request.get('stream_options') or {}).get('include_usage')
+                    self.send_stream(model, content, latency * (1 - FIRST_CHUNK_SHARE),
+                                     usage if include_usage else None)
+                    return
+                self.send_json(200, {
+                    'id': 'chatcmpl-mock',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': usage
+                })
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:80:0.5",
+                        help="fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (default: %(default)s)")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--model", action='append', default=[], type=parse_model,
+                        help="NAME=LATENCY,WRONG: a model with its own latency and share of wrong answers "
+                             "(repeatable)")
+    parser.add_argument("--chatter", type=int, default=0,
+                        help="Lines of commentary after every categorization answer")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    models = {name: (latency, wrong) for name, latency, wrong in args.model}
+    server = MockLLMServer(args.port, args.latency, args.error_429, args.error_500, args.retry_after, args.seed,
+                           models, args.chatter)
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+# cli.py
+"""
+Headless entry point around processing.processor.process_files.
+
+    python cli.py run sample.xlsx -o results.xlsx --product-types types.xlsx --processes 4
+    python cli.py run sample.xlsx -o part-2.parquet --shard 2/4
+    python cli.py merge part-*.parquet -o results.xlsx
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import pandas as pd
+
+from config.settings import (
+    CATALOG_PATH, MAX_CONCURRENCY, READ_CHUNK_SIZE, SAMPLE_BATCH_SIZE
+)
+from processing.llm_client import configure_client, load_api_keys
+from processing.metrics import combine_reports, save_report, start_run
+from processing.processor import OUTPUT_COLUMNS, process_files, update_catalog
+from utils.readers import read_first_column_chunks
+from utils.writers import write_frame
+
+SHARD_METADATA_KEY = b'productcategorizer.shard'
+
+def write_output(df, path):
+    """Writes results as .xlsx, .csv or .parquet depending on the extension, streamed in chunks."""
+    write_frame(df, path)
+
+def parse_shard(value):
+    """Parses 'INDEX/COUNT' (1-based) into (index, count)."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected INDEX/COUNT, e.g. 2/4, got '{value}'.")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 1 and {count}, got '{value}'.")
+    return index, count
+
+def shard_bounds(total_rows, shard_count):
+    """Contiguous [start, end) row ranges of roughly equal size, in file order."""
+    edges = [total_rows * k // shard_count for k in range(shard_count + 1)]
+    return list(zip(edges, edges[1:]))
+
+def split_sample_file(sample_file_path, work_dir, shard_count):
+    """
+    Writes the sample rows into `shard_count` CSV shard files and returns their paths.
+    Shards are contiguous and their content only depends on the input, so an
+    interrupted shard resumes from its journal on the next run.
+    """
+    total_rows = sum(len(chunk) for chunk in read_first_column_chunks(sample_file_path, READ_CHUNK_SIZE))
+    bounds = shard_bounds(total_rows, shard_count)
+    os.makedirs(work_dir, exist_ok=True)
+    paths = [os.path.join(work_dir, f"shard-{k + 1:03d}-of-{shard_count:03d}.csv") for k in range(shard_count)]
+
+    files = [open(path, 'w', newline='', encoding='utf-8') for path in paths]
+    try:
+        writers = [csv.writer(f) for f in files]
+        shard = 0
+        row = 0
+        for chunk in read_first_column_chunks(sample_file_path, READ_CHUNK_SIZE):
+            for value in chunk:
+                while row >= bounds[shard][1]:
+                    shard += 1
+                writers[shard].writerow(['' if value is None else value])
+                row += 1
+    finally:
+        for f in files:
+            f.close()
+    print(f"Split {total_rows} sample rows into {shard_count} shards.")
+    return paths
+
+def shard_api_keys(api_keys, shard_index, shard_count):
+    """
+    Rate-limit share of one shard (0-based index): disjoint keys when there are
+    enough of them, otherwise every key at 1/shard_count of its RPM/TPM limits.
+    Returns (api_keys, rate_share).
+    """
+    if len(api_keys) >= shard_count:
+        return api_keys[shard_index::shard_count], 1.0
+    return api_keys, 1.0 / shard_count
+
+def write_part(df, path, shard_index, shard_count):
+    """Writes one shard's results as Parquet, tagged with its position for `merge`."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SHARD_METADATA_KEY] = f"{shard_index}/{shard_count}".encode('ascii')
+    temp_path = f"{path}.tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), temp_path)
+    os.replace(temp_path, path)
+
+def merge_parts(part_paths):
+    """
+    Concatenates shard results in shard order, whatever order they finished or
+    are listed in. Fails if a shard is missing, repeated or from another split.
+    """
+    import pyarrow.parquet as pq
+
+    parts = {}
+    shard_counts = set()
+    for path in part_paths:
+        table = pq.read_table(path)
+        tag = (table.schema.metadata or {}).get(SHARD_METADATA_KEY)
+        if tag is None:
+            raise ValueError(f"'{path}' is not a shard result (written by 'cli.py run --shard').")
+        shard_index, shard_count = parse_shard(tag.decode('ascii'))
+        if shard_counts and shard_count not in shard_counts:
+            raise ValueError(f"Shards come from different splits (shard counts "
+                             f"{sorted(shard_counts | {shard_count})}).")
+        if shard_index in parts:
+            raise ValueError(f"Shard {shard_index}/{shard_count} given twice.")
+        parts[shard_index] = table.to_pandas()
+        shard_counts.add(shard_count)
+
+    if len(shard_counts) != 1:
+        raise ValueError(f"Shards come from different splits (shard counts {sorted(shard_counts)}).")
+    shard_count = shard_counts.pop()
+    missing = [k for k in range(1, shard_count + 1) if k not in parts]
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(f'{k}/{shard_count}' for k in missing)}.")
+
+    frames = [parts[k] for k in range(1, shard_count + 1)]
+    merged = pd.concat(frames, ignore_index=True)
+    if 'Error' in merged:
+        # Only shards with failed rows have the column
+        return merged[OUTPUT_COLUMNS + ['Error']].fillna({'Error': ''})
+    return merged[OUTPUT_COLUMNS]
+
+def run_shard(shard_path, part_path, shard_index, shard_count, options, api_keys, rate_share):
+    """Processes one shard file; runs inside a worker process."""
+    configure_client(api_keys, rate_share)
+    results_df = process_files(
+        product_type_path=None,
+        sample_file_path=shard_path,
+        use_previous=True,
+        categorized_df=None,
+        async_mode=options['async_mode'],
+        max_concurrency=options['max_concurrency'],
+        batch_size=options['batch_size'],
+        resume=options['resume'],
+        catalog_path=options['catalog_path']
+    )
+    write_part(results_df, part_path, shard_index, shard_count)
+    run_stats = results_df.attrs['run_stats']
+    return len(results_df), run_stats['report'], run_stats['report_path']
+
+def finish_report(run_metrics, reports, path):
+    """Combines the shard reports with this process's catalog and output stages and saves them."""
+    report = combine_reports([run_metrics.report()] + reports)
+    path = save_report(report, path)
+    if path:
+        print(f"Run report saved to '{path}'.")
+
+def run(args):
+    # Collects the catalog and output stages; process_files tracks each shard's own run
+    run_metrics = start_run()
+    options = {
+        'async_mode': args.async_mode,
+        'max_concurrency': args.concurrency,
+        'batch_size': args.batch_size,
+        'resume': args.resume,
+        'catalog_path': args.catalog
+    }
+
+    # The catalog is categorized once here; every shard then reads the saved file
+    if args.product_types:
+        update_catalog(args.product_types, args.catalog)
+    elif not os.path.exists(args.catalog):
+        raise ValueError(f"No saved catalog at '{args.catalog}'. Pass --product-types to build one.")
+
+    api_keys = load_api_keys()
+
+    if args.shard is None and args.processes <= 1:
+        configure_client(api_keys, args.rate_share or 1.0)
+        results_df = process_files(None, args.sample, True, None, **options, progress_callback=print)
+        with run_metrics.stage('output_write'):
+            write_output(results_df, args.output)
+        print(f"Wrote {len(results_df)} rows to '{args.output}'.")
+        run_stats = results_df.attrs['run_stats']
+        finish_report(run_metrics, [run_stats['report']], args.report or run_stats['report_path'])
+        return
+
+    work_dir = args.work_dir or f"{os.path.splitext(args.output)[0]}_shards"
+
+    if args.shard is not None:
+        # One shard of a split that other machines run too
+        shard_index, shard_count = args.shard
+        if os.path.splitext(args.output)[1].lower() != '.parquet':
+            raise ValueError("Shard results must be written as .parquet so 'cli.py merge' can order them.")
+        with run_metrics.stage('file_load'):
+            shard_paths = split_sample_file(args.sample, work_dir, shard_count)
+        share = args.rate_share or 1.0
+        rows, report, report_path = run_shard(shard_paths[shard_index - 1], args.output, shard_index,
+                                              shard_count, options, api_keys, share)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"Wrote {rows} rows of shard {shard_index}/{shard_count} to '{args.output}'.")
+        # Replaces the shard's own process_files report with the one that includes this process's stages
+        finish_report(run_metrics, [report], args.report or report_path)
+        return
+
+    shard_count = args.processes
+    with run_metrics.stage('file_load'):
+        shard_paths = split_sample_file(args.sample, work_dir, shard_count)
+    part_paths = [f"{os.path.splitext(path)[0]}.parquet" for path in shard_paths]
+
+    # Spawned (not forked) workers start with fresh clients, pools and cache connections
+    with ProcessPoolExecutor(max_workers=shard_count, mp_context=get_context('spawn')) as executor:
+        futures = {}
+        for k in range(shard_count):
+            keys, share = shard_api_keys(api_keys, k, shard_count)
+            if args.rate_share:
+                share = args.rate_share
+            future = executor.submit(run_shard, shard_paths[k], part_paths[k], k + 1, shard_count,
+                                     options, keys, share)
+            futures[future] = k + 1
+        reports = []
+        for future in as_completed(futures):
+            rows, report, _ = future.result()
+            reports.append(report)
+            print(f"Shard {futures[future]}/{shard_count} finished: {rows} rows.")
+
+    with run_metrics.stage('output_write'):
+        results_df = merge_parts(part_paths)
+        write_output(results_df, args.output)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"Wrote {len(results_df)} rows to '{args.output}'.")
+    finish_report(run_metrics, reports, args.report)
+
+def merge(args):
+    results_df = merge_parts(args.parts)
+    write_output(results_df, args.output)
+    print(f"Merged {len(args.parts)} shards ({len(results_df)} rows) into '{args.output}'.")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Categorize and match products without the GUI.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Process a sample file.")
+    run_parser.add_argument('sample', help="Sample file (.xlsx, .xls, .csv or .parquet).")
+    run_parser.add_argument('-o', '--output', required=True, help="Result file (.xlsx, .csv or .parquet).")
+    run_parser.add_argument('--product-types', help="Product type file; updates the saved catalog first. "
+                                                    "Without it the saved catalog is used as is.")
+    run_parser.add_argument('--catalog', default=CATALOG_PATH, help="Saved catalog (default: %(default)s).")
+    run_parser.add_argument('--processes', type=int, default=1,
+                            help="Worker processes the sample is split across (default: %(default)s).")
+    run_parser.add_argument('--shard', type=parse_shard, metavar='INDEX/COUNT',
+                            help="Process only this shard of the sample, e.g. 2/4, for runs across machines.")
+    run_parser.add_argument('--rate-share', type=float,
+                            help="Fraction of each key's RPM/TPM limits this run may use "
+                                 "(default: split evenly between --processes).")
+    run_parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY,
+                            help="Rows in flight per process (default: %(default)s).")
+    run_parser.add_argument('--batch-size', type=int, default=SAMPLE_BATCH_SIZE,
+                            help="Rows per batched request, 0 for one request per row (default: %(default)s).")
+    # Async by default here, whatever ASYNC_MODE says, so --concurrency takes effect
+    run_parser.add_argument('--async', dest='async_mode', action='store_true', default=True,
+                            help="Keep --concurrency rows in flight (the default).")
+    run_parser.add_argument('--sync', dest='async_mode', action='store_false',
+                            help="Process rows one at a time; --concurrency is not used.")
+    run_parser.add_argument('--no-resume', dest='resume', action='store_false',
+                            help="Discard rows journaled by an interrupted run.")
+    run_parser.add_argument('--work-dir', help="Where shard files are kept during the run "
+                                               "(default: next to the output).")
+    run_parser.add_argument('--report', help="Write the JSON run report here (default: a new file in "
+                                             "RUN_REPORT_DIR).")
+    run_parser.set_defaults(handler=run)
+
+    merge_parser = commands.add_parser('merge', help="Merge shard results into one file.")
+    merge_parser.add_argument('parts', nargs='+', help="Shard results written by 'run --shard'.")
+    merge_parser.add_argument('-o', '--output', required=True, help="Result file (.xlsx, .csv or .parquet).")
+    merge_parser.set_defaults(handler=merge)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
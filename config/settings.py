@@ -0,0 +1,102 @@
+# config/settings.py
+
+import os
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'keys.env')
+
+load_dotenv(CONFIG_PATH)
+
+# LLM provider
+BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+MODEL_NAME = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+
+# Model cascade: each prompt goes to the first model, and an answer that fails validation
+# (unknown category, unresolved product, malformed title) to the next one
+MODEL_TIERS = [model.strip() for model in os.getenv("LLM_TIERS", MODEL_NAME).split(',') if model.strip()]
+# Per prompt overrides, e.g. LLM_TIERS_CATEGORY=llama-3.1-8b-instant,llama-3.3-70b-versatile
+STAGE_MODEL_TIERS = {
+    prompt: [model.strip() for model in os.getenv(f"LLM_TIERS_{prompt.upper()}").split(',') if model.strip()]
+    for prompt in ('product_info', 'product_info_fields', 'product_info_batch', 'categories', 'category',
+                   'category_batch', 'similar_products')
+    if os.getenv(f"LLM_TIERS_{prompt.upper()}")
+}
+# USD per million prompt/completion tokens, for the per-tier cost in run reports
+MODEL_PRICES = os.getenv("LLM_PRICES", "llama-3.1-8b-instant=0.05/0.08,llama-3.3-70b-versatile=0.59/0.79")
+
+# Async sample processing
+ASYNC_MODE = os.getenv("ASYNC_MODE", "0") == "1"
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))  # Sample rows kept in flight
+
+# Shared LLM client (limits apply per API key)
+RPM_PER_KEY = int(os.getenv("RPM_PER_KEY", "30"))        # Requests per minute
+TPM_PER_KEY = int(os.getenv("TPM_PER_KEY", "20000"))     # Tokens per minute
+POOL_CONNECTIONS = int(os.getenv("POOL_CONNECTIONS", "20"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))         # Retries after a 429 or connection error
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))  # Used when no Retry-After is sent
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))       # Seconds one request attempt may take
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "300"))    # Seconds one call may take, retries and waits included; 0 disables
+HEDGE_ENABLED = os.getenv("HEDGE", "1") == "1"            # Duplicate requests running past the latency percentile
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # Latencies observed before hedging starts
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))     # Consecutive failed requests that pause dispatch; 0 disables
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # Seconds dispatch stays paused
+
+# Persistent LLM response cache
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"      # Set to 0 to bypass the cache
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, 'cache', 'llm_cache.sqlite3'))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500000"))
+CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+
+# Local similarity shortlist in front of product matching
+SHORTLIST_ENABLED = os.getenv("SHORTLIST", "1") == "1"
+SHORTLIST_TOP_K = int(os.getenv("SHORTLIST_TOP_K", "25"))            # Candidates sent to the LLM
+SHORTLIST_ACCEPT_SCORE = float(os.getenv("SHORTLIST_ACCEPT_SCORE", "0.8"))  # Skip the LLM above this score...
+SHORTLIST_MARGIN = float(os.getenv("SHORTLIST_MARGIN", "0.15"))      # ...when the runner-up is this far behind
+
+# Batched sample processing (titles and categories for many rows per request)
+SAMPLE_BATCH_SIZE = int(os.getenv("SAMPLE_BATCH_SIZE", "0"))   # 0 sends one request per row
+BATCH_MAX_ROUNDS = int(os.getenv("BATCH_MAX_ROUNDS", "3"))     # Re-queue rounds before per-row fallback
+
+# Streaming input reader
+READ_CHUNK_SIZE = int(os.getenv("READ_CHUNK_SIZE", "1000"))    # Rows read from an input file at a time
+
+# Checkpoint journal of finished sample rows
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", os.path.join(BASE_DIR, 'journal'))
+JOURNAL_SYNC_ROWS = int(os.getenv("JOURNAL_SYNC_ROWS", "500"))  # Rows written between fsyncs (also every PROGRESS_INTERVAL)
+
+# Catalog categorization
+CATEGORIZE_CONCURRENCY = int(os.getenv("CATEGORIZE_CONCURRENCY", "4"))    # Batches in flight
+CATEGORIZE_BATCH_TOKENS = int(os.getenv("CATEGORIZE_BATCH_TOKENS", "3000"))  # Estimated prompt + answer tokens per batch
+CATEGORIZE_MAX_BATCH_SIZE = int(os.getenv("CATEGORIZE_MAX_BATCH_SIZE", "150"))
+CATEGORIZE_MAX_ATTEMPTS = int(os.getenv("CATEGORIZE_MAX_ATTEMPTS", "4"))   # Per product
+CATEGORIZE_STREAM = os.getenv("CATEGORIZE_STREAM", "1") == "1"  # Parse categorization answers as they are generated
+
+# Saved catalog (categorized product types) that new product type files are diffed against
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join(BASE_DIR, 'catalog', 'catalog.json'))
+
+# Run metrics
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", os.path.join(BASE_DIR, 'reports'))  # Empty disables JSON run reports
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))             # Serves Prometheus text on /metrics; 0 disables
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")         # Interface the metrics endpoint listens on; 0.0.0.0 for all
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1.0"))  # Seconds between progress messages
+
+# Local category classifier in front of the category lookup LLM call
+CLASSIFIER_ENABLED = os.getenv("CLASSIFIER", "1") == "1"
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", "0.9"))     # Skip the LLM at or above this confidence
+CLASSIFIER_HOLDOUT = float(os.getenv("CLASSIFIER_HOLDOUT", "0.05"))        # Share of confident rows still checked by the LLM
+CLASSIFIER_MIN_EXAMPLES = int(os.getenv("CLASSIFIER_MIN_EXAMPLES", "200"))  # Smaller catalogs are not trained on
+CLASSIFIER_MAX_EXAMPLES = int(os.getenv("CLASSIFIER_MAX_EXAMPLES", "50000"))  # Catalog rows sampled for training
+
+# Local title field extractor in front of the title generation LLM call
+EXTRACTOR_ENABLED = os.getenv("EXTRACTOR", "1") == "1"
+EXTRACTOR_REQUIRED_FIELDS = os.getenv("EXTRACTOR_REQUIRED_FIELDS", "product_type,make,model").split(',')  # Missing ones are asked from the LLM
+EXTRACTOR_GAZETTEER = os.getenv("EXTRACTOR_GAZETTEER", "")     # JSON {make: [models]} added to the built-in list
+
+# Persistent memo of resolved rows, reused for near-identical titles in later runs
+MEMO_ENABLED = os.getenv("MEMO", "1") == "1" and CACHE_ENABLED   # LLM_CACHE=0 bypasses the memo too
+MEMO_PATH = os.getenv("MEMO_PATH", os.path.join(BASE_DIR, 'cache', 'result_memo.sqlite3'))
+MEMO_THRESHOLD = float(os.getenv("MEMO_THRESHOLD", "0.85"))    # Character n-gram Jaccard similarity needed to reuse a row
+MEMO_MAX_ENTRIES = int(os.getenv("MEMO_MAX_ENTRIES", "100000"))
+MEMO_MAX_AGE_DAYS = int(os.getenv("MEMO_MAX_AGE_DAYS", "180"))  # Rows are resolved again at least this often
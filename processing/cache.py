@@ -0,0 +1,133 @@
+# processing/cache.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from config.settings import CACHE_ENABLED, CACHE_MAX_AGE_DAYS, CACHE_MAX_ENTRIES, CACHE_PATH
+
+def normalize_input(text):
+    """Collapses whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r'\s+', ' ', str(text)).strip()
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses.
+    Entries expire after `max_age_days` and the least recently used entries
+    are evicted once the cache holds more than `max_entries`.
+    """
+
+    def __init__(self, path=CACHE_PATH, enabled=CACHE_ENABLED,
+                 max_entries=CACHE_MAX_ENTRIES, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.writes_since_evict = 0
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Sharded runs write from several processes; wait on their locks instead of failing
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(stage, template_version, model, temperature, cache_input):
+        """Hashes everything that determines the response of a call."""
+        payload = json.dumps(
+            [stage, template_version, model, temperature, normalize_input(cache_input)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response text, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self.conn.commit()
+            self.writes_since_evict += 1
+            if self.writes_since_evict < 1000:
+                return
+        self.evict()
+
+    def evict(self):
+        """Drops expired entries and trims the cache down to `max_entries`."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.writes_since_evict = 0
+            if self.max_age:
+                self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            if self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self.conn.commit()
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the shared ResponseCache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
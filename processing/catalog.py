@@ -0,0 +1,53 @@
+# processing/catalog.py
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from config.settings import CATALOG_PATH
+from processing.cache import normalize_input
+
+def product_hash(product, prompt_version, models):
+    """
+    Hash identifying one categorization: the product text plus the prompt version
+    and the model tiers that categorized it (first to last), so a prompt or model
+    change counts as changed. A single model hashes as before tiers existed.
+    """
+    payload = f"{','.join(models)}\t{prompt_version}\t{normalize_input(product)}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def catalog_fingerprint(hashes):
+    """Order-independent fingerprint of a whole catalog."""
+    digest = hashlib.sha256()
+    for value in sorted(hashes):
+        digest.update(value.encode('ascii'))
+    return digest.hexdigest()
+
+def load_catalog(path=CATALOG_PATH):
+    """
+    Loads the saved catalog as a DataFrame with Product, Category and Hash
+    columns (fingerprint in df.attrs), or returns None if there is none.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    df = pd.DataFrame(data['products'], columns=['Product', 'Category', 'Hash'])
+    df.attrs['fingerprint'] = data['fingerprint']
+    return df
+
+def save_catalog(df, path=CATALOG_PATH):
+    """Writes the catalog atomically so a crash never leaves a half-written file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    products = df[['Product', 'Category', 'Hash']].values.tolist()
+    data = {
+        'fingerprint': catalog_fingerprint(df['Hash']),
+        'products': products
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return data['fingerprint']
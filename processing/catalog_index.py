@@ -0,0 +1,73 @@
+# processing/catalog_index.py
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from processing.matcher import KeywordMatcher
+
+class CatalogIndex:
+    """
+    Read-only index of a categorized catalog, built once per run and shared by
+    every row and worker.
+
+    Categories are interned and numbered in order of first appearance (the
+    order of df['Category'].unique()), and each category's products are kept
+    as one tuple in catalog order, so looking them up is a dict access rather
+    than a scan of the catalog. The category list is joined into prompt text
+    once; with `product_prompts` so is every category's product list, for runs
+    that send whole categories to the LLM instead of a shortlist.
+    """
+
+    def __init__(self, df, product_prompts=False):
+        codes, categories = pd.factorize(df['Category'], sort=False)
+        self.categories = tuple(sys.intern(str(category)) for category in categories)
+        self.codes = {category: code for code, category in enumerate(self.categories)}
+
+        # Group the products by category code without a pass per category; rows
+        # without a category (code -1) sort first and fall outside every group
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(self.categories) + 1))
+        products = df['Product'].to_numpy(dtype=object)[order]
+        self.products = tuple(
+            tuple(products[start:end].tolist()) for start, end in zip(bounds[:-1], bounds[1:])
+        )
+
+        self.categories_text = ', '.join(self.categories)
+        self.category_matcher = KeywordMatcher(self.categories)
+        self.products_texts = tuple(', '.join(group) for group in self.products) if product_prompts else None
+
+    def __len__(self):
+        return sum(len(group) for group in self.products)
+
+    def groups(self):
+        """(category, products) pairs in category code order."""
+        return zip(self.categories, self.products)
+
+    def category_products(self, category):
+        """The products of `category` in catalog order; empty for an unknown category."""
+        code = self.codes.get(category)
+        return self.products[code] if code is not None else ()
+
+    def products_text(self, category):
+        """The products of `category` joined for a prompt."""
+        code = self.codes.get(category)
+        if code is None:
+            return ''
+        if self.products_texts is not None:
+            return self.products_texts[code]
+        return ', '.join(self.products[code])
+
+    def has_product(self, category, product):
+        """
+        True when `product` is one of the products of `category`. Scans the
+        category's tuple, which only result memo hits ask for, rather than
+        keeping a second copy of every category as a set.
+        """
+        code = self.codes.get(category)
+        return code is not None and product in self.products[code]
+
+    def find_category(self, text):
+        """The first-listed category named in an LLM answer, or None."""
+        return self.category_matcher.find_exact(text)
@@ -0,0 +1,192 @@
+# processing/classifier.py
+
+import hashlib
+import math
+import threading
+from collections import Counter
+
+import numpy as np
+
+from config.settings import (
+    CLASSIFIER_HOLDOUT, CLASSIFIER_MAX_EXAMPLES, CLASSIFIER_THRESHOLD
+)
+from processing.similarity import char_ngrams
+from utils.helpers import normalize_title
+
+NGRAM_SIZES = (3, 4)
+EPOCHS = 10
+BATCH_ROWS = 256
+LEARNING_RATE = 1.0
+L2_PENALTY = 1e-6
+VALIDATION_SHARE = 0.1  # Catalog rows held out to measure accuracy
+
+def text_features(text, ngram_sizes=NGRAM_SIZES):
+    """Character n-gram counts of a text."""
+    grams = Counter()
+    for n in ngram_sizes:
+        grams.update(char_ngrams(text, n))
+    return grams
+
+def in_holdout(text, fraction):
+    """Deterministically puts `fraction` of all titles in the holdout set."""
+    digest = hashlib.md5(normalize_title(text).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'little') / 2 ** 32 < fraction
+
+def softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+class CategoryClassifier:
+    """
+    Softmax regression over TF-IDF weighted character n-grams, trained on the
+    categorized catalog (Product -> Category).
+
+    Sample rows it classifies with at least `threshold` confidence skip the
+    category LLM call. A deterministic `holdout` share of those rows is still
+    sent to the LLM so the agreement between the two can be reported.
+    """
+
+    def __init__(self, df, threshold=CLASSIFIER_THRESHOLD, holdout=CLASSIFIER_HOLDOUT,
+                 max_examples=CLASSIFIER_MAX_EXAMPLES, seed=0):
+        self.threshold = threshold
+        self.holdout = holdout
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.local_rows = 0
+        self.holdout_rows = 0
+        self.holdout_agreed = 0
+
+        rng = np.random.default_rng(seed)
+        # Sorted so the model does not depend on the order categorization returned the catalog in
+        examples = df[['Product', 'Category']].dropna().sort_values(['Product', 'Category'], kind='stable')
+        if len(examples) > max_examples:
+            examples = examples.iloc[np.sort(rng.choice(len(examples), max_examples, replace=False))]
+        texts = examples['Product'].astype(str).tolist()
+        self.categories = sorted(examples['Category'].unique())
+        category_ids = {category: i for i, category in enumerate(self.categories)}
+        labels = np.array([category_ids[category] for category in examples['Category']], dtype=np.int64)
+
+        validation = rng.random(len(texts)) < VALIDATION_SHARE
+        if validation.all():
+            validation[:] = False
+        train_texts = [text for text, held in zip(texts, validation) if not held]
+        grams = [text_features(text) for text in train_texts]
+
+        # Feature 0 is a bias that every row has
+        document_frequency = Counter()
+        for row in grams:
+            document_frequency.update(row.keys())
+        self.vocabulary = {gram: i + 1 for i, gram in enumerate(document_frequency)}
+        total = len(grams)
+        self.idf = np.ones(len(self.vocabulary) + 1, dtype=np.float32)
+        for gram, i in self.vocabulary.items():
+            self.idf[i] = math.log((1 + total) / (1 + document_frequency[gram])) + 1.0
+
+        self.weights = np.zeros((len(self.vocabulary) + 1, len(self.categories)), dtype=np.float32)
+        self._fit(self._vectorize(grams), labels[~validation], seed)
+
+        self.validation_size = int(validation.sum())
+        self.validation_accuracy = None
+        self.validation_coverage = None
+        self.validation_confident_accuracy = None
+        if self.validation_size:
+            held_texts = [text for text, held in zip(texts, validation) if held]
+            predicted, confidence = self.predict(held_texts)
+            correct = predicted == labels[validation]
+            confident = confidence >= self.threshold
+            self.validation_accuracy = float(correct.mean())
+            self.validation_coverage = float(confident.mean())
+            self.validation_confident_accuracy = float(correct[confident].mean()) if confident.any() else None
+
+    def _vectorize(self, grams):
+        """Sparse rows as (feature ids, values, row offsets) with L2-normalized TF-IDF values."""
+        ids, values, offsets = [], [], [0]
+        for row in grams:
+            row_ids = [0] + [self.vocabulary[gram] for gram in row if gram in self.vocabulary]
+            row_values = np.log1p([1] + [count for gram, count in row.items() if gram in self.vocabulary])
+            row_values = row_values * self.idf[row_ids]
+            row_values[1:] /= np.linalg.norm(row_values[1:]) or 1.0
+            ids.extend(row_ids)
+            values.extend(row_values)
+            offsets.append(len(ids))
+        return (np.array(ids, dtype=np.int64), np.array(values, dtype=np.float32),
+                np.array(offsets, dtype=np.int64))
+
+    def _logits(self, ids, values, offsets):
+        return np.add.reduceat(self.weights[ids] * values[:, None], offsets[:-1], axis=0)
+
+    def _fit(self, rows, labels, seed):
+        """Mini-batch AdaGrad on the cross-entropy loss; only the n-grams in a batch are updated."""
+        ids, values, offsets = rows
+        count = len(offsets) - 1
+        rng = np.random.default_rng(seed)
+        squared = np.full(self.weights.shape, 1e-8, dtype=np.float32)
+        lengths = np.diff(offsets)
+        for _ in range(EPOCHS):
+            order = rng.permutation(count)
+            for start in range(0, count, BATCH_ROWS):
+                batch = order[start:start + BATCH_ROWS]
+                batch_lengths = lengths[batch]
+                batch_offsets = np.concatenate([[0], np.cumsum(batch_lengths)])
+                positions = np.arange(batch_offsets[-1]) + np.repeat(offsets[batch] - batch_offsets[:-1],
+                                                                      batch_lengths)
+                batch_ids, batch_values = ids[positions], values[positions]
+
+                errors = softmax(np.add.reduceat(self.weights[batch_ids] * batch_values[:, None],
+                                                 batch_offsets[:-1], axis=0))
+                errors[np.arange(len(batch)), labels[batch]] -= 1.0
+                per_value = errors[np.repeat(np.arange(len(batch)), batch_lengths)] * batch_values[:, None]
+
+                features, inverse = np.unique(batch_ids, return_inverse=True)
+                gradient = np.stack(
+                    [np.bincount(inverse, weights=per_value[:, c], minlength=len(features))
+                     for c in range(per_value.shape[1])],
+                    axis=1
+                ) / len(batch) + L2_PENALTY * self.weights[features]
+                squared[features] += gradient ** 2
+                self.weights[features] -= LEARNING_RATE * gradient / np.sqrt(squared[features])
+
+    def predict(self, texts):
+        """Returns (category ids, confidences) for a list of texts."""
+        probabilities = softmax(self._logits(*self._vectorize(text_features(text) for text in texts)))
+        return probabilities.argmax(axis=1), probabilities.max(axis=1)
+
+    def decide(self, product_title):
+        """
+        Returns (category, audit). `category` is set when the LLM call can be
+        skipped; `audit` is set for holdout rows and should be passed to
+        record_audit together with the category the LLM settles on.
+        """
+        predicted, confidence = self.predict([product_title])
+        category = self.categories[predicted[0]]
+        with self.lock:
+            self.rows += 1
+            if confidence[0] < self.threshold:
+                return None, None
+            if in_holdout(product_title, self.holdout):
+                self.holdout_rows += 1
+                return None, category
+            self.local_rows += 1
+        return category, None
+
+    def record_audit(self, predicted_category, llm_category):
+        """Compares a holdout prediction with the LLM's category."""
+        with self.lock:
+            if predicted_category == llm_category:
+                self.holdout_agreed += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'category_lookups': self.rows,
+                'answered_locally': self.local_rows,
+                'llm_avoidance_rate': self.local_rows / self.rows if self.rows else 0.0,
+                'holdout_rows': self.holdout_rows,
+                'holdout_agreement': self.holdout_agreed / self.holdout_rows if self.holdout_rows else None,
+                'threshold': self.threshold,
+                'catalog_validation_rows': self.validation_size,
+                'catalog_validation_accuracy': self.validation_accuracy,
+                'catalog_validation_coverage': self.validation_coverage,
+                'catalog_validation_confident_accuracy': self.validation_confident_accuracy
+            }
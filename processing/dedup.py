@@ -0,0 +1,40 @@
+# processing/dedup.py
+
+from utils.helpers import normalize_title
+
+class TitleDeduplicator:
+    """
+    Groups sample rows by normalized title so each unique title is processed once.
+    `results` maps a title key to the first row's result (or its pending task in
+    async mode), which is then fanned out to every later copy.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.rows = 0
+
+    def lookup(self, title, key=None):
+        """
+        Counts the row and returns (key, earlier result or None).
+        `key` is the title's normalized key when it was already computed.
+        """
+        self.rows += 1
+        if key is None:
+            key = normalize_title(title)
+        return key, self.results.get(key)
+
+    def add(self, key, result):
+        self.results[key] = result
+
+    def discard(self, key, result):
+        """Stops sharing `result` (e.g. a failed row) with later copies of its title."""
+        if self.results.get(key) is result:
+            del self.results[key]
+
+    def stats(self):
+        unique = len(self.results)
+        return {
+            'rows': self.rows,
+            'unique_titles': unique,
+            'dedup_ratio': 1 - unique / self.rows if self.rows else 0.0
+        }
@@ -0,0 +1,273 @@
+# processing/extractor.py
+
+import json
+import re
+from functools import lru_cache
+
+from config.settings import EXTRACTOR_GAZETTEER, EXTRACTOR_REQUIRED_FIELDS
+
+# Title fields in output order; MODECAR is inserted after the product type
+FIELDS = ('product_type', 'make', 'model', 'years', 'details', 'part_number')
+
+FIELD_LABELS = {
+    'product_type': 'product type',
+    'make': 'car make',
+    'model': 'car model',
+    'years': 'year range',
+    'details': 'additional information',
+    'part_number': 'part number'
+}
+
+# Car makes and the models the extractor recognizes. Models that are also
+# common words are left out, since a model found without its make sets the make.
+CAR_MAKES = {
+    "Alfa Romeo": ["147", "156", "159", "Giulietta", "Mito"],
+    "Audi": ["A1", "A3", "A4", "A5", "A6", "A8", "Q3", "Q5", "Q7", "TT"],
+    "BMW": ["Seria 1", "Seria 3", "Seria 5", "Seria 7", "X1", "X3", "X5", "X6", "E46", "E60", "E90", "F10",
+            "F30"],
+    "Chevrolet": ["Aveo", "Captiva", "Cruze", "Lacetti"],
+    "Citroen": ["Berlingo", "C3", "C4", "C5", "Jumper", "Xsara"],
+    "Dacia": ["Dokker", "Duster", "Lodgy", "Logan", "Sandero", "Solenza"],
+    "Fiat": ["500", "Doblo", "Ducato", "Grande Punto", "Panda", "Punto", "Stilo", "Tipo"],
+    "Ford": ["C-Max", "Fiesta", "Focus", "Kuga", "Mondeo", "S-Max", "Transit"],
+    "Honda": ["Accord", "Civic", "CR-V"],
+    "Hyundai": ["Accent", "Getz", "i10", "i20", "i30", "ix35", "Santa Fe", "Tucson"],
+    "Kia": ["Ceed", "Picanto", "Rio", "Sorento", "Sportage"],
+    "Mazda": ["CX-5", "Mazda 3", "Mazda 6"],
+    "Mercedes": ["Clasa A", "Clasa B", "Clasa C", "Clasa E", "Clasa S", "Sprinter", "Vito", "Viano", "ML",
+                 "GLK"],
+    "Mitsubishi": ["ASX", "Lancer", "Outlander", "Pajero"],
+    "Nissan": ["Juke", "Micra", "Navara", "Primera", "Qashqai", "X-Trail"],
+    "Opel": ["Astra", "Corsa", "Insignia", "Meriva", "Mokka", "Vectra", "Vivaro", "Zafira"],
+    "Peugeot": ["206", "207", "208", "306", "307", "308", "406", "407", "508", "Boxer"],
+    "Renault": ["Clio", "Kangoo", "Laguna", "Megane", "Scenic"],
+    "Seat": ["Altea", "Cordoba", "Ibiza", "Leon", "Toledo"],
+    "Skoda": ["Fabia", "Octavia", "Roomster", "Yeti"],
+    "Suzuki": ["Grand Vitara", "Ignis", "Jimny", "Swift", "SX4", "Vitara"],
+    "Toyota": ["Auris", "Avensis", "Corolla", "Hilux", "RAV4", "Yaris"],
+    "Volvo": ["S40", "S60", "S80", "V40", "V50", "V70", "XC60", "XC90"],
+    "VW": ["Bora", "Caddy", "Crafter", "Golf", "Jetta", "Passat", "Polo", "Sharan", "Tiguan", "Touareg",
+           "Touran", "Transporter"]
+}
+
+MAKE_ALIASES = {
+    "volkswagen": "VW",
+    "mercedes-benz": "Mercedes",
+    "mercedes benz": "Mercedes",
+    "alfa": "Alfa Romeo",
+    "citroën": "Citroen",
+    "škoda": "Skoda"
+}
+
+# Part manufacturers, which end the product type ('filtru ulei bosch' is a 'filtru ulei')
+PART_BRANDS = [
+    "Aisin", "ATE", "Bilstein", "Blue Print", "Bosch", "Brembo", "Castrol", "Champion", "Contitech", "Corteco",
+    "Dayco", "Delphi", "Denso", "Elring", "Exedy", "Febi", "Febi Bilstein", "Ferodo", "Filtron", "Gates", "Hella",
+    "Hengst", "INA", "Jurid", "KYB", "Knecht", "Lemforder", "Liqui Moly", "Lucas", "LUK", "Magneti Marelli",
+    "Mahle", "Mann", "Mann-Filter", "Meyle", "Mintex", "Monroe", "Moog", "Motul", "NGK", "Nissens", "NRF",
+    "Optimal", "Osram", "Pagid", "Philips", "Pierburg", "Purflo", "Ruville", "Sachs", "SKF", "SNR", "Swag",
+    "Textar", "Topran", "TRW", "Vaico", "Valeo", "Varta", "Vemo", "Victor Reinz", "Zimmermann"
+]
+
+YEAR_RANGE_PATTERN = re.compile(r'\b((?:19|20)\d{2})\s*[-–/]\s*((?:19|20)\d{2})\b')
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+# The start of a word with a digit, e.g. a part number fragment or a size
+DIGIT_WORD_PATTERN = re.compile(r'(?<!\S)[^\s\d]*\d')
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9./-]*[A-Za-z0-9]')
+# Words that introduce a part number
+PART_MARKER_PATTERN = re.compile(r'\b(?:cod|code|ref|oe|oem|nr|p/n|part)\b[\s.:#-]*$', re.IGNORECASE)
+# Sizes, capacities and engine codes that look like part numbers
+NOT_PART_PATTERN = re.compile(
+    r'^(?:\d+(?:[.,]\d+)?(?:mm|cm|m|l|ml|v|w|kw|cp|hp|ah|nm|buc|kg|g)|\d[.,]\d.*|(?:19|20)\d{2}.*)$',
+    re.IGNORECASE
+)
+# Connecting words dropped from the additional information
+FILLER_WORDS = {'pentru', 'cod', 'code', 'ref', 'oe', 'oem', 'nr', 'de', 'la', 'si', 'și', 'cu', 'compatibil',
+                'an', 'model', 'part', 'p/n', '-', '/'}
+
+def format_title(fields):
+    """Builds the '[product type], MODECAR, [car make], ...' line, with 'null' for missing fields."""
+    values = [fields.get(name) or 'null' for name in FIELDS]
+    return ', '.join(values[:1] + ['MODECAR'] + values[1:])
+
+def missing_fields(fields, required=EXTRACTOR_REQUIRED_FIELDS):
+    """Required fields the extractor did not find, in output order."""
+    return [name for name in FIELDS if name in required and not fields.get(name)]
+
+def answer_value(part):
+    part = part.strip()
+    return None if not part or part.lower() == 'null' else part
+
+def parse_fields_answer(answer, names):
+    """
+    Parses a comma separated answer for the fields `names` into {field: value},
+    or None when it does not have exactly one part per field.
+    """
+    parts = answer.strip().split('\n')[0].split(',')
+    if len(parts) != len(names):
+        return None
+    return {name: answer_value(part) for name, part in zip(names, parts)}
+
+def parse_title_answer(answer):
+    """
+    Parses a full 7-part title answer into {field: value}, or None when it has
+    fewer parts. Extra commas are kept in the additional information.
+    """
+    parts = answer.strip().split('\n')[0].split(',')
+    if len(parts) < 7:
+        return None
+    return {
+        'product_type': answer_value(parts[0]),
+        'make': answer_value(parts[2]),
+        'model': answer_value(parts[3]),
+        'years': answer_value(parts[4]),
+        'details': answer_value(','.join(parts[5:-1])),
+        'part_number': answer_value(parts[-1])
+    }
+
+def merge_fields(fields, answer_fields, names):
+    """Fills the fields `names` from an LLM answer; fields found locally are kept."""
+    for name in names:
+        if not fields.get(name) and answer_fields.get(name):
+            fields[name] = answer_fields[name]
+    return fields
+
+def alternation(names):
+    """A regex alternation matching any of `names` as whole words, longest first."""
+    escaped = [re.escape(name).replace(r'\ ', r'[\s-]+').replace(r'\-', r'[\s-]?')
+               for name in sorted(names, key=len, reverse=True)]
+    return re.compile(r'(?<![\w-])(' + '|'.join(escaped) + r')(?![\w-])', re.IGNORECASE)
+
+def match_key(text):
+    return ' '.join(text.lower().replace('-', ' ').split())
+
+class TitleExtractor:
+    """
+    Finds title fields in a product description without the LLM: years, part
+    numbers and car makes and models from a gazetteer. The product type is the
+    text before the first of those, up to a part brand or a word with digits,
+    and the words left over are the additional information. Patterns are
+    compiled once per gazetteer.
+    """
+
+    def __init__(self, makes=CAR_MAKES, aliases=MAKE_ALIASES, brands=PART_BRANDS):
+        self.gazetteer = makes
+        self.makes = {match_key(make): make for make in makes}
+        self.makes.update({match_key(alias): make for alias, make in aliases.items()})
+        self.make_pattern = alternation(list(makes) + list(aliases))
+        self.model_patterns = {make: alternation(models) for make, models in makes.items() if models}
+        self.brand_pattern = alternation(brands)
+
+        # A model listed for one make only identifies the make on its own
+        owners = {}
+        for make, models in makes.items():
+            for model in models:
+                owners.setdefault(match_key(model), set()).add(make)
+        self.models = {
+            match_key(model): (make, model)
+            for make, models in makes.items() for model in models
+            if len(owners[match_key(model)]) == 1 and not model.isdigit()
+        }
+        self.model_pattern = alternation([model for _, model in self.models.values()]) if self.models else None
+
+    def find_part_number(self, text, taken):
+        """The token after a part number marker, else the first code-like token; with its span."""
+        fallback = None
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group(0)
+            if (len(token) < 5 or not any(char.isdigit() for char in token) or NOT_PART_PATTERN.match(token)
+                    or any(start < match.end() and match.start() < end for start, end in taken)):
+                continue
+            if PART_MARKER_PATTERN.search(text[:match.start()]):
+                return token, match.span()
+            if fallback is None and (any(char.isalpha() for char in token) or len(token) >= 6):
+                fallback = token, match.span()
+        return fallback if fallback is not None else (None, None)
+
+    def extract(self, text):
+        """Returns {field: value or None} for the fields found in `text`."""
+        fields = dict.fromkeys(FIELDS)
+        spans = []
+
+        years = YEAR_RANGE_PATTERN.search(text)
+        if years:
+            fields['years'] = f"{years.group(1)}-{years.group(2)}"
+            spans.append(years.span())
+        else:
+            year = YEAR_PATTERN.search(text)
+            if year:
+                fields['years'] = year.group(0)
+                spans.append(year.span())
+
+        make = self.make_pattern.search(text)
+        if make:
+            fields['make'] = self.makes[match_key(make.group(1))]
+            spans.append(make.span())
+            pattern = self.model_patterns.get(fields['make'])
+            model = pattern.search(text, make.end()) or pattern.search(text) if pattern else None
+            if model:
+                fields['model'] = self.canonical_model(fields['make'], model.group(1))
+                spans.append(model.span())
+        elif self.model_pattern is not None:
+            model = self.model_pattern.search(text)
+            if model:
+                fields['make'], fields['model'] = self.models[match_key(model.group(1))]
+                spans.append(model.span())
+
+        part_number, span = self.find_part_number(text, spans)
+        if part_number:
+            fields['part_number'] = part_number
+            spans.append(span)
+
+        if spans:
+            start, end = self.product_type_span(text, min(start for start, _ in spans))
+            product_type = self.clean_words(text[start:end])
+            if product_type and any(char.isalpha() for char in product_type):
+                fields['product_type'] = product_type.lower()
+                spans.append((start, end))
+
+        leftover = text
+        for start, end in sorted(spans, reverse=True):
+            leftover = leftover[:start] + ' ' + leftover[end:]
+        fields['details'] = self.clean_words(leftover) or None
+        return fields
+
+    def product_type_span(self, text, end):
+        """
+        (start, end) of the product type in text[:end]: after the part brands it
+        starts with, up to the next part brand or word with digits.
+        """
+        start = 0
+        for brand in self.brand_pattern.finditer(text, 0, end):
+            if self.clean_words(text[start:brand.start()]):
+                end = brand.start()
+                break
+            start = brand.end()
+        digits = DIGIT_WORD_PATTERN.search(text, start, end)
+        return start, digits.start() if digits else end
+
+    def canonical_model(self, make, text):
+        for model in self.gazetteer.get(make, []):
+            if match_key(model) == match_key(text):
+                return model
+        return text
+
+    @staticmethod
+    def clean_words(text):
+        """Words of `text` without commas (which separate title fields) and filler words."""
+        words = re.sub(r'[,;()\[\]"]', ' ', text).split()
+        return ' '.join(word for word in words if word.lower().strip('.:') not in FILLER_WORDS).strip(' .:-/')
+
+def load_gazetteer(path):
+    """Merges a JSON file of {make: [models]} into the built-in makes and models."""
+    makes = {make: list(models) for make, models in CAR_MAKES.items()}
+    with open(path, encoding='utf-8') as f:
+        for make, models in json.load(f).items():
+            makes.setdefault(make, [])
+            makes[make].extend(model for model in models if model not in makes[make])
+    return makes
+
+@lru_cache(maxsize=1)
+def get_extractor():
+    """Returns the shared extractor, built from EXTRACTOR_GAZETTEER when it is set."""
+    return TitleExtractor(load_gazetteer(EXTRACTOR_GAZETTEER) if EXTRACTOR_GAZETTEER else CAR_MAKES)
@@ -0,0 +1,109 @@
+# processing/journal.py
+
+import hashlib
+import json
+import os
+import time
+
+from config.settings import JOURNAL_DIR, JOURNAL_SYNC_ROWS, PROGRESS_INTERVAL
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+def run_fingerprint(sample_file_path, product_type_path=None, categorized_df=None):
+    """
+    Fingerprints the inputs of a run: the sample file plus either the product
+    type file it is categorized from or the categorized catalog itself.
+    """
+    digest = hashlib.sha256()
+    _hash_file(digest, sample_file_path)
+    if product_type_path:
+        digest.update(b'product_type')
+        _hash_file(digest, product_type_path)
+    elif categorized_df is not None:
+        digest.update(b'catalog')
+        for product, category in zip(categorized_df['Product'], categorized_df['Category']):
+            digest.update(f"{product}\t{category}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def journal_path(fingerprint):
+    return os.path.join(JOURNAL_DIR, f"{fingerprint}.jsonl")
+
+def count_journaled_rows(fingerprint):
+    """Number of rows an interrupted run finished without errors, 0 if there is none."""
+    return len(RunJournal.read(journal_path(fingerprint)))
+
+class RunJournal:
+    """
+    Append-only record of finished sample rows, one JSON line per row.
+    Each line is flushed to the OS as soon as the row completes, so a killed
+    process loses at most the rows that were still in flight. The file is
+    fsynced every `sync_rows` rows or `sync_interval` seconds and on close
+    rather than per row, since record runs on the event loop in async mode
+    and a per-row fsync would stall every request in flight; a power loss
+    can lose the rows since the last sync.
+    `on_record(index, result)` is called after each row is written.
+    """
+
+    def __init__(self, fingerprint, resume=True, on_record=None, sync_rows=JOURNAL_SYNC_ROWS,
+                 sync_interval=PROGRESS_INTERVAL):
+        self.path = journal_path(fingerprint)
+        self.on_record = on_record
+        self.sync_rows = sync_rows
+        self.sync_interval = sync_interval
+        self.unsynced = 0
+        self.last_sync = time.perf_counter()
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        if not resume and os.path.exists(self.path):
+            os.remove(self.path)
+        self.completed = self.read(self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def read(path):
+        """
+        Loads {row index: result} from a journal file, skipping a torn last
+        line. Rows whose last record is a failure (an 'Error' entry) are left
+        out, so a resumed run retries them.
+        """
+        completed = {}
+        if not os.path.exists(path):
+            return completed
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                completed[record.pop('index')] = record
+        return {index: record for index, record in completed.items() if 'Error' not in record}
+
+    def record(self, index, result):
+        self.completed[index] = result
+        self.file.write(json.dumps({'index': index, **result}, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.sync_rows or time.perf_counter() - self.last_sync >= self.sync_interval:
+            self.sync()
+        if self.on_record is not None:
+            self.on_record(index, result)
+
+    def sync(self):
+        """Makes the rows written so far durable."""
+        self.last_sync = time.perf_counter()
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def finish(self):
+        """Closes and removes the journal once the whole run has been written out without failed rows."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
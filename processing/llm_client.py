@@ -0,0 +1,607 @@
+# processing/llm_client.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+
+import httpx
+from openai import (
+    APIConnectionError, APIError, APITimeoutError, AsyncOpenAI, DefaultAsyncHttpxClient,
+    DefaultHttpxClient, InternalServerError, OpenAI, RateLimitError
+)
+
+from config.settings import (
+    BASE_URL, BREAKER_COOLDOWN, BREAKER_FAILURES, HEDGE_ENABLED, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE,
+    LLM_DEADLINE, LLM_TIMEOUT, MAX_RETRIES, POOL_CONNECTIONS, RETRY_BASE_DELAY, RPM_PER_KEY, TPM_PER_KEY
+)
+from processing.metrics import get_metrics
+
+# Successful request latencies kept per kind of prompt for the hedging percentile
+LATENCY_WINDOW = 500
+
+class LLMCallError(Exception):
+    """
+    An LLM call that failed for good: out of retries, past its deadline or
+    refused while the circuit breaker is open. `kind` is one of 'rate_limit',
+    'connection', 'server', 'timeout', 'circuit_open' or 'api'; `stage` is
+    the pipeline stage that made the call, when known.
+    """
+    kind = 'api'
+
+    def __init__(self, message, kind=None, stage=None):
+        super().__init__(message)
+        if kind is not None:
+            self.kind = kind
+        self.stage = stage
+
+class LLMTimeoutError(LLMCallError):
+    """A call that ran past its deadline, or whose last attempt timed out."""
+    kind = 'timeout'
+
+class CircuitOpenError(LLMCallError):
+    """A call that could not be sent before its deadline because dispatch was paused."""
+    kind = 'circuit_open'
+
+def error_kind(error):
+    """The LLMCallError kind of an OpenAI SDK error, or of an httpx error raised while reading a stream."""
+    if isinstance(error, (APITimeoutError, httpx.TimeoutException)):
+        return 'timeout'
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return 'connection'
+    if isinstance(error, RateLimitError):
+        return 'rate_limit'
+    if isinstance(error, InternalServerError):
+        return 'server'
+    return 'api'
+
+def call_error(error, attempts):
+    """Wraps the SDK error that ended a call after `attempts` attempts."""
+    kind = error_kind(error)
+    message = f"{kind} error after {attempts} attempt{'s' if attempts != 1 else ''}: {error}"
+    return LLMTimeoutError(message) if kind == 'timeout' else LLMCallError(message, kind)
+
+def call_deadline():
+    """Monotonic time a call started now must finish by, or None without a deadline."""
+    return time.monotonic() + LLM_DEADLINE if LLM_DEADLINE > 0 else None
+
+def attempt_timeout(deadline):
+    """Timeout of the next request attempt: LLM_TIMEOUT, cut short by the call's deadline."""
+    if deadline is None:
+        return LLM_TIMEOUT
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LLMTimeoutError(f"deadline of {LLM_DEADLINE:.0f}s passed")
+    return min(LLM_TIMEOUT, remaining)
+
+def load_api_keys():
+    """Returns all configured API keys in order: API, API2, API3, ..."""
+    keys = []
+    if os.getenv("API"):
+        keys.append(os.getenv("API"))
+    index = 2
+    while os.getenv(f"API{index}"):
+        keys.append(os.getenv(f"API{index}"))
+        index += 1
+    return keys
+
+def estimate_text_tokens(text):
+    """Rough local token estimate of a text (~4 characters per token)."""
+    return len(str(text)) // 4 + 1
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough local token estimate of a request, including its completion, for rate limiting."""
+    prompt_tokens = sum(estimate_text_tokens(message.get("content") or "") for message in messages)
+    return prompt_tokens + (max_tokens or 256)
+
+def get_retry_after(error, attempt):
+    """Seconds to wait after a 429, preferring the provider's Retry-After header."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+    return RETRY_BASE_DELAY * (2 ** attempt)
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most `per_minute` units."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class KeySlot:
+    """One API key with its own pooled clients and rate-limit buckets."""
+
+    def __init__(self, api_key, rate_share=1.0):
+        self.api_key = api_key
+        # A process sharing the key with others only gets its share of the limits
+        self.requests = TokenBucket(RPM_PER_KEY * rate_share)
+        self.tokens = TokenBucket(TPM_PER_KEY * rate_share)
+        self.blocked_until = 0.0
+        limits = httpx.Limits(
+            max_connections=POOL_CONNECTIONS,
+            max_keepalive_connections=POOL_CONNECTIONS
+        )
+        # Retries are handled by LLMClient so that 429s can move to another key
+        # instead of the SDK sleeping on the same one
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=BASE_URL,
+            max_retries=0,
+            http_client=DefaultHttpxClient(limits=limits)
+        )
+        self.limits = limits
+        self.async_client = None
+
+    def wait_time(self, token_estimate, now):
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(token_estimate, now)
+        )
+
+class LatencyTracker:
+    """Rolling window of successful request latencies for one kind of prompt."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent, min_samples=HEDGE_MIN_SAMPLES):
+        """The `percent` percentile of the window, or None before `min_samples` latencies."""
+        with self.lock:
+            if len(self.samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+class CircuitBreaker:
+    """
+    Pauses dispatch for `cooldown` seconds after `failures` consecutive failed
+    requests (connection errors, 5xx and timeouts; 429s are rate limiting and
+    handled per key). After the pause requests flow again, but the next
+    failure pauses dispatch at once while a success closes the circuit.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.open_until = None
+
+    def wait_time(self):
+        """Seconds until requests may be sent again (0 while the circuit is closed)."""
+        with self.lock:
+            if self.open_until is None:
+                return 0.0
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                return remaining
+            # Half-open: let requests through, but one more failure reopens the circuit
+            self.open_until = None
+            self.consecutive = self.failures - 1
+            return 0.0
+
+    def failing(self):
+        """Whether the last request failed, i.e. the provider may be down rather than slow."""
+        with self.lock:
+            return self.consecutive > 0 or self.open_until is not None
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive = 0
+            self.open_until = None
+
+    def record_failure(self):
+        if self.failures <= 0:
+            return
+        with self.lock:
+            self.consecutive += 1
+            if self.open_until is not None or self.consecutive < self.failures:
+                return
+            self.open_until = time.monotonic() + self.cooldown
+        print(f"{self.consecutive} LLM requests failed in a row; pausing dispatch for {self.cooldown:.0f}s.")
+
+class StreamedResponse:
+    """
+    Text of a streamed completion and its token usage. `usage` is estimated
+    locally when the stream was closed before the API reported it.
+    """
+
+    def __init__(self, text, usage, stopped_early):
+        self.text = text
+        self.usage = usage
+        self.stopped_early = stopped_early
+
+def first_success(outcomes):
+    """
+    Picks a result from finished (result, error) outcomes, preferring a
+    success; raises the first error when every outcome failed.
+    """
+    errors = [error for _, error in outcomes if error is not None]
+    for result, error in outcomes:
+        if error is None:
+            return result
+    raise errors[0]
+
+class LLMClient:
+    """
+    Process-wide chat completion client.
+    Spreads requests across all configured keys, keeps connections alive
+    and waits on per-key request/token buckets instead of fixed sleeps.
+    Every request attempt has a timeout and every call a deadline; attempts
+    running past the latency percentile of their kind of prompt are hedged
+    with a duplicate request, and a circuit breaker pauses dispatch while the
+    provider keeps failing.
+    """
+
+    def __init__(self, api_keys=None, rate_share=1.0):
+        api_keys = api_keys if api_keys is not None else load_api_keys()
+        if not api_keys:
+            raise ValueError("No API keys configured. Set API (and optionally API2, API3, ...) in keys.env.")
+        self.slots = [KeySlot(key, rate_share) for key in api_keys]
+        self.lock = threading.Lock()
+        self.next_slot = 0
+        self.async_loop = None
+        self.breaker = CircuitBreaker()
+        self.latencies = {}
+        self.executor = None
+
+    def _reserve(self, token_estimate):
+        """Reserves capacity on the least-loaded key. Returns (slot, wait)."""
+        with self.lock:
+            now = time.monotonic()
+            best_slot, best_wait = None, None
+            # Start from a rotating offset so ties are spread across keys
+            for offset in range(len(self.slots)):
+                slot = self.slots[(self.next_slot + offset) % len(self.slots)]
+                wait = slot.wait_time(token_estimate, now)
+                if best_wait is None or wait < best_wait:
+                    best_slot, best_wait = slot, wait
+            if best_wait > 0:
+                return None, best_wait
+            best_slot.requests.consume(1)
+            best_slot.tokens.consume(token_estimate)
+            self.next_slot = (self.slots.index(best_slot) + 1) % len(self.slots)
+            return best_slot, 0.0
+
+    def _block(self, slot, delay):
+        with self.lock:
+            slot.blocked_until = max(slot.blocked_until, time.monotonic() + delay)
+
+    def _async_client(self, slot):
+        # httpx async pools are bound to an event loop; rebuild them for a new loop
+        loop = asyncio.get_running_loop()
+        if self.async_loop is not loop:
+            self.async_loop = loop
+            for each in self.slots:
+                each.async_client = None
+        if slot.async_client is None:
+            slot.async_client = AsyncOpenAI(
+                api_key=slot.api_key,
+                base_url=BASE_URL,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=slot.limits)
+            )
+        return slot.async_client
+
+    def _tracker(self, latency_key):
+        with self.lock:
+            if latency_key not in self.latencies:
+                self.latencies[latency_key] = LatencyTracker()
+            return self.latencies[latency_key]
+
+    def _hedge_delay(self, tracker, timeout):
+        """
+        Seconds after which an attempt is hedged, or None when it is not.
+        Requests are not hedged while they are failing, which would only
+        double the load on a struggling provider.
+        """
+        if not HEDGE_ENABLED or self.breaker.failing():
+            return None
+        delay = tracker.percentile(HEDGE_PERCENTILE)
+        return delay if delay is not None and delay < timeout else None
+
+    def _acquire(self, token_estimate, deadline):
+        """
+        Returns (slot, wait) like _reserve, also waiting while the circuit
+        breaker is open. Raises when the wait would pass the call's deadline.
+        """
+        wait = self.breaker.wait_time()
+        paused = wait > 0
+        slot = None
+        if not paused:
+            slot, wait = self._reserve(token_estimate)
+        if slot is None and deadline is not None and time.monotonic() + wait >= deadline:
+            if paused:
+                raise CircuitOpenError("LLM dispatch is paused after repeated failures")
+            raise LLMTimeoutError(f"deadline of {LLM_DEADLINE:.0f}s passed waiting for rate limits")
+        return slot, wait
+
+    def _retry_delay(self, error, attempt, deadline):
+        """
+        Records a failed attempt and returns the seconds to wait before the
+        next one; raises LLMCallError when the call is out of retries or time.
+        """
+        kind = error_kind(error)
+        if kind == 'rate_limit':
+            # The provider is up, the key is just out of quota; _send blocked it
+            self.breaker.record_success()
+            delay = 0.0
+        else:
+            self.breaker.record_failure()
+            if kind == 'timeout':
+                get_metrics().count('timeouts')
+            delay = RETRY_BASE_DELAY * (2 ** attempt)
+        if attempt >= MAX_RETRIES:
+            raise call_error(error, attempt + 1) from error
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise LLMTimeoutError(f"deadline of {LLM_DEADLINE:.0f}s passed after {kind} error: {error}") from error
+        get_metrics().record_retry()
+        return delay
+
+    def _send(self, slot, messages, timeout, tracker, attempt, kwargs):
+        start = time.monotonic()
+        try:
+            response = slot.client.chat.completions.create(messages=messages, timeout=timeout, **kwargs)
+        except RateLimitError as e:
+            self._block(slot, get_retry_after(e, attempt))
+            raise
+        tracker.add(time.monotonic() - start)
+        return response
+
+    def _request(self, slot, messages, token_estimate, timeout, tracker, attempt, kwargs):
+        """One attempt; a hedge runs in a pool thread since the blocking request cannot be abandoned."""
+        hedge_after = self._hedge_delay(tracker, timeout)
+        if hedge_after is None:
+            return self._send(slot, messages, timeout, tracker, attempt, kwargs)
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=2 * POOL_CONNECTIONS,
+                                                   thread_name_prefix='llm-request')
+        futures = [self.executor.submit(self._send, slot, messages, timeout, tracker, attempt, kwargs)]
+        done, _ = wait_futures(futures, timeout=hedge_after)
+        if not done:
+            hedge_slot, _ = self._reserve(token_estimate)
+            # Only hedge with spare capacity; otherwise keep waiting on the first request
+            if hedge_slot is not None:
+                get_metrics().count('hedges')
+                futures.append(self.executor.submit(self._send, hedge_slot, messages, timeout - hedge_after,
+                                                    tracker, attempt, kwargs))
+        pending = set(futures)
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            outcomes = [(future.result() if future.exception() is None else None, future.exception())
+                        for future in done]
+            if any(error is None for _, error in outcomes) or not pending:
+                return first_success(outcomes)
+
+    def chat(self, messages, latency_key=None, **kwargs):
+        """
+        Blocking chat completion with key rotation, 429 backoff, per-attempt
+        timeouts and hedging. Attempts running past the latency percentile of
+        `latency_key` (the kind of prompt) are duplicated on spare capacity.
+        Raises LLMCallError once the call fails for good.
+        """
+        token_estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        tracker = self._tracker(latency_key)
+        deadline = call_deadline()
+        attempt = 0
+        while True:
+            slot, wait = self._acquire(token_estimate, deadline)
+            if slot is None:
+                time.sleep(wait)
+                continue
+            try:
+                response = self._request(slot, messages, token_estimate, attempt_timeout(deadline), tracker,
+                                         attempt, kwargs)
+            except (APIConnectionError, InternalServerError, RateLimitError) as e:
+                time.sleep(self._retry_delay(e, attempt, deadline))
+                attempt += 1
+                continue
+            except APIError as e:
+                # Other client errors (bad request, auth) are not retried
+                self.breaker.record_success()
+                raise call_error(e, attempt + 1) from e
+            self.breaker.record_success()
+            return response
+
+    async def _asend(self, slot, messages, timeout, tracker, attempt, kwargs):
+        start = time.monotonic()
+        try:
+            client = self._async_client(slot)
+            response = await client.chat.completions.create(messages=messages, timeout=timeout, **kwargs)
+        except RateLimitError as e:
+            self._block(slot, get_retry_after(e, attempt))
+            raise
+        tracker.add(time.monotonic() - start)
+        return response
+
+    async def _arequest(self, slot, messages, token_estimate, timeout, tracker, attempt, kwargs):
+        """One attempt, hedged after the latency percentile; the slower request is cancelled."""
+        hedge_after = self._hedge_delay(tracker, timeout)
+        if hedge_after is None:
+            return await self._asend(slot, messages, timeout, tracker, attempt, kwargs)
+
+        tasks = [asyncio.ensure_future(self._asend(slot, messages, timeout, tracker, attempt, kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                hedge_slot, _ = self._reserve(token_estimate)
+                if hedge_slot is not None:
+                    get_metrics().count('hedges')
+                    tasks.append(asyncio.ensure_future(
+                        self._asend(hedge_slot, messages, timeout - hedge_after, tracker, attempt, kwargs)
+                    ))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                outcomes = [(task.result() if task.exception() is None else None, task.exception())
+                            for task in done]
+                if any(error is None for _, error in outcomes) or not pending:
+                    return first_success(outcomes)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def achat(self, messages, latency_key=None, **kwargs):
+        """Async variant of chat."""
+        token_estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        tracker = self._tracker(latency_key)
+        deadline = call_deadline()
+        attempt = 0
+        while True:
+            slot, wait = self._acquire(token_estimate, deadline)
+            if slot is None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                response = await self._arequest(slot, messages, token_estimate, attempt_timeout(deadline),
+                                                tracker, attempt, kwargs)
+            except (APIConnectionError, InternalServerError, RateLimitError) as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, deadline))
+                attempt += 1
+                continue
+            except APIError as e:
+                self.breaker.record_success()
+                raise call_error(e, attempt + 1) from e
+            self.breaker.record_success()
+            return response
+
+    async def _astream(self, slot, messages, receiver, timeout, attempt, deadline, kwargs):
+        """
+        One streamed attempt; the stream is closed as soon as `receiver` has
+        everything it needs. Events are read as raw JSON rather than SDK chunk
+        objects, which cost more to build than the parsing they feed.
+        """
+        parts = []
+        usage = None
+        stopped_early = False
+        try:
+            async with self._async_client(slot).chat.completions.with_streaming_response.create(
+                messages=messages, timeout=timeout, stream=True, stream_options={"include_usage": True}, **kwargs
+            ) as response:
+                async for line in response.iter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get('error'):
+                        raise APIError(str(chunk['error'].get('message', chunk['error'])), response.http_request,
+                                       body=chunk['error'])
+                    # Groq reports usage under 'x_groq' instead of 'usage'
+                    usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage') or usage
+                    choices = chunk.get('choices')
+                    text = (choices[0].get('delta') or {}).get('content') if choices else None
+                    if not text:
+                        continue
+                    parts.append(text)
+                    if receiver.feed(text):
+                        stopped_early = True
+                        get_metrics().count('early_stops')
+                        break
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise LLMTimeoutError(f"deadline of {LLM_DEADLINE:.0f}s passed while streaming")
+        except RateLimitError as e:
+            self._block(slot, get_retry_after(e, attempt))
+            raise
+        text = ''.join(parts)
+        if usage is None:
+            usage = {
+                'prompt_tokens': sum(estimate_text_tokens(message.get("content") or "") for message in messages),
+                'completion_tokens': estimate_text_tokens(text)
+            }
+        return StreamedResponse(text, SimpleNamespace(**usage), stopped_early)
+
+    async def astream_chat(self, messages, receiver, **kwargs):
+        """
+        Streamed chat completion. Text is handed to `receiver.feed(text)` as
+        it arrives and the stream is closed once feed returns True;
+        `receiver.restart()` is called before every attempt, as a retried
+        request starts its answer over. Key rotation, retries, the deadline
+        and the circuit breaker work as in achat; streams are not hedged.
+        Returns a StreamedResponse.
+        """
+        token_estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        deadline = call_deadline()
+        attempt = 0
+        while True:
+            slot, wait = self._acquire(token_estimate, deadline)
+            if slot is None:
+                await asyncio.sleep(wait)
+                continue
+            receiver.restart()
+            try:
+                response = await self._astream(slot, messages, receiver, attempt_timeout(deadline), attempt,
+                                               deadline, kwargs)
+            except (APIConnectionError, InternalServerError, RateLimitError, httpx.TransportError) as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, deadline))
+                attempt += 1
+                continue
+            except APIError as e:
+                self.breaker.record_success()
+                raise call_error(e, attempt + 1) from e
+            self.breaker.record_success()
+            return response
+
+    async def aclose(self):
+        """Closes the async connection pools of the current event loop."""
+        for slot in self.slots:
+            if slot.async_client is not None:
+                await slot.async_client.close()
+                slot.async_client = None
+        self.async_loop = None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared LLMClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+def configure_client(api_keys=None, rate_share=1.0):
+    """
+    Replaces the shared client, e.g. in a worker process that only owns some
+    of the keys or a `rate_share` fraction of each key's RPM/TPM limits.
+    """
+    global _client
+    with _client_lock:
+        _client = LLMClient(api_keys, rate_share)
+        return _client
@@ -0,0 +1,80 @@
+# processing/matcher.py
+
+from functools import lru_cache
+
+import ahocorasick
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+class KeywordMatcher:
+    """
+    Finds which catalog item an LLM answer refers to.
+    Built once per item list: exact hits come from an Aho-Corasick automaton
+    over the lowercased items, and the fuzzy fallback scores every
+    (answer word x item) pair in one vectorized RapidFuzz call.
+
+    Answers are identical to the original linear scans: among exact hits the
+    item listed first wins, and among fuzzy hits the first pair (word order,
+    then item order) with the highest rounded ratio above the threshold wins.
+    """
+
+    def __init__(self, items):
+        # Mirror the {item.lower(): item} dict the scans used: the first
+        # spelling fixes the rank, the last one is returned
+        keywords = {}
+        for item in items:
+            keywords[item.lower()] = item
+        self.keys = list(keywords)
+        self.originals = list(keywords.values())
+        # An empty item is a substring of every answer
+        self.empty_rank = self.keys.index('') if '' in keywords else None
+
+        self.automaton = ahocorasick.Automaton()
+        for rank, key in enumerate(self.keys):
+            if key:
+                self.automaton.add_word(key, rank)
+        if len(self.automaton):
+            self.automaton.make_automaton()
+
+    def find_exact(self, text):
+        """Returns the first-listed item contained in `text`, or None."""
+        best = self.empty_rank
+        if len(self.automaton):
+            for _, rank in self.automaton.iter(text.lower()):
+                if best is None or rank < best:
+                    best = rank
+                    if best == 0:
+                        break
+        return self.originals[best] if best is not None else None
+
+    def find_fuzzy(self, text, threshold=80):
+        """Returns the item closest to any word of `text` above `threshold`, or None."""
+        words = text.lower().split()
+        if not words or not self.keys:
+            return None
+        # Rounded like fuzzywuzzy's fuzz.ratio so ties resolve identically
+        scores = np.round(
+            process.cdist(words, self.keys, scorer=Indel.normalized_similarity, dtype=np.float64) * 100
+        )
+        if self.empty_rank is not None:
+            scores[:, self.empty_rank] = 0  # fuzz.ratio scores empty strings as 0
+        best = int(np.argmax(scores))
+        if scores.flat[best] <= threshold:
+            return None
+        return self.originals[best % len(self.keys)]
+
+    def find(self, text, threshold=80):
+        """Exact match first, then the fuzzy fallback."""
+        match = self.find_exact(text)
+        if match is not None:
+            return match
+        return self.find_fuzzy(text, threshold)
+
+@lru_cache(maxsize=256)
+def _cached_matcher(items):
+    return KeywordMatcher(items)
+
+def get_matcher(items):
+    """Returns a KeywordMatcher for `items`, reusing one built for the same list."""
+    return _cached_matcher(tuple(items))
@@ -0,0 +1,306 @@
+# processing/memo.py
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from config.settings import MEMO_ENABLED, MEMO_MAX_AGE_DAYS, MEMO_MAX_ENTRIES, MEMO_PATH, MEMO_THRESHOLD
+from processing.similarity import char_ngrams
+from utils.helpers import normalize_title
+
+# MinHash signature of PERMUTATIONS values, split into BANDS bands of 4 for LSH. Titles
+# with a Jaccard similarity s share each band with probability s^4, and only titles
+# sharing at least MIN_SHARED_BANDS bands are compared exactly: at s = 0.85 that misses
+# about 1 in 7000 titles, at 0.5 it still compares about 26% of them
+PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = PERMUTATIONS // BANDS
+MIN_SHARED_BANDS = 2
+
+# Titles stored during a run are indexed in a dict until this many are merged into the arrays
+MERGE_ROWS = 5000
+
+# Multiply-shift hash functions (odd 64-bit multipliers), fixed so the band keys
+# stored by earlier runs stay comparable
+_rng = np.random.default_rng(20240611)
+HASH_A = _rng.integers(0, 1 << 63, PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+HASH_B = _rng.integers(0, 1 << 63, PERMUTATIONS, dtype=np.uint64)
+BAND_MIX = _rng.integers(0, 1 << 63, ROWS_PER_BAND, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+BAND_SALT = _rng.integers(0, 1 << 63, BANDS, dtype=np.uint64)
+
+def shingles(key):
+    """Character 3-grams of a title key with its words sorted, so reordered words still match."""
+    return frozenset(char_ngrams(' '.join(sorted(key.split()))))
+
+def band_keys(grams):
+    """
+    MinHash LSH bucket keys (one uint32 per band) of a set of n-grams; the band
+    number is folded in so keys of different bands can share one array.
+    """
+    hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+    # The high 32 bits of a * x + b modulo 2 ** 64
+    signature = ((hashes[:, None] * HASH_A + HASH_B) >> np.uint64(32)).min(axis=0)
+    bands = (signature.reshape(BANDS, ROWS_PER_BAND) * BAND_MIX).sum(axis=1, dtype=np.uint64) + BAND_SALT
+    return (bands >> np.uint64(32)).astype(np.uint32)
+
+def numeric_tokens(key):
+    """The words of a title key that contain digits: part numbers, years, sizes."""
+    return frozenset(word for word in key.split() if any(char.isdigit() for char in word))
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+class ResultMemo:
+    """
+    Persistent store of resolved sample rows (title key -> generated title,
+    category and matched product) with a MinHash LSH index over the keys'
+    character n-grams, so a title that is identical or near-identical to one
+    resolved in an earlier run (another part number suffix, reordered words)
+    can reuse its category and product without the LLM. A near-identical title
+    is only reused when it has the same numbers (part numbers, years) as the
+    stored one, so another part of the same brand is resolved again.
+
+    Each row records the `version` (models and prompt versions) it was
+    resolved with, and lookups only reuse rows of the version they ask for.
+
+    Rows live in SQLite next to the LLM cache. Only the title keys and their
+    band keys (as sorted arrays) are loaded into memory; a row is read back
+    when it is reused. Each row counts its hits; rows expire `max_age_days`
+    after they were resolved and the least recently used ones are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, path=MEMO_PATH, enabled=MEMO_ENABLED, threshold=MEMO_THRESHOLD,
+                 max_entries=MEMO_MAX_ENTRIES, max_age_days=MEMO_MAX_AGE_DAYS):
+        self.path = path
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.lock = threading.Lock()
+        self.conn = None
+        self.writes_since_evict = 0
+        self.keys = []          # entry id -> title key
+        self.ids = {}           # title key -> entry id, for the rows still stored
+        # Band keys of all entries, sorted, with the entry id of each; newer ones in `recent`
+        self.band_keys = np.empty(0, dtype=np.uint32)
+        self.band_ids = np.empty(0, dtype=np.int32)
+        self.recent = {}        # band key -> entry ids
+        self.recent_rows = 0
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.stored = 0
+        self.evicted = 0
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS memo ("
+            "key TEXT PRIMARY KEY, title TEXT NOT NULL, category TEXT NOT NULL, product TEXT NOT NULL, "
+            "bands BLOB NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, version TEXT NOT NULL DEFAULT '')"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(memo)")]
+        if 'version' not in columns:
+            # Memos written before rows had a version are never reused again
+            self.conn.execute("ALTER TABLE memo ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+        self.conn.commit()
+        self.evict()
+
+        rows = self.conn.execute("SELECT key, bands FROM memo").fetchall()
+        self.keys = [key for key, _ in rows]
+        self.ids = {key: entry_id for entry_id, key in enumerate(self.keys)}
+        if rows:
+            keys = np.frombuffer(b''.join(bands for _, bands in rows), dtype=np.uint32)
+            order = np.argsort(keys, kind='stable')
+            self.band_keys = keys[order]
+            self.band_ids = (order // BANDS).astype(np.int32)
+
+    def _merge_recent(self):
+        """Moves the band keys of the rows stored during this run into the sorted arrays."""
+        added = [(band_key, entry_id) for band_key, entry_ids in self.recent.items() for entry_id in entry_ids]
+        keys = np.concatenate([self.band_keys, np.array([key for key, _ in added], dtype=np.uint32)])
+        ids = np.concatenate([self.band_ids, np.array([entry_id for _, entry_id in added], dtype=np.int32)])
+        order = np.argsort(keys, kind='stable')
+        self.band_keys, self.band_ids = keys[order], ids[order]
+        self.recent = {}
+        self.recent_rows = 0
+
+    def _candidates(self, key):
+        """
+        (similarity, key) of the stored titles at or above the threshold with the
+        same numeric tokens as `key`, most similar first.
+        """
+        grams = shingles(key)
+        bands = band_keys(grams)
+        starts = np.searchsorted(self.band_keys, bands, side='left')
+        ends = np.searchsorted(self.band_keys, bands, side='right')
+        entry_ids = [self.band_ids[start:end] for start, end in zip(starts, ends) if end > start]
+        entry_ids.extend(np.array(self.recent[band], dtype=np.int32)
+                         for band in bands.tolist() if band in self.recent)
+        if not entry_ids:
+            return []
+        entry_ids, shared = np.unique(np.concatenate(entry_ids), return_counts=True)
+
+        numbers = numeric_tokens(key)
+        scored = []
+        for entry_id in entry_ids[shared >= MIN_SHARED_BANDS].tolist():
+            candidate = self.keys[entry_id]
+            if self.ids.get(candidate) == entry_id and numeric_tokens(candidate) == numbers:
+                similarity = jaccard(grams, shingles(candidate))
+                if similarity >= self.threshold:
+                    scored.append((similarity, candidate))
+        return sorted(scored, reverse=True)
+
+    def _fetch(self, key, version):
+        """The stored row of `key`, or None when it was evicted in the meantime or has another version."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT title, category, product, version FROM memo WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self.ids.pop(key, None)
+            return None
+        if row[3] != version:
+            return None
+        return {'Product Title': row[0], 'Product Type': row[2], 'Category': row[1]}
+
+    def _hit(self, key):
+        with self.lock:
+            self.conn.execute("UPDATE memo SET hits = hits + 1, accessed = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+
+    def lookup(self, title, key=None, accept=None, version=''):
+        """
+        Returns (result, exact) for the stored row whose title key is `key` (computed
+        from `title` when None), or else the most similar stored row at or above the
+        threshold; (None, False) on a miss. Only rows stored with `version` are
+        reused. `accept(result)` can reject stored rows, e.g. ones whose product is
+        no longer in the catalog.
+        """
+        if not self.enabled:
+            return None, False
+        if key is None:
+            key = normalize_title(title)
+        self.lookups += 1
+
+        if key in self.ids:
+            result = self._fetch(key, version)
+            if result is not None and (accept is None or accept(result)):
+                self._hit(key)
+                self.exact_hits += 1
+                return result, True
+
+        for _, candidate in self._candidates(key):
+            if candidate == key:
+                continue
+            result = self._fetch(candidate, version)
+            if result is not None and (accept is None or accept(result)):
+                self._hit(candidate)
+                self.near_hits += 1
+                return result, False
+        return None, False
+
+    def store(self, title, result, key=None, version=''):
+        """Remembers a row resolved with `version` under its title key."""
+        if not self.enabled:
+            return
+        if key is None:
+            key = normalize_title(title)
+        bands = band_keys(shingles(key))
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                "INSERT INTO memo (key, title, category, product, bands, created, accessed, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "title = excluded.title, category = excluded.category, product = excluded.product, "
+                "created = excluded.created, accessed = excluded.accessed, version = excluded.version",
+                (key, result['Product Title'], result['Category'], result['Product Type'],
+                 bands.tobytes(), now, now, version)
+            )
+            self.conn.commit()
+            self.stored += 1
+            if key not in self.ids:
+                # A key evicted earlier gets a new entry id; its old band keys no longer match it
+                entry_id = len(self.keys)
+                self.keys.append(key)
+                self.ids[key] = entry_id
+                for band in bands.tolist():
+                    self.recent.setdefault(band, []).append(entry_id)
+                self.recent_rows += 1
+                if self.recent_rows >= MERGE_ROWS:
+                    self._merge_recent()
+            self.writes_since_evict += 1
+            if self.writes_since_evict < 1000:
+                return
+        self.evict()
+
+    def evict(self):
+        """
+        Drops expired rows and trims the memo down to `max_entries`. Rows dropped
+        here stay in the in-memory index until a lookup finds them gone.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.writes_since_evict = 0
+            if self.max_age:
+                self.evicted += self.conn.execute(
+                    "DELETE FROM memo WHERE created < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_entries:
+                self.evicted += self.conn.execute(
+                    "DELETE FROM memo WHERE key IN ("
+                    "SELECT key FROM memo ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            self.conn.commit()
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.conn.execute("DELETE FROM memo")
+            self.conn.commit()
+            self.ids = {}
+
+    def reset_stats(self):
+        """Starts counting lookups, hits and stored rows for a new run."""
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.stored = 0
+
+    def stats(self):
+        """Lookups, hits and stored rows since reset_stats, rows evicted since the memo was opened."""
+        hits = self.exact_hits + self.near_hits
+        return {
+            'lookups': self.lookups,
+            'exact_hits': self.exact_hits,
+            'near_hits': self.near_hits,
+            'hit_rate': hits / self.lookups if self.lookups else 0.0,
+            'stored': self.stored,
+            'evicted': self.evicted,
+            'entries': len(self.ids)
+        }
+
+_memo = None
+_memo_lock = threading.Lock()
+
+def get_memo():
+    """Returns the shared ResultMemo, opening it on first use."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = ResultMemo()
+        return _memo
@@ -0,0 +1,362 @@
+# processing/metrics.py
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.settings import METRICS_HOST, MODEL_PRICES, PROGRESS_INTERVAL, RUN_REPORT_DIR
+
+STAGES = (
+    'file_load',
+    'catalog_categorization',
+    'title_generation',
+    'category_lookup',
+    'product_matching',
+    'output_write'
+)
+
+# Pipeline stage each prompt belongs to
+PROMPT_STAGES = {
+    'categories': 'catalog_categorization',
+    'product_info': 'title_generation',
+    'product_info_batch': 'title_generation',
+    'product_info_fields': 'title_generation',
+    'category': 'category_lookup',
+    'category_batch': 'category_lookup',
+    'similar_products': 'product_matching'
+}
+
+COUNTERS = ('seconds', 'calls', 'retries', 'errors', 'timeouts', 'hedges', 'early_stops', 'cache_hits',
+            'local_answers', 'prompt_tokens', 'completion_tokens')
+
+# Per stage and model of the cascade: LLM calls, answers accepted or escalated to the next model
+TIER_COUNTERS = ('calls', 'cache_hits', 'accepted', 'escalated', 'seconds', 'prompt_tokens', 'completion_tokens')
+
+_current_stage = contextvars.ContextVar('current_stage', default=None)
+
+def parse_prices(spec):
+    """Parses 'model=prompt/completion,...' (USD per million tokens) into {model: (prompt, completion)}."""
+    prices = {}
+    for item in spec.split(','):
+        model, _, price = item.partition('=')
+        if not price:
+            continue
+        prompt, _, completion = price.partition('/')
+        prices[model.strip()] = (float(prompt), float(completion or prompt))
+    return prices
+
+PRICES = parse_prices(MODEL_PRICES)
+
+def tier_summary(model, counters):
+    """A model tier's counters with its mean call latency and token cost (None for unpriced models)."""
+    summary = dict(counters)
+    summary['seconds'] = round(counters['seconds'], 3)
+    summary['mean_latency_ms'] = round(counters['seconds'] / counters['calls'] * 1000, 1) if counters['calls'] else None
+    price = PRICES.get(model)
+    summary['cost_usd'] = (
+        round((counters['prompt_tokens'] * price[0] + counters['completion_tokens'] * price[1]) / 1e6, 6)
+        if price else None
+    )
+    return summary
+
+def tiers_report(tiers, stages):
+    """
+    {stage: {tier: summary}} with a 'local' tier for the rows answered
+    without the LLM, followed by the models in cascade order.
+    """
+    report = {}
+    for stage, counters in stages.items():
+        if counters['local_answers']:
+            report[stage] = {'local': {'accepted': counters['local_answers'], 'cost_usd': 0.0}}
+    for stage, models in tiers.items():
+        report.setdefault(stage, {}).update(
+            (model, tier_summary(model, counters)) for model, counters in models.items()
+        )
+    return report
+
+def format_duration(seconds):
+    """Formats seconds as e.g. '45s', '3m05s' or '1h02m'."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+class RunMetrics:
+    """
+    Per-stage counters and row progress of one processing run.
+    `seconds` sums the time spent inside a stage, so stages that run
+    concurrently (title generation alongside category lookup, many rows in
+    flight) can add up to more than the run's wall time; `wall_seconds`
+    spans the first start to the last end of the stage.
+    """
+
+    def __init__(self, progress_callback=None, progress_interval=PROGRESS_INTERVAL):
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.start_time = time.perf_counter()
+        self.stages = {stage: dict.fromkeys(COUNTERS, 0) for stage in STAGES}
+        self.spans = {}  # stage -> [first start, last end]
+        self.tiers = {}  # stage -> {model: TIER_COUNTERS}
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.rows_total = None
+        self.rows_done = 0
+        self.rows_resumed = 0
+        self.rows_start_time = None
+        self.last_progress = 0.0
+
+    def add(self, stage, **counts):
+        with self.lock:
+            counters = self.stages[stage]
+            for name, value in counts.items():
+                counters[name] += value
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a block as part of stage `name`. LLM calls and retries made inside
+        the block are attributed to it; a nested block of the same stage is not
+        timed twice.
+        """
+        if _current_stage.get() == name:
+            yield
+            return
+        token = _current_stage.set(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            _current_stage.reset(token)
+            with self.lock:
+                self.stages[name]['seconds'] += end - start
+                span = self.spans.setdefault(name, [start, end])
+                span[0] = min(span[0], start)
+                span[1] = max(span[1], end)
+
+    def timed_iter(self, name, iterable):
+        """Yields from `iterable`, counting the time spent producing each item towards `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record_tier(self, stage, model, **counts):
+        with self.lock:
+            counters = self.tiers.setdefault(stage, {}).setdefault(model, dict.fromkeys(TIER_COUNTERS, 0))
+            for name, value in counts.items():
+                counters[name] += value
+
+    def record_response(self, stage, response, model=None, seconds=0.0):
+        """
+        Counts one completed LLM call and the tokens it reports in `response.usage`,
+        also towards `model`'s tier with the call's `seconds` when it is given.
+        """
+        usage = getattr(response, 'usage', None)
+        tokens = {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0
+        }
+        self.add(stage, calls=1, **tokens)
+        if model is not None:
+            self.record_tier(stage, model, calls=1, seconds=seconds, **tokens)
+
+    def count(self, name):
+        """Counts one `name` event (e.g. 'hedges') towards the stage that is running."""
+        stage = _current_stage.get()
+        if stage is not None:
+            self.add(stage, **{name: 1})
+
+    def record_retry(self):
+        """Counts a retried LLM request towards the stage that made it."""
+        self.count('retries')
+
+    def start_rows(self, total, resumed=0):
+        """Starts progress tracking over `total` sample rows, `resumed` of which are already done."""
+        with self.lock:
+            self.rows_total = total
+            self.rows_done = resumed
+            self.rows_resumed = resumed
+            self.rows_start_time = time.perf_counter()
+
+    def advance(self, rows=1):
+        """Marks `rows` sample rows as finished and reports progress at most every progress_interval."""
+        with self.lock:
+            self.rows_done += rows
+            now = time.perf_counter()
+            finished = self.rows_total is not None and self.rows_done >= self.rows_total
+            if self.progress_callback is None or (now - self.last_progress < self.progress_interval
+                                                  and not finished):
+                return
+            self.last_progress = now
+            message = self.progress_message(now)
+        self.progress_callback(message)
+
+    def progress_message(self, now=None):
+        now = now if now is not None else time.perf_counter()
+        elapsed = now - (self.rows_start_time or self.start_time)
+        rate = (self.rows_done - self.rows_resumed) / elapsed if elapsed > 0 else 0.0
+        if not self.rows_total:
+            return f"Processed {self.rows_done} rows ({rate:.1f} rows/s)"
+        remaining = max(self.rows_total - self.rows_done, 0)
+        eta = format_duration(remaining / rate) if rate > 0 else "unknown"
+        return (f"Processed {self.rows_done}/{self.rows_total} rows "
+                f"({self.rows_done / self.rows_total:.0%}, {rate:.1f} rows/s, ETA {eta})")
+
+    def report(self):
+        """JSON-serializable summary of the run so far."""
+        with self.lock:
+            stages = {}
+            for stage, counters in self.stages.items():
+                stage_report = dict(counters)
+                stage_report['seconds'] = round(counters['seconds'], 3)
+                span = self.spans.get(stage)
+                stage_report['wall_seconds'] = round(span[1] - span[0], 3) if span else 0.0
+                stages[stage] = stage_report
+            return {
+                'started': self.started.isoformat(timespec='seconds'),
+                'elapsed_seconds': round(time.perf_counter() - self.start_time, 3),
+                'rows': {'total': self.rows_total, 'done': self.rows_done, 'resumed': self.rows_resumed},
+                'stages': stages,
+                'totals': {
+                    name: sum(counters[name] for counters in self.stages.values())
+                    for name in COUNTERS if name != 'seconds'
+                },
+                'tiers': tiers_report(self.tiers, self.stages)
+            }
+
+def combine_reports(reports):
+    """Sums the counters of several run reports, e.g. from the shards of one run."""
+    combined = {
+        'started': min(report['started'] for report in reports),
+        'elapsed_seconds': max(report['elapsed_seconds'] for report in reports),
+        'rows': {
+            key: sum(report['rows'][key] or 0 for report in reports) for key in ('total', 'done', 'resumed')
+        },
+        'stages': {},
+        'totals': {}
+    }
+    for stage in STAGES:
+        combined['stages'][stage] = {
+            name: round(sum(report['stages'][stage][name] for report in reports), 3)
+            for name in COUNTERS + ('wall_seconds',)
+        }
+        # Shards run side by side, so the stage took as long as its slowest shard
+        combined['stages'][stage]['wall_seconds'] = max(
+            report['stages'][stage]['wall_seconds'] for report in reports
+        )
+    for name in COUNTERS:
+        if name != 'seconds':
+            combined['totals'][name] = sum(report['totals'][name] for report in reports)
+
+    tiers = {}
+    for report in reports:
+        for stage, models in report.get('tiers', {}).items():
+            for model, summary in models.items():
+                if model == 'local':
+                    continue
+                counters = tiers.setdefault(stage, {}).setdefault(model, dict.fromkeys(TIER_COUNTERS, 0))
+                for name in TIER_COUNTERS:
+                    counters[name] += summary[name]
+    local_answers = {stage: {'local_answers': combined['stages'][stage]['local_answers']} for stage in STAGES}
+    combined['tiers'] = tiers_report(tiers, local_answers)
+    return combined
+
+def save_report(report, path=None):
+    """
+    Writes a run report as JSON, by default to a new timestamped file in
+    RUN_REPORT_DIR. Returns the path, or None when reports are disabled.
+    """
+    if path is None:
+        if not RUN_REPORT_DIR:
+            return None
+        stamp = report['started'].replace(':', '').replace('-', '')
+        path = os.path.join(RUN_REPORT_DIR, f"run_{stamp}_{os.getpid()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def prometheus_text(metrics):
+    """Renders the current run in the Prometheus text exposition format."""
+    report = metrics.report()
+    lines = []
+    descriptions = {
+        'seconds': 'Seconds spent in the stage.',
+        'calls': 'Completed LLM calls.',
+        'retries': 'Retried LLM requests (429s, connection and server errors).',
+        'errors': 'LLM calls that failed after all retries or past their deadline.',
+        'timeouts': 'LLM request attempts that timed out.',
+        'hedges': 'Duplicate LLM requests sent for attempts slower than the latency percentile.',
+        'early_stops': 'Streamed LLM answers closed once everything they were asked for had arrived.',
+        'cache_hits': 'LLM calls answered from the response cache.',
+        'local_answers': 'Rows answered locally without an LLM call.',
+        'prompt_tokens': 'Prompt tokens reported by the API.',
+        'completion_tokens': 'Completion tokens reported by the API.'
+    }
+    for name in COUNTERS:
+        metric = f"productcategorizer_stage_{name}_total"
+        lines.append(f"# HELP {metric} {descriptions[name]}")
+        lines.append(f"# TYPE {metric} counter")
+        for stage, counters in report['stages'].items():
+            lines.append(f'{metric}{{stage="{stage}"}} {counters[name]}')
+    for name, help_text in (('done', 'Sample rows finished.'), ('total', 'Sample rows in the input.')):
+        metric = f"productcategorizer_rows_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {report['rows'][name] or 0}")
+    return '\n'.join(lines) + '\n'
+
+_metrics = RunMetrics()
+_server = None
+
+def get_metrics():
+    """Returns the metrics of the current run."""
+    return _metrics
+
+def start_run(progress_callback=None):
+    """Starts a new run's metrics; later LLM calls are counted towards it."""
+    global _metrics
+    _metrics = RunMetrics(progress_callback)
+    return _metrics
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """Serves the current run's metrics on http://<host>:<port>/metrics from a daemon thread."""
+    global _server
+    if _server is not None:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text(get_metrics()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    try:
+        _server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"Could not serve metrics on port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return _server
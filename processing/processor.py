@@ -1,26 +1,208 @@
 # processing/processor.py
 
-import os
-import pandas as pd
+import asyncio
+import re
 import time
-from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
-from openai import OpenAI
+from collections import Counter
+from itertools import chain
 
-from utils.helpers import clean_text, remove_null
+import pandas as pd
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'keys.env')
+from config.settings import (
+    ASYNC_MODE, BATCH_MAX_ROUNDS, CATALOG_PATH, CATEGORIZE_BATCH_TOKENS, CATEGORIZE_CONCURRENCY,
+    CLASSIFIER_ENABLED, CLASSIFIER_MIN_EXAMPLES, EXTRACTOR_ENABLED,
+    CATEGORIZE_MAX_ATTEMPTS, CATEGORIZE_MAX_BATCH_SIZE, CATEGORIZE_STREAM, MAX_CONCURRENCY, MEMO_ENABLED,
+    METRICS_PORT, MODEL_TIERS,
+    PROGRESS_INTERVAL, READ_CHUNK_SIZE, SAMPLE_BATCH_SIZE, SHORTLIST_ACCEPT_SCORE, SHORTLIST_ENABLED,
+    SHORTLIST_MARGIN, SHORTLIST_TOP_K, STAGE_MODEL_TIERS
+)
+from processing.cache import get_cache
+from processing.classifier import CategoryClassifier
+from processing.catalog import load_catalog, product_hash, save_catalog
+from processing.catalog_index import CatalogIndex
+from processing.dedup import TitleDeduplicator
+from processing.extractor import (
+    FIELD_LABELS, format_title, get_extractor, merge_fields, missing_fields, parse_fields_answer,
+    parse_title_answer
+)
+from processing.journal import RunJournal, run_fingerprint
+from processing.llm_client import LLMCallError, estimate_text_tokens, get_client
+from processing.matcher import get_matcher
+from processing.memo import get_memo
+from processing.metrics import PROMPT_STAGES, get_metrics, save_report, start_metrics_server, start_run
+from processing.results import OUTPUT_COLUMNS, blank_result, failed_result, format_failure
+from processing.similarity import CategoryIndex, is_confident
+from utils.helpers import remove_null
+from utils.normalize import normalize_column
+from utils.readers import count_rows, read_first_column_chunks
 
-load_dotenv(CONFIG_PATH)
+# Bump a stage's version whenever its prompt changes so cached answers are not reused
+PROMPT_VERSIONS = {
+    'product_info': 1,
+    'categories': 1,
+    'category': 1,
+    'similar_products': 1,
+    'product_info_batch': 1,
+    'category_batch': 1,
+    'product_info_fields': 1
+}
 
-def extract_product_info(text):
-    """Extract product information using OpenAI API."""
-    client = OpenAI(
-        api_key=os.getenv("API"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-    
+# Estimated tokens of the ': Categorie' part of each categorization answer line
+CATEGORY_ANSWER_TOKENS = 8
+
+INDEXED_LINE_PATTERN = re.compile(r'^\s*(\d+)\s*\|\s*(.*\S)\s*$')
+
+# Most finished rows handed to a result_callback at once
+RESULT_CHUNK_ROWS = 500
+
+def model_tiers(stage):
+    """Models a prompt goes through, first to last (see MODEL_TIERS)."""
+    return STAGE_MODEL_TIERS.get(stage, MODEL_TIERS)
+
+# Prompts whose answers end up in a result memo row
+MEMO_STAGES = ('product_info', 'product_info_fields', 'product_info_batch', 'category', 'category_batch',
+               'similar_products')
+
+def memo_version():
+    """
+    The model tiers and prompt versions of the stages behind a memo row, so rows
+    resolved before a model or prompt change are not reused.
+    """
+    return ';'.join(f"{stage}={','.join(model_tiers(stage))}:{PROMPT_VERSIONS[stage]}" for stage in MEMO_STAGES)
+
+def cascades(stage):
+    """Whether answers of `stage` that fail validation go to a stronger model."""
+    return len(model_tiers(stage)) > 1
+
+def cached_answer(stage, model, cache_input, kwargs):
+    """Returns (cache key, cached answer or None) of a prompt to `model`."""
+    cache = get_cache()
+    key = cache.make_key(stage, PROMPT_VERSIONS[stage], model, kwargs.get('temperature'), cache_input)
+    content = cache.get(key)
+    if content is not None:
+        metrics = get_metrics()
+        metrics.add(PROMPT_STAGES[stage], cache_hits=1)
+        metrics.record_tier(PROMPT_STAGES[stage], model, cache_hits=1)
+    return key, content
+
+def record_answer(stage, model, key, response, seconds):
+    """Counts a completed call towards the stage and `model`'s tier, caches and returns its text."""
+    get_metrics().record_response(PROMPT_STAGES[stage], response, model, seconds)
+    content = (response.choices[0].message.content or '').strip()
+    get_cache().set(key, content)
+    return content
+
+def record_failure(stage, error):
+    get_metrics().add(PROMPT_STAGES[stage], errors=1)
+    if isinstance(error, LLMCallError):
+        error.stage = PROMPT_STAGES[stage]
+
+def settle(stage, model, tier, content, validate):
+    """
+    Whether a model's answer is final: it passes `validate`, there is no
+    validator, or `model` is the last tier. Counts the answer as accepted
+    or escalated.
+    """
+    final = validate is None or tier == len(model_tiers(stage)) - 1 or validate(content)
+    get_metrics().record_tier(PROMPT_STAGES[stage], model, **{'accepted' if final else 'escalated': 1})
+    return final
+
+def complete(stage, cache_input, prompt, validate=None, **kwargs):
+    """
+    Runs a single-prompt chat completion through the response cache
+    and returns the stripped response text. The prompt goes to the stage's
+    model tiers in order: an answer `validate` rejects is asked again of
+    the next model, and the last model's answer is returned as it is.
+    Raises LLMCallError, with the pipeline stage set, when a call fails.
+    """
+    with get_metrics().stage(PROMPT_STAGES[stage]):
+        for tier, model in enumerate(model_tiers(stage)):
+            key, content = cached_answer(stage, model, cache_input, kwargs)
+            if content is None:
+                start = time.perf_counter()
+                try:
+                    response = get_client().chat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        latency_key=(stage, model),
+                        **kwargs
+                    )
+                except Exception as e:
+                    record_failure(stage, e)
+                    raise
+                content = record_answer(stage, model, key, response, time.perf_counter() - start)
+            if settle(stage, model, tier, content, validate):
+                return content
+
+async def acomplete(stage, cache_input, prompt, validate=None, **kwargs):
+    """Async variant of complete."""
+    with get_metrics().stage(PROMPT_STAGES[stage]):
+        for tier, model in enumerate(model_tiers(stage)):
+            key, content = cached_answer(stage, model, cache_input, kwargs)
+            if content is None:
+                start = time.perf_counter()
+                try:
+                    response = await get_client().achat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        latency_key=(stage, model),
+                        **kwargs
+                    )
+                except Exception as e:
+                    record_failure(stage, e)
+                    raise
+                content = record_answer(stage, model, key, response, time.perf_counter() - start)
+            if settle(stage, model, tier, content, validate):
+                return content
+
+async def astream_complete(stage, cache_input, prompt, receiver, **kwargs):
+    """
+    Streamed variant of acomplete for answers that are used line by line: the
+    text is handed to `receiver` as it is generated (see LLMClient.astream_chat),
+    or all at once when it is cached. Goes to the stage's first model, as there
+    is no check to escalate on. Returns the text received.
+    """
+    model = model_tiers(stage)[0]
+    with get_metrics().stage(PROMPT_STAGES[stage]):
+        key, content = cached_answer(stage, model, cache_input, kwargs)
+        if content is not None:
+            receiver.restart()
+            receiver.feed(content)
+            return content
+        start = time.perf_counter()
+        try:
+            response = await get_client().astream_chat([{"role": "user", "content": prompt}], receiver,
+                                                       model=model, **kwargs)
+        except Exception as e:
+            record_failure(stage, e)
+            raise
+        get_metrics().record_response(PROMPT_STAGES[stage], response, model, time.perf_counter() - start)
+        # An answer closed early still holds everything that was asked for, so it is cached as well
+        content = response.text.strip()
+        get_cache().set(key, content)
+        settle(stage, model, 0, content, None)
+        return content
+
+# Answer checks for the model cascade; a rejected answer is asked again of the next model
+
+def is_title_answer(answer):
+    """A full title answer with all 7 fields."""
+    return parse_title_answer(answer) is not None
+
+def fields_answer_check(missing):
+    """Check of a missing-fields answer: one part per missing field."""
+    return lambda answer: parse_fields_answer(answer, missing) is not None
+
+def category_check(catalog):
+    """Check of a category answer: it names one of the catalog's categories."""
+    return lambda answer: catalog.find_category(answer) is not None
+
+def product_check(category_products):
+    """Check of a product answer: it resolves to one of `category_products`."""
+    return lambda answer: find_product_by_keywords(answer, category_products) is not None
+
+def build_product_info_prompt(text):
+    """Builds the title generation prompt for a product description."""
     system_prompt = """
     Extract product information and return ONLY a single line following this exact format:
     [product type], MODECAR, [car make], [car model], [year range], [additional information], [part number]
@@ -39,26 +221,82 @@ def extract_product_info(text):
     If any part of the information is not available in the description, ignore that. Only provide the product title in the specified format, with no extra information or explanations.
     """
     
-    prompt = f"{system_prompt}\n\nText to process:\n{text}"
-    
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        final_response = remove_null(response.choices[0].message.content.strip())
-        return final_response
-    except Exception as e:
-        return f"Error occurred: {str(e)}"
+    return f"{system_prompt}\n\nText to process:\n{text}"
 
-def extract_product_categories(product_list):
-    """Categorize products using OpenAI API."""
-    client = OpenAI(
-        api_key=os.getenv("API"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-    
+def build_missing_fields_prompt(text, fields, missing):
+    """Builds a title generation prompt that asks only for the fields the local extractor missed."""
+    known = '\n'.join(f"    - {FIELD_LABELS[name]}: {value}" for name, value in fields.items() if value)
     system_prompt = f"""
+    Extract only the following product information and return ONLY a single line in this exact format:
+    {', '.join(f'[{FIELD_LABELS[name]}]' for name in missing)}
+
+    Rules:
+    - Return ONLY the formatted string, no explanations or additional text
+    - Product name in small letters
+    - Use "null" for any missing information
+    - Years must be in YYYY-YYYY format
+    - Always include all {len(missing)} parts separated by commas
+
+    Already extracted, do not repeat:
+{known or '    - nothing'}
+    """
+
+    return f"{system_prompt}\n\nText to process:\n{text}"
+
+def extract_title_fields(text):
+    """
+    Runs the local extractor over a description.
+    Returns (fields, missing required fields), or (None, None) when the extractor is disabled.
+    """
+    if not EXTRACTOR_ENABLED:
+        return None, None
+    metrics = get_metrics()
+    with metrics.stage('title_generation'):
+        fields = get_extractor().extract(text)
+    missing = missing_fields(fields)
+    if not missing:
+        metrics.add('title_generation', local_answers=1)
+    return fields, missing
+
+def fill_title_fields(fields, missing, answer):
+    """
+    Fills the missing fields from a missing-fields answer and returns the title,
+    or None when the answer does not have one part per missing field.
+    """
+    answer_fields = parse_fields_answer(answer, missing)
+    if answer_fields is None:
+        return None
+    return remove_null(format_title(merge_fields(fields, answer_fields, missing)))
+
+def title_from_full_answer(fields, answer):
+    """Title from a full 7-part answer, keeping the fields found locally."""
+    answer_fields = parse_title_answer(answer)
+    if fields is None or answer_fields is None:
+        return remove_null(answer)
+    return remove_null(format_title(merge_fields(fields, answer_fields, list(answer_fields))))
+
+def extract_product_info(text):
+    """
+    Extract product information: fields found by the local extractor are used
+    as they are, and the LLM is only asked for the required fields still missing.
+    """
+    fields, missing = extract_title_fields(text)
+    if fields is not None and not missing:
+        return remove_null(format_title(fields))
+
+    if fields is not None:
+        prompt = build_missing_fields_prompt(text, fields, missing)
+        title = fill_title_fields(fields, missing, complete('product_info_fields', prompt, prompt,
+                                                           validate=fields_answer_check(missing)))
+        if title is not None:
+            return title
+    # Without the extractor, or when the short answer could not be parsed
+    prompt = build_product_info_prompt(text)
+    return title_from_full_answer(fields, complete('product_info', text, prompt, validate=is_title_answer))
+
+def build_categories_prompt(product_list):
+    """Builds the catalog categorization prompt for a '- product' list."""
+    return f"""
 Ești un expert în categorisirea pieselor auto. Sarcina ta este să clasifici fiecare produs auto din lista de mai jos
 în una dintre următoarele categorii, pe baza funcției sale sau a asocierii cu anumite sisteme ale vehiculului.
 
@@ -85,218 +323,951 @@ Categorii:
 
 **Formatul răspunsului trebuie să fie exact:**
 """
+
+def extract_product_categories(product_list):
+    """Categorize products using OpenAI API."""
+    system_prompt = build_categories_prompt(product_list)
     
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": system_prompt}]
-        )
-        return response.choices[0].message.content.strip()
+        return complete('categories', product_list, system_prompt)
     except Exception as e:
         print(f"Error occurred during API call: {str(e)}")
         return ""
 
-def parse_llm_response(response_text):
+async def extract_product_categories_async(product_list, parser):
     """
-    Parses the LLM response and returns a dictionary of product-category pairs.
-    Expected format: 'Produs: Categorie' per line.
+    Async variant of extract_product_categories that hands the answer to
+    `parser` (a CategoryLineParser): streamed as it is generated with
+    CATEGORIZE_STREAM, otherwise once the whole answer is in. Pairs parsed
+    before a failed call are kept.
     """
-    categorized = {}
-    lines = response_text.split('\n')
-    for line_number, line in enumerate(lines, start=1):
-        if ':' in line:
-            try:
-                product, category = line.split(':', 1)
-                product = product.strip().lstrip('-').strip()
-                category = category.strip()
-                valid_categories = [
-                    "Sistem de frânare",
-                    "Suspensie și direcție",
-                    "Componente motor",
-                    "Transmisie și ambreiaj",
-                    "Sistem de răcire și încălzire",
-                    "Sistem electric și senzori",
-                    "Caroserie și interior",
-                    "Sistem de combustibil și emisii",
-                    "Sistem de evacuare",
-                    "Diverse"
-                ]
-                if category not in valid_categories:
-                    print(f"Line {line_number}: Invalid category '{category}' for product '{product}'. Skipping.")
-                    continue
-                if product and category:
-                    categorized[product] = category
-                else:
-                    print(f"Line {line_number}: Incomplete data. Skipping.")
-            except ValueError:
-                print(f"Line {line_number}: Unable to split line. Skipping.")
-                continue  # Skip lines that don't match the expected format
+    system_prompt = build_categories_prompt(product_list)
+
+    try:
+        if CATEGORIZE_STREAM:
+            await astream_complete('categories', product_list, system_prompt, parser)
         else:
-            print(f"Line {line_number}: No ':' found in line. Skipping.")
-    return categorized
+            parser.feed(await acomplete('categories', product_list, system_prompt))
+    except Exception as e:
+        print(f"Error occurred during API call: {str(e)}")
+    parser.finish()
+
+# Categories the categorization prompt offers; answers naming anything else are skipped
+CATALOG_CATEGORIES = frozenset([
+    "Sistem de frânare",
+    "Suspensie și direcție",
+    "Componente motor",
+    "Transmisie și ambreiaj",
+    "Sistem de răcire și încălzire",
+    "Sistem electric și senzori",
+    "Caroserie și interior",
+    "Sistem de combustibil și emisii",
+    "Sistem de evacuare",
+    "Diverse"
+])
+
+def parse_category_line(line):
+    """(product, category) of a 'Produs: Categorie' answer line, or None when it is not a valid pair."""
+    product, separator, category = line.partition(':')
+    if not separator:
+        return None
+    product = product.strip().lstrip('-').strip()
+    category = category.strip()
+    if not product or category not in CATALOG_CATEGORIES:
+        return None
+    return product, category
+
+class CategoryLineParser:
+    """
+    Incremental parser of a categorization answer for one batch.
+    Lines are parsed as soon as they are complete, and the first valid pair
+    for each product of the batch is handed to `on_pair(product, category)`
+    right away. feed returns True once every product is assigned, so the
+    rest of a streamed answer can be dropped.
+    """
+
+    def __init__(self, products, on_pair):
+        self.pending = set(products)
+        self.on_pair = on_pair
+        self.buffer = ''
+        self.skipped = 0
+
+    def restart(self):
+        """Drops the partial line of an answer that is being started over."""
+        self.buffer = ''
+
+    def feed(self, text):
+        *lines, self.buffer = (self.buffer + text).split('\n')
+        for line in lines:
+            self._parse(line)
+        return not self.pending
+
+    def finish(self):
+        """Parses the last line of the answer, which has no newline after it."""
+        line, self.buffer = self.buffer, ''
+        self._parse(line)
+        return not self.pending
+
+    def _parse(self, line):
+        pair = parse_category_line(line)
+        if pair is None or pair[0] not in self.pending:
+            if line.strip():
+                self.skipped += 1
+            return
+        self.pending.discard(pair[0])
+        self.on_pair(*pair)
 
 def convert_to_batches(product_list, batch_size=50):
     """Splits the product list into batches of specified size."""
     return [product_list[i:i + batch_size] for i in range(0, len(product_list), batch_size)]
 
-def categorize_products(product_list):
+def product_token_cost(product):
+    """Estimated tokens a product adds to a categorization batch: its prompt line plus its answer line."""
+    line = f"- {product}"
+    return 2 * estimate_text_tokens(line) + CATEGORY_ANSWER_TOKENS
+
+async def categorize_products_async(product_list, concurrency=CATEGORIZE_CONCURRENCY,
+                                    batch_tokens=CATEGORIZE_BATCH_TOKENS):
     """
-    Categorizes all products, ensuring that every product is assigned a category.
-    Reprocesses uncategorized products until all are categorized.
-    Returns a pandas DataFrame with products and their assigned categories.
+    Categorizes products with `concurrency` batches in flight.
+    Batches are packed up to `batch_tokens` estimated tokens, and products a
+    response did not categorize go straight back into the queue to be packed
+    into the next batches, up to CATEGORIZE_MAX_ATTEMPTS times each.
+    Returns {product: (input position, category)}.
     """
     categorized_products = {}
-    remaining_products = [product[0] for product in product_list if product[0]]
+    queue = asyncio.Queue()
+    # Caps unfinished products so a huge product file is only read as fast as it is categorized
+    capacity = asyncio.Semaphore(max(1, concurrency) * CATEGORIZE_MAX_BATCH_SIZE * 2)
+
+    async def produce():
+        for position, product in enumerate(product[0] for product in product_list if product[0]):
+            await capacity.acquire()
+            queue.put_nowait((position, product, 0))
 
-    iteration = 1
-    max_iterations = 4  # To prevent infinite loops
-    while remaining_products and iteration <= max_iterations:
-        batches = convert_to_batches(remaining_products, batch_size=50)
-        new_remaining = []
+    async def worker():
+        while True:
+            batch = [await queue.get()]
+            tokens = product_token_cost(batch[0][1])
+            while len(batch) < CATEGORIZE_MAX_BATCH_SIZE and not queue.empty():
+                item = queue.get_nowait()
+                cost = product_token_cost(item[1])
+                if tokens + cost > batch_tokens:
+                    # Does not fit; hand it to the next batch
+                    queue.put_nowait(item)
+                    queue.task_done()
+                    break
+                batch.append(item)
+                tokens += cost
 
-        for i, batch in enumerate(batches, start=1):
             # Convert batch list to a string formatted for the prompt
-            batch_str = '\n'.join([f"- {product}" for product in batch])
-            response = extract_product_categories(batch_str)
-            
-            if not response:
-                new_remaining.extend(batch)
-                time.sleep(2)  # Wait before retrying
-                continue
+            batch_str = '\n'.join([f"- {product}" for _, product, _ in batch])
+            waiting = {}
+            for item in batch:
+                waiting.setdefault(item[1], []).append(item)
 
-            categorized = parse_llm_response(response)
-            for product in batch:
-                if product in categorized and categorized[product]:
-                    categorized_products[product] = categorized[product]
-                else:
-                    new_remaining.append(product)
-            
+            def assign(product, category):
+                # Recorded as its line arrives, which frees room for more products to be read;
+                # a product listed more than once keeps its first position
+                for position, _, _ in waiting.pop(product):
+                    if product not in categorized_products or position < categorized_products[product][0]:
+                        categorized_products[product] = (position, category)
+                    capacity.release()
 
-        if new_remaining == remaining_products:
-            break
+            parser = CategoryLineParser(waiting, assign)
+            await extract_product_categories_async(batch_str, parser)
+            if parser.skipped:
+                print(f"Skipped {parser.skipped} unusable lines in a categorization answer.")
 
-        remaining_products = new_remaining
-        if remaining_products:
-            iteration += 1
-            time.sleep(2)  # Wait before next iteration to avoid rate limits
+            for items in waiting.values():
+                for position, product, attempts in items:
+                    if attempts + 1 < CATEGORIZE_MAX_ATTEMPTS:
+                        queue.put_nowait((position, product, attempts + 1))
+                    else:
+                        print(f"Giving up on categorizing '{product}' after {attempts + 1} attempts.")
+                        capacity.release()
+            # Only now, so the run does not end while the call is still being recorded and cached
+            for _ in batch:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await produce()
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await get_client().aclose()
+    return categorized_products
+
+def categorize_products(product_list):
+    """
+    Categorizes all products, ensuring that every product is assigned a category.
+    Reprocesses uncategorized products until all are categorized.
+    `product_list` may be a lazy iterable of rows; batches are sent while it is still being read.
+    Returns a pandas DataFrame with products and their assigned categories, in input order.
+    """
+    categorized_products = asyncio.run(categorize_products_async(product_list))
 
     # Convert the dictionary to a DataFrame
-    df = pd.DataFrame(list(categorized_products.items()), columns=['Product', 'Category'])
+    ordered = sorted(categorized_products.items(), key=lambda item: item[1][0])
+    df = pd.DataFrame(
+        [(product, category) for product, (_, category) in ordered], columns=['Product', 'Category']
+    )
     return df
 
-def find_category_by_keywords(llm_output, categories):
-    """Finds the category based on keywords in the LLM output."""
-    # Convert LLM output to lowercase for case-insensitive matching
-    llm_output = llm_output.lower()
-    
-    # Create a dictionary of categories and their lowercase versions
-    category_keywords = {cat.lower(): cat for cat in categories}
-    
-    # Check if any category word appears in the LLM output
-    for keyword, original_category in category_keywords.items():
-        if keyword in llm_output:
-            return original_category
-    
-    return None
+def categorize_products_incrementally(product_list, saved_df=None):
+    """
+    Categorizes a product type file against the saved catalog.
+    Products whose hash is already in `saved_df` keep their saved category;
+    only added or changed products are sent to the LLM, and products no
+    longer in the file are dropped. `product_list` may be a lazy iterable.
+    Returns a DataFrame with Product, Category and Hash columns in input order.
+    """
+    saved = {}
+    if saved_df is not None:
+        saved = dict(zip(saved_df['Hash'], saved_df['Category']))
+
+    prompt_version = PROMPT_VERSIONS['categories']
+    models = model_tiers('categories')
+    order = []
+    hashes = {}
+    reused = {}
+
+    def new_products():
+        for row in product_list:
+            product = row[0]
+            if not product or product in hashes:
+                continue
+            hashes[product] = product_hash(product, prompt_version, models)
+            order.append(product)
+            if hashes[product] in saved:
+                reused[product] = saved[hashes[product]]
+            else:
+                yield [product]
+
+    categorized = categorize_products(new_products())
+    categories = {**reused, **dict(zip(categorized['Product'], categorized['Category']))}
+
+    removed_count = len(set(saved) - set(hashes.values()))
+    print(f"Catalog: {len(reused)} products reused, {len(categorized)} categorized, "
+          f"{removed_count} removed.")
+
+    rows = [(product, categories[product], hashes[product]) for product in order if product in categories]
+    return pd.DataFrame(rows, columns=['Product', 'Category', 'Hash'])
 
 def find_product_by_keywords(llm_output, category_products):
     """Finds the product based on keywords in the LLM output."""
-    # Convert LLM output and products to lowercase for case-insensitive matching
-    llm_output = llm_output.lower()
-    
-    # Create a dictionary of products and their lowercase versions
-    product_keywords = {prod.lower(): prod for prod in category_products}
-    
-    # First try exact matching
-    for keyword, original_product in product_keywords.items():
-        if keyword in llm_output:
-            return original_product
-    
-    # If no exact match, try fuzzy matching
-    # Split LLM output into words
-    llm_words = llm_output.split()
-    
-    best_match = None
-    highest_ratio = 0
-    
-    # Compare each word against each product
-    for word in llm_words:
-        for keyword, original_product in product_keywords.items():
-            ratio = fuzz.ratio(word, keyword)
-            if ratio > highest_ratio and ratio > 80:  # 80% similarity threshold
-                highest_ratio = ratio
-                best_match = original_product
-    
-    return best_match if best_match else None
+    # Exact substring match first, then fuzzy matching with an 80% similarity threshold
+    return get_matcher(category_products).find(llm_output, threshold=80)
 
-def extract_category_for_product(product_title, categories):
-    """Extracts the category for a given product title using OpenAI API."""
-    client = OpenAI(
-        api_key=os.getenv("API2"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-    
-    prompt = f"""
+def build_category_prompt(product_title, categories_text):
+    """Builds the category lookup prompt for a sample product title."""
+    return f"""
 Given the following product title, determine which category it belongs to.
 Product: {product_title}
 
 Respond with only the category name from the following options:
-{', '.join(categories)}
+{categories_text}
 """
-    
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=100
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error processing: {e}")
-        return "Unknown"
 
-def get_similar_products(category, product_title, df):
-    """Finds similar products within the same category using OpenAI API."""
-    # Get all products from the same category
-    category_products = df[df['Category'] == category]['Product'].tolist()
-    
-    client = OpenAI(
-        api_key=os.getenv("API2"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-    
-    prompt = f"""
+def extract_category_for_product(product_title, catalog):
+    """Extracts the category for a given product title using OpenAI API."""
+    prompt = build_category_prompt(product_title, catalog.categories_text)
+    cache_input = f"{product_title}\n{catalog.categories_text}"
+    return complete('category', cache_input, prompt, validate=category_check(catalog),
+                    temperature=0, max_tokens=100)
+
+def build_similar_products_prompt(product_title, products_text):
+    """Builds the product matching prompt for a sample product title."""
+    return f"""
 Given the following product: {product_title}
 And these similar products from the same category:
-{', '.join(category_products)}
+{products_text}
 
 Return exactly ONE product from the list that most closely matches the given product.
 Respond with only the product name, nothing else.
 """
+
+def resolve_similar_product(llm_output, category_products):
+    """Maps the LLM product answer back onto a catalog product."""
+    # Try to find exact product match from LLM output
+    matched_product = find_product_by_keywords(llm_output, category_products)
+    if matched_product:
+        return matched_product
+    else:
+        print(f"No exact product match found in LLM output: {llm_output}")
+        return "No match found"
+
+def shortlist_products(category, product_title, catalog, index=None):
+    """
+    Returns (candidate_products, confident_match) for a sample title.
+    Without an index every product of the category is a candidate; with one,
+    only the top-k most similar products are, and a clear winner is returned
+    as `confident_match` so the LLM call can be skipped.
+    """
+    metrics = get_metrics()
+    with metrics.stage('product_matching'):
+        if index is None:
+            return catalog.category_products(category), None
+
+        candidates = index.search(category, product_title, SHORTLIST_TOP_K)
+        if is_confident(candidates, SHORTLIST_ACCEPT_SCORE, SHORTLIST_MARGIN):
+            metrics.add('product_matching', local_answers=1)
+            return [candidates[0][0]], candidates[0][0]
+        return [product for product, _ in candidates], None
+
+def candidates_text(catalog, category, category_products):
+    """The candidate products joined for a prompt; a whole category's text comes from the catalog index."""
+    if category_products is catalog.category_products(category):
+        return catalog.products_text(category)
+    return ', '.join(category_products)
+
+def get_similar_products(category, product_title, catalog, index=None):
+    """Finds similar products within the same category using OpenAI API."""
+    # Get the products from the same category (shortlisted when an index is given)
+    category_products, confident_match = shortlist_products(category, product_title, catalog, index)
+    if confident_match is not None:
+        return confident_match
     
+    products_text = candidates_text(catalog, category, category_products)
+    prompt = build_similar_products_prompt(product_title, products_text)
+    cache_input = f"{product_title}\n{products_text}"
+    llm_output = complete('similar_products', cache_input, prompt, validate=product_check(category_products),
+                          temperature=0, max_tokens=100)
+    return resolve_similar_product(llm_output, category_products)
+
+def match_category(llm_category, catalog):
+    """Resolves the LLM category answer to a known category, or None."""
+    # Try keyword matching on LLM output
+    category = catalog.find_category(llm_category)
+
+    if category is None:
+        print(f"No matching category found in LLM output: {llm_category}")
+    else:
+        print(f"Category found by keyword matching: {category}")
+    return category
+
+def classify_locally(classifier, product_title):
+    """
+    Returns (category, audit) from the local classifier: `category` when the
+    category lookup LLM call can be skipped, `audit` for holdout rows whose
+    LLM answer is compared with it. (None, None) without a classifier.
+    """
+    if classifier is None:
+        return None, None
+    metrics = get_metrics()
+    with metrics.stage('category_lookup'):
+        category, audit = classifier.decide(product_title)
+    if category is not None:
+        metrics.add('category_lookup', local_answers=1)
+    return category, audit
+
+def recall_row(memo, product_title, catalog, title_key=None):
+    """
+    Returns (result, exact) for a title from the result memo, or (None, False).
+    A stored row is only reused while its product is still in its catalog
+    category and it was resolved with the current models and prompts (see
+    memo_version); an identical title reuses the whole row, a near-identical
+    one its category and product.
+    """
+    if memo is None:
+        return None, False
+    metrics = get_metrics()
+    with metrics.stage('category_lookup'):
+        result, exact = memo.lookup(
+            product_title, title_key,
+            accept=lambda result: catalog.has_product(result['Category'], result['Product Type']),
+            version=memo_version()
+        )
+    if result is not None:
+        metrics.add('category_lookup', local_answers=1)
+        metrics.add('product_matching', local_answers=1)
+        if exact:
+            metrics.add('title_generation', local_answers=1)
+    return result, exact
+
+def remember_row(memo, product_title, result, title_key=None):
+    """Stores a row resolved by the pipeline in the result memo; unmatched rows are not kept."""
+    if memo is not None and result['Category'] != "Unknown" and result['Product Type'] != "No match found":
+        memo.store(product_title, result, title_key, memo_version())
+
+def process_sample_row(product_title, catalog, index=None, classifier=None, memo=None, title_key=None):
+    """
+    Generates the title and matched product for one normalized sample row (see normalized_chunks).
+    With `memo`, a title resolved in an earlier run, or a near-identical one, reuses that row's
+    category and product, and rows resolved here are stored in it.
+    """
+    if product_title is None:
+        return blank_result()
+
+    remembered, exact = recall_row(memo, product_title, catalog, title_key)
+    if exact:
+        return remembered
+
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=100
+        # Generate a clean product title
+        generated_title = extract_product_info(product_title)
+
+        if remembered is not None:
+            category, matched_product = remembered['Category'], remembered['Product Type']
+        else:
+            # Get the category locally when the classifier is confident, otherwise from the LLM
+            category, audit = classify_locally(classifier, product_title)
+            if category is None:
+                llm_category = extract_category_for_product(product_title, catalog)
+                category = match_category(llm_category, catalog)
+                if audit is not None:
+                    classifier.record_audit(audit, category)
+
+            if category is not None:
+                # Get similar product from the category
+                matched_product = get_similar_products(category, product_title, catalog, index)
+                print(f"Matched product: {matched_product}")
+            else:
+                category = "Unknown"
+                matched_product = "No match found"
+    except LLMCallError as e:
+        return failed_result(e)
+
+    result = {
+        'Product Title': generated_title,
+        'Product Type': matched_product,
+        'Category': category
+    }
+    if remembered is None:
+        remember_row(memo, product_title, result, title_key)
+    return result
+
+async def extract_product_info_async(text, fields=None, missing=None):
+    """Async variant of extract_product_info; `fields` and `missing` skip re-running the extractor."""
+    if fields is None:
+        fields, missing = extract_title_fields(text)
+    if fields is not None and not missing:
+        return remove_null(format_title(fields))
+
+    if fields is not None:
+        prompt = build_missing_fields_prompt(text, fields, missing)
+        title = fill_title_fields(fields, missing, await acomplete('product_info_fields', prompt, prompt,
+                                                                 validate=fields_answer_check(missing)))
+        if title is not None:
+            return title
+    prompt = build_product_info_prompt(text)
+    return title_from_full_answer(fields, await acomplete('product_info', text, prompt,
+                                                          validate=is_title_answer))
+
+async def extract_category_for_product_async(product_title, catalog):
+    """Async variant of extract_category_for_product."""
+    prompt = build_category_prompt(product_title, catalog.categories_text)
+    cache_input = f"{product_title}\n{catalog.categories_text}"
+    return await acomplete('category', cache_input, prompt, validate=category_check(catalog),
+                           temperature=0, max_tokens=100)
+
+async def get_similar_products_async(product_title, category_products, products_text):
+    """Async variant of get_similar_products for an already filtered category."""
+    prompt = build_similar_products_prompt(product_title, products_text)
+    cache_input = f"{product_title}\n{products_text}"
+    llm_output = await acomplete('similar_products', cache_input, prompt,
+                                 validate=product_check(category_products), temperature=0, max_tokens=100)
+    return resolve_similar_product(llm_output, category_products)
+
+async def match_product_async(product_title, catalog, index=None, classifier=None):
+    """Runs the category -> product matching chain and returns (category, matched_product)."""
+    category, audit = classify_locally(classifier, product_title)
+    if category is None:
+        llm_category = await extract_category_for_product_async(product_title, catalog)
+        category = match_category(llm_category, catalog)
+        if audit is not None:
+            classifier.record_audit(audit, category)
+
+    if category is None:
+        return "Unknown", "No match found"
+
+    category_products, matched_product = shortlist_products(category, product_title, catalog, index)
+    if matched_product is None:
+        matched_product = await get_similar_products_async(
+            product_title, category_products, candidates_text(catalog, category, category_products)
         )
-        llm_output = response.choices[0].message.content.strip()
-        
-        # Try to find exact product match from LLM output
-        matched_product = find_product_by_keywords(llm_output, category_products)
-        if matched_product:
-            return matched_product
+    print(f"Matched product: {matched_product}")
+    return category, matched_product
+
+async def process_sample_row_async(product_title, catalog, index=None, classifier=None, memo=None,
+                                   title_key=None):
+    """
+    Processes one sample row, running title generation alongside the
+    category -> product chain since the two do not depend on each other.
+    `memo` is used as in process_sample_row.
+    """
+    if product_title is None:
+        return blank_result()
+
+    remembered, exact = recall_row(memo, product_title, catalog, title_key)
+    if exact:
+        return remembered
+
+    try:
+        if remembered is not None:
+            generated_title = await extract_product_info_async(product_title)
+            category, matched_product = remembered['Category'], remembered['Product Type']
         else:
-            print(f"No exact product match found in LLM output: {llm_output}")
-            return "No match found"
-            
+            generated_title, (category, matched_product) = await asyncio.gather(
+                extract_product_info_async(product_title),
+                match_product_async(product_title, catalog, index, classifier)
+            )
+    except LLMCallError as e:
+        return failed_result(e)
+
+    result = {
+        'Product Title': generated_title,
+        'Product Type': matched_product,
+        'Category': category
+    }
+    if remembered is None:
+        remember_row(memo, product_title, result, title_key)
+    return result
+
+async def cancel_when_set(cancel_event, tasks):
+    """Cancels the in-flight row tasks once the threading.Event `cancel_event` is set."""
+    while not cancel_event.is_set():
+        await asyncio.sleep(0.1)
+    for task in list(tasks.values()):
+        task.cancel()
+
+async def process_sample_rows_async(product_rows, catalog, max_concurrency=MAX_CONCURRENCY,
+                                    index=None, journal=None, dedup=None, cancel_event=None,
+                                    classifier=None, memo=None):
+    """
+    Processes sample rows concurrently with at most `max_concurrency` rows in flight.
+    `product_rows` are (title, match key) pairs as yielded by normalized_chunks; they may
+    be a lazy iterable, which is only read as slots free up.
+    Rows already recorded in `journal` are reused, and new rows are recorded as they finish.
+    With `dedup`, repeated titles share the task of their first occurrence; when
+    that row fails, its repeats get their own attempt, which later repeats share.
+    Results are returned in the same order as `product_rows`. Once `cancel_event`
+    is set no new rows are started, rows in flight are cancelled and the rows that
+    did not finish are None.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results = []
+    tasks = {}
+
+    def record_row(i, task):
+        if journal is not None and not task.cancelled() and task.exception() is None:
+            journal.record(i, dict(task.result()))
+
+    def start_row(title, title_key, key):
+        """Processes a row, sharing its task with the title's repeats until it fails."""
+        task = asyncio.create_task(process_sample_row_async(title, catalog, index, classifier, memo, title_key))
+        task.add_done_callback(lambda _: semaphore.release())
+        if key is not None:
+            dedup.add(key, task)
+
+            def unshare_failed(task):
+                if not task.cancelled() and task.exception() is None and 'Error' in task.result():
+                    dedup.discard(key, task)
+            task.add_done_callback(unshare_failed)
+        return task
+
+    async def repeat_row(title, title_key, key, task):
+        """
+        The result of a repeated title from the task it shares. Failed rows are
+        not shared: the first repeat to see the failure gets its own attempt,
+        and the others wait for that one.
+        """
+        while True:
+            result = await task
+            if 'Error' not in result:
+                return result
+            shared = dedup.results.get(key)
+            if shared is None or shared is task:
+                await semaphore.acquire()
+                return await start_row(title, title_key, key)
+            task = shared
+
+    watcher = asyncio.create_task(cancel_when_set(cancel_event, tasks)) if cancel_event is not None else None
+    try:
+        for i, (title, title_key) in enumerate(product_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if journal is not None and i in journal.completed:
+                results.append(journal.completed[i])
+                continue
+
+            key, earlier = (dedup.lookup(title, title_key) if dedup is not None and title is not None
+                            else (None, None))
+            if earlier is not None:
+                task = asyncio.create_task(repeat_row(title, title_key, key, earlier))
+            else:
+                # Wait for a free slot before pulling the next row from the reader
+                await semaphore.acquire()
+                task = start_row(title, title_key, key)
+            task.add_done_callback(lambda task, i=i: record_row(i, task))
+            tasks[i] = task
+            results.append(None)
+
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for i, outcome in zip(tasks, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                continue  # Cancelled by the user; the row stays unfinished
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results[i] = dict(outcome)
+        return results
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await get_client().aclose()
+
+def build_batch_product_info_prompt(batch):
+    """Builds one title generation prompt for a batch of (index, description) pairs."""
+    products = '\n'.join(f"{index}|{' '.join(text.split())}" for index, text in batch)
+    return f"""
+    Extract product information for every numbered product description below.
+    Return exactly one line per description in this format:
+    <number>|[product type], MODECAR, [car make], [car model], [year range], [additional information], [part number]
+
+    Rules:
+    - <number> is the number before the '|' of the description
+    - Return ONLY these lines, no explanations or additional text
+    - Product name in small letters
+    - MODECAR always in capitals
+    - Use "null" for any missing information
+    - Years must be in YYYY-YYYY format
+    - Always include all 7 parts separated by commas
+
+    Descriptions:
+    {products}
+    """
+
+def build_batch_category_prompt(batch, categories_text):
+    """Builds one category lookup prompt for a batch of (index, product title) pairs."""
+    products = '\n'.join(f"{index}|{' '.join(str(title).split())}" for index, title in batch)
+    return f"""
+Given the following numbered product titles, determine which category each one belongs to.
+Return exactly one line per product in this format:
+<number>|<category name>
+
+Use only category names from the following options:
+{categories_text}
+
+Products:
+{products}
+"""
+
+def parse_indexed_response(response_text, expected_indices):
+    """
+    Strictly parses '<number>|<answer>' lines into {index: answer}.
+    Lines with unknown or repeated numbers, or empty answers, are ignored so
+    that the affected rows show up as missing and get re-queued.
+    """
+    parsed = {}
+    for line in response_text.split('\n'):
+        match = INDEXED_LINE_PATTERN.match(line)
+        if not match:
+            continue
+        index = int(match.group(1))
+        if index in expected_indices and index not in parsed:
+            parsed[index] = match.group(2)
+    return parsed
+
+async def run_batched_stage(stage, items, build_prompt, batch_size, semaphore, cancel_event=None):
+    """
+    Answers {index: text} items batch_size at a time.
+    Rows missing from a response are re-packed into later batches; rows still
+    missing after BATCH_MAX_ROUNDS are returned as missing for per-row fallback.
+    Once `cancel_event` is set, batches still waiting for the semaphore and
+    later rounds are not sent.
+    Returns ({index: answer}, request_count).
+    """
+    answers = {}
+    pending = list(items)
+    request_count = 0
+
+    async def run_batch(batch_indices):
+        batch = [(index, items[index]) for index in batch_indices]
+        prompt = build_prompt(batch)
+        async with semaphore:
+            if cancel_event is not None and cancel_event.is_set():
+                return {}
+            try:
+                response = await acomplete(stage, prompt, prompt, temperature=0)
+            except Exception as e:
+                print(f"Error processing batch: {e}")
+                return {}
+        return parse_indexed_response(response, set(batch_indices))
+
+    for round_number in range(1, BATCH_MAX_ROUNDS + 1):
+        if not pending or (cancel_event is not None and cancel_event.is_set()):
+            break
+        batches = convert_to_batches(pending, batch_size)
+        request_count += len(batches)
+        for parsed in await asyncio.gather(*[run_batch(batch) for batch in batches]):
+            answers.update(parsed)
+        pending = [index for index in pending if index not in answers]
+        if pending and round_number < BATCH_MAX_ROUNDS:
+            print(f"Batch round {round_number}: {len(pending)} rows missing, re-queueing.")
+        elif pending:
+            print(f"{len(pending)} rows still missing, falling back to per-row requests.")
+
+    return answers, request_count
+
+async def process_sample_chunk_batched(product_titles, catalog, batch_size, semaphore, index=None,
+                                       journal=None, offset=0, dedup=None, cancel_event=None,
+                                       classifier=None, title_keys=None, memo=None):
+    """
+    Processes one chunk of sample rows with batched title generation and category lookup.
+    Rows a batch never answered fall back to the per-row requests; product
+    matching stays per row because every row has its own candidate list.
+    `offset` is the file row number of the chunk's first row, used for the journal.
+    With `dedup`, only the first row of each normalized title is sent to the LLM;
+    `title_keys` are the titles' match keys when they were computed with the titles.
+    Rows the local extractor fully answers are left out of the title batches, and
+    rows the `classifier` is confident about are left out of the category batches.
+    Rows found in the result `memo` are left out of the category batches too, and
+    of the title batches when their title is identical.
+    When the title or category prompt cascades, batch answers that fail its check
+    are asked again per row, so they go through the stronger models.
+    Rows not yet started when `cancel_event` is set are left as None.
+    """
+    completed = journal.completed if journal is not None else {}
+    raw_titles = {}
+    duplicates = {}  # row -> earlier result, or the chunk row it repeats
+    chunk_keys = {}
+    for i, title in enumerate(product_titles):
+        if title is None or offset + i in completed:
+            continue
+        if dedup is not None:
+            key, earlier = dedup.lookup(title, title_keys[i] if title_keys is not None else None)
+            if earlier is not None or key in chunk_keys:
+                duplicates[i] = earlier if earlier is not None else chunk_keys[key]
+                continue
+            chunk_keys[key] = i
+        raw_titles[i] = title
+    remembered = {
+        i: recall_row(memo, title, catalog, title_keys[i] if title_keys is not None else None)
+        for i, title in raw_titles.items()
+    }
+    extracted = {i: extract_title_fields(title) for i, title in raw_titles.items() if not remembered[i][1]}
+    title_texts = {i: raw_titles[i] for i in extracted if extracted[i][1] != []}
+    local = {i: classify_locally(classifier, title) for i, title in raw_titles.items() if remembered[i][0] is None}
+    category_titles = {i: raw_titles[i] for i in local if local[i][0] is None}
+
+    (titles, title_requests), (llm_categories, category_requests) = await asyncio.gather(
+        run_batched_stage('product_info_batch', title_texts, build_batch_product_info_prompt,
+                          batch_size, semaphore, cancel_event),
+        run_batched_stage('category_batch', category_titles,
+                          lambda batch: build_batch_category_prompt(batch, catalog.categories_text),
+                          batch_size, semaphore, cancel_event)
+    )
+    print(f"Batched {len(raw_titles)} rows into {title_requests + category_requests} requests.")
+
+    async def match_row(i):
+        """Title, category and product of a row, from the memo, the batch answers or per-row requests."""
+        stored, exact = remembered[i]
+        if exact:
+            return stored
+
+        fields, missing = extracted[i]
+        if fields is not None and not missing:
+            generated_title = remove_null(format_title(fields))
+        elif i in titles and (not cascades('product_info') or is_title_answer(titles[i])):
+            generated_title = title_from_full_answer(fields, titles[i])
+        else:
+            generated_title = await extract_product_info_async(raw_titles[i], fields, missing)
+
+        if stored is not None:
+            return {
+                'Product Title': generated_title,
+                'Product Type': stored['Product Type'],
+                'Category': stored['Category']
+            }
+
+        category, audit = local[i]
+        if category is None:
+            if i in llm_categories and (not cascades('category')
+                                        or catalog.find_category(llm_categories[i]) is not None):
+                llm_category = llm_categories[i]
+            else:
+                llm_category = await extract_category_for_product_async(raw_titles[i], catalog)
+            category = match_category(llm_category, catalog)
+            if audit is not None:
+                classifier.record_audit(audit, category)
+
+        if category is None:
+            category = "Unknown"
+            matched_product = "No match found"
+        else:
+            category_products, matched_product = shortlist_products(category, raw_titles[i], catalog, index)
+            if matched_product is None:
+                matched_product = await get_similar_products_async(
+                    raw_titles[i], category_products, candidates_text(catalog, category, category_products)
+                )
+
+        result = {
+            'Product Title': generated_title,
+            'Product Type': matched_product,
+            'Category': category
+        }
+        remember_row(memo, raw_titles[i], result, title_keys[i] if title_keys is not None else None)
+        return result
+
+    async def finish_row(i):
+        if offset + i in completed:
+            return completed[offset + i]
+        if i in duplicates:
+            return None  # Fanned out from the row it repeats below
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        if i not in raw_titles:
+            result = blank_result()
+            if journal is not None:
+                journal.record(offset + i, result)
+            return result
+
+        async with semaphore:
+            # Every row of the chunk waits here, so a cancel must stop the ones not yet started
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            try:
+                result = await match_row(i)
+            except LLMCallError as e:
+                result = failed_result(e)
+        if journal is not None:
+            journal.record(offset + i, result)
+        return result
+
+    async def retry_repeats(key, rows):
+        """
+        Gives the repeats of a failed row their own per-row attempts in turn; once
+        one succeeds, the remaining repeats share its result.
+        """
+        result = None
+        for i in rows:
+            if result is None or 'Error' in result:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                async with semaphore:
+                    result = await process_sample_row_async(
+                        product_titles[i], catalog, index, classifier, memo,
+                        title_keys[i] if title_keys is not None else None
+                    )
+                if 'Error' not in result:
+                    dedup.add(key, result)
+            results[i] = dict(result)
+            if journal is not None:
+                journal.record(offset + i, results[i])
+
+    results = await asyncio.gather(*[finish_row(i) for i in range(len(product_titles))])
+
+    for key, i in chunk_keys.items():
+        # Failed rows are not shared with later repeats, which get their own attempt
+        if results[i] is not None and 'Error' not in results[i]:
+            dedup.add(key, results[i])
+    failed_repeats = {}  # chunk row that failed -> the rows repeating it
+    for i, earlier in duplicates.items():
+        source = earlier if isinstance(earlier, dict) else results[earlier]
+        if source is None:
+            continue  # The row it repeats was cancelled
+        if 'Error' in source:
+            failed_repeats.setdefault(earlier, []).append(i)
+            continue
+        results[i] = dict(source)
+        if journal is not None:
+            journal.record(offset + i, results[i])
+    row_keys = {i: key for key, i in chunk_keys.items()}
+    await asyncio.gather(*[retry_repeats(row_keys[source], rows) for source, rows in failed_repeats.items()])
+    return results
+
+async def process_sample_rows_batched(product_chunks, catalog, batch_size,
+                                      max_concurrency=1, index=None, journal=None, dedup=None,
+                                      cancel_event=None, classifier=None, memo=None):
+    """
+    Runs process_sample_chunk_batched over each (titles, match keys) chunk from
+    normalized_chunks, stopping before the next chunk once `cancel_event` is set.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results = []
+
+    try:
+        for product_titles, title_keys in product_chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            results.extend(
+                await process_sample_chunk_batched(product_titles, catalog, batch_size, semaphore,
+                                                   index, journal, offset=len(results), dedup=dedup,
+                                                   cancel_event=cancel_event, classifier=classifier,
+                                                   title_keys=title_keys, memo=memo)
+            )
+        return results
+    finally:
+        await get_client().aclose()
+
+def normalized_chunks(chunks):
+    """
+    Normalizes each chunk of sample cells as one column (see utils.normalize) and
+    yields (display titles, match keys) lists; empty cells are None in both.
+    """
+    for chunk in chunks:
+        titles, keys = normalize_column(chunk)
+        yield titles.to_pylist(), keys.to_pylist()
+
+class ResultStream:
+    """
+    Hands finished rows to `callback` as lists of (row index, result) pairs,
+    every `chunk_size` rows or `interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, callback, chunk_size=RESULT_CHUNK_ROWS, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.pending = []
+        self.last_flush = time.perf_counter()
+
+    def add(self, index, result):
+        self.pending.append((index, dict(result)))
+        if len(self.pending) >= self.chunk_size or time.perf_counter() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.perf_counter()
+        if self.pending:
+            rows, self.pending = self.pending, []
+            self.callback(rows)
+
+def read_chunks(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    read_first_column_chunks, reporting a read error with the file name. The file
+    is read as the chunks are consumed, so that is where its errors are raised.
+    """
+    try:
+        yield from read_first_column_chunks(path, chunk_size)
     except Exception as e:
-        print(f"Error processing similar products: {e}")
-        return "Error in processing"
+        print(f"Error loading '{path}': {str(e)}")
+        raise
+
+def update_catalog(product_type_path, catalog_path=CATALOG_PATH):
+    """
+    Categorizes a product type file against the catalog saved at `catalog_path`
+    and saves the result. Only new or changed products are sent to the LLM.
+    """
+    print(f"Categorizing products from '{product_type_path}'.")
+    metrics = get_metrics()
+    # Rows are streamed from the file while the first batches are categorized
+    product_chunks = metrics.timed_iter('file_load', read_chunks(product_type_path))
+    product_list = ([value] for value in chain.from_iterable(product_chunks))
+
+    with metrics.stage('catalog_categorization'):
+        df = categorize_products_incrementally(product_list, load_catalog(catalog_path))
+        save_catalog(df, catalog_path)
+    print("Categorization complete.")
+    return df
 
-def process_files(product_type_path, sample_file_path, use_previous, categorized_df):
+def process_files(product_type_path, sample_file_path, use_previous, categorized_df,
+                  async_mode=ASYNC_MODE, max_concurrency=MAX_CONCURRENCY,
+                  batch_size=SAMPLE_BATCH_SIZE, resume=True, catalog_path=CATALOG_PATH,
+                  progress_callback=None, result_callback=None, cancel_event=None):
     """
     Main processing function to categorize and match products.
 
@@ -304,73 +1275,210 @@ def process_files(product_type_path, sample_file_path, use_previous, categorized
         product_type_path (str): Path to the Product Type Excel file.
         sample_file_path (str): Path to the Sample Excel file.
         use_previous (bool): Flag to use existing categorized DataFrame.
-        categorized_df (pd.DataFrame or None): Existing categorized DataFrame.
+        categorized_df (pd.DataFrame or None): Existing categorized DataFrame; when None
+            with use_previous, the catalog saved at `catalog_path` is used.
+        async_mode (bool): Process sample rows concurrently with an async client.
+        max_concurrency (int): Number of sample rows kept in flight in async mode.
+        batch_size (int): Sample rows per title/category request; 0 sends one request per row.
+        resume (bool): Reuse rows finished by an interrupted run over the same inputs;
+            when False any earlier journal for these inputs is discarded.
+        catalog_path (str): Saved catalog that categorization is diffed against and written to.
+        progress_callback (callable or None): Called with progress/ETA messages while rows finish.
+        result_callback (callable or None): Called with lists of (row index, result dict)
+            pairs as rows finish, in completion order.
+        cancel_event (threading.Event or None): Once set, no new rows are started and the
+            rows finished so far are returned; the journal is kept so the run can resume.
 
     Returns:
-        pd.DataFrame: Processed results DataFrame.
+        pd.DataFrame: Processed results DataFrame indexed by sample row (only the finished
+            rows after a cancel); its attrs['run_stats'] holds the run report and the
+            'failed_rows' whose LLM calls failed. Those rows have empty fields and an
+            'Error' column, and processing the same files again retries just them.
     """
+    # Per-stage timings, LLM calls, retries, cache hits and tokens of this run
+    metrics = start_run(progress_callback)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+
+    if use_previous and categorized_df is None:
+        with metrics.stage('file_load'):
+            categorized_df = load_catalog(catalog_path)
+        if categorized_df is not None:
+            print(f"Loaded saved catalog from '{catalog_path}'.")
+
+    # Finished rows are journaled under a fingerprint of the inputs so an interrupted run can resume
+    fingerprint = run_fingerprint(
+        sample_file_path,
+        product_type_path=None if use_previous else product_type_path,
+        categorized_df=categorized_df if use_previous else None
+    )
+    stream = ResultStream(result_callback) if result_callback is not None else None
+
+    def on_record(index, result):
+        metrics.advance()
+        if stream is not None:
+            stream.add(index, result)
+
     # Step 1: Categorize products or use existing categories
     if use_previous:
         if categorized_df is not None:
             print("Using existing categorized DataFrame.")
-            df = categorized_df.copy()
+            df = categorized_df
         else:
             raise ValueError("No existing categorized data available.")
     else:
-        print(f"Categorizing products from '{product_type_path}'.")
-        try:
-            product_df = pd.read_excel(product_type_path, header=None)
-            product_list = product_df.values.tolist()
-        except Exception as e:
-            print(f"Error loading '{product_type_path}': {str(e)}")
-            raise e
+        df = update_catalog(product_type_path, catalog_path)
 
-        # Categorize products
-        df = categorize_products(product_list)
-        print("Categorization complete.")
-
-    # Step 2: Read sample file into sample_df
+    # Step 2: Stream the sample file in chunks
     try:
-        sample_df = pd.read_excel(sample_file_path, header=None)
+        with metrics.stage('file_load'):
+            total_rows = count_rows(sample_file_path)
+        sample_chunks = metrics.timed_iter(
+            'file_load', normalized_chunks(read_chunks(sample_file_path))
+        )
     except Exception as e:
         print(f"Error loading '{sample_file_path}': {str(e)}")
         raise e
 
-    # Proceed with processing using 'df' and 'sample_df'
-    # Get unique categories from 'df'
-    categories = df['Category'].unique()
+    # Index the catalog once: every row looks up categories, products and prompt text in it
+    # (whole categories' product lists are only joined up front when they are sent without a shortlist)
+    catalog = CatalogIndex(df, product_prompts=not SHORTLIST_ENABLED)
 
-    results = []
-    for index, row in sample_df.iterrows():
-        product_title = row[0]
+    # Build the local similarity index once; it shortlists products before matching
+    similarity_index = CategoryIndex(catalog.groups()) if SHORTLIST_ENABLED else None
 
-        # Generate a clean product title
-        clean_title = clean_text(product_title)
-        generated_title = extract_product_info(clean_title)
-
-        # First get LLM output for category
-        llm_category = extract_category_for_product(product_title, categories)
-        
-        # Then try keyword matching on LLM output
-        category = find_category_by_keywords(llm_category, categories)
-        
-        if category is not None:
-            print(f"Category found by keyword matching: {category}")
-            # Get similar product from the category
-            matched_product = get_similar_products(category, product_title, df)
-            print(f"Matched product: {matched_product}")
+    # Train the local classifier once; confident rows skip the category lookup LLM call
+    classifier = None
+    if CLASSIFIER_ENABLED and len(df) >= CLASSIFIER_MIN_EXAMPLES and len(catalog.categories) > 1:
+        with metrics.stage('category_lookup'):
+            classifier = CategoryClassifier(df)
+        if classifier.validation_accuracy is not None:
+            print(f"Trained category classifier on {len(df)} products "
+                  f"(catalog holdout accuracy {classifier.validation_accuracy:.1%}).")
+    # Rows only use the index from here on, so a catalog loaded or built above is released
+    del df
+
+    # Repeated titles (after normalization) are processed once and fanned out
+    dedup = TitleDeduplicator()
+
+    # Rows resolved in earlier runs, reused for identical and near-identical titles
+    memo = get_memo() if MEMO_ENABLED else None
+    if memo is not None:
+        memo.reset_stats()
+
+    # Opened once everything above succeeded, so a failed setup leaves no journal behind
+    journal = RunJournal(fingerprint, resume=resume, on_record=on_record)
+    if journal.completed:
+        print(f"Resuming interrupted run: {len(journal.completed)} rows already finished.")
+    metrics.start_rows(total_rows, resumed=len(journal.completed))
+    if stream is not None:
+        for index in sorted(journal.completed):
+            stream.add(index, journal.completed[index])
+        stream.flush()
+
+    try:
+        if batch_size and batch_size > 1:
+            print(f"Processing sample rows in batches of {batch_size}.")
+            results = asyncio.run(
+                process_sample_rows_batched(sample_chunks, catalog, batch_size,
+                                            max_concurrency if async_mode else 1, similarity_index, journal,
+                                            dedup, cancel_event, classifier, memo)
+            )
+        elif async_mode:
+            print(f"Processing sample rows asynchronously ({max_concurrency} in flight).")
+            product_rows = chain.from_iterable(zip(*chunk) for chunk in sample_chunks)
+            results = asyncio.run(
+                process_sample_rows_async(product_rows, catalog, max_concurrency,
+                                          similarity_index, journal, dedup, cancel_event, classifier, memo)
+            )
         else:
-            print(f"No matching category found in LLM output: {llm_category}")
-            category = "Unknown"
-            matched_product = "No match found"
-        
-        results.append({
-            'Product Title': generated_title,
-            'Product Type': matched_product
-        })
+            results = []
+            product_rows = chain.from_iterable(zip(*chunk) for chunk in sample_chunks)
+            for i, (product_title, title_key) in enumerate(product_rows):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if i in journal.completed:
+                    results.append(journal.completed[i])
+                    continue
+                key, earlier = (dedup.lookup(product_title, title_key) if product_title is not None
+                                else (None, None))
+                if earlier is not None:
+                    result = dict(earlier)
+                else:
+                    result = process_sample_row(product_title, catalog, similarity_index, classifier, memo,
+                                                title_key)
+                    if key is not None and 'Error' not in result:
+                        dedup.add(key, result)
+                journal.record(i, result)
+                results.append(result)
+    finally:
+        journal.close()
+        if stream is not None:
+            stream.flush()
+
+    finished = [(i, result) for i, result in enumerate(results) if result is not None]
+    failures = {i: result['Error'] for i, result in finished if 'Error' in result}
+    results_df = pd.DataFrame(
+        [result for _, result in finished], index=[i for i, _ in finished],
+        columns=OUTPUT_COLUMNS + (['Error'] if failures else [])
+    )
+    if failures:
+        results_df['Error'] = results_df['Error'].map(lambda failure: format_failure(failure)
+                                                      if isinstance(failure, dict) else '')
+    cancelled = cancel_event is not None and cancel_event.is_set() and len(finished) < total_rows
+    if cancelled:
+        # Keep the journal so the remaining rows can be processed later
+        print(f"Processing cancelled: {len(finished)} of {total_rows} rows finished. "
+              "Process the same files again to resume.")
+    if failures:
+        # Keep the journal too, so only the failed rows are sent again
+        kinds = Counter(failure['kind'] for failure in failures.values())
+        print(f"{len(failures)} rows failed ({', '.join(f'{count} {kind}' for kind, count in kinds.items())}). "
+              "Process the same files again to retry them.")
+    if not cancelled and not failures:
+        journal.finish()
+
+    dedup_stats = dedup.stats()
+    print(f"Deduplicated {dedup_stats['rows']} rows to {dedup_stats['unique_titles']} unique titles "
+          f"(dedup ratio {dedup_stats['dedup_ratio']:.1%}).")
 
-    results_df = pd.DataFrame(results)
+    cache_stats = get_cache().stats()
+    print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
 
-    print(f"Processing complete. Ready to download results.")
+    report = metrics.report()
+    report['dedup'] = dedup_stats
+    if memo is not None:
+        report['memo'] = memo_stats = memo.stats()
+        print(f"Result memo: {memo_stats['exact_hits']} identical and {memo_stats['near_hits']} near-identical "
+              f"titles reused of {memo_stats['lookups']} lookups, {memo_stats['entries']} rows stored.")
+    report['failures'] = {
+        'rows': len(failures),
+        'by_kind': dict(Counter(failure['kind'] for failure in failures.values())),
+        'by_stage': dict(Counter(failure['stage'] for failure in failures.values()))
+    }
+    if classifier is not None:
+        report['classifier'] = classifier_stats = classifier.stats()
+        agreement = classifier_stats['holdout_agreement']
+        print(f"Category classifier answered {classifier_stats['answered_locally']} of "
+              f"{classifier_stats['category_lookups']} lookups "
+              f"(LLM avoidance {classifier_stats['llm_avoidance_rate']:.1%}, agreement with the LLM on "
+              f"{classifier_stats['holdout_rows']} holdout rows: "
+              f"{'n/a' if agreement is None else f'{agreement:.1%}'}).")
+    totals = report['totals']
+    print(f"LLM calls: {totals['calls']} ({totals['retries']} retries, {totals['errors']} errors), "
+          f"tokens: {totals['prompt_tokens']} prompt, {totals['completion_tokens']} completion.")
+    stages = report['stages']
+    print(f"Answered without the LLM: {stages['title_generation']['local_answers']} titles, "
+          f"{stages['category_lookup']['local_answers']} categories, "
+          f"{stages['product_matching']['local_answers']} product matches.")
+    report_path = save_report(report)
+    if report_path:
+        print(f"Run report saved to '{report_path}'.")
+    results_df.attrs['run_stats'] = {
+        'dedup': dedup_stats, 'report': report, 'report_path': report_path, 'cancelled': cancelled,
+        'failed_rows': sorted(failures)
+    }
+    if not cancelled and not failures:
+        print(f"Processing complete. Ready to download results.")
 
     return results_df
\ No newline at end of file
@@ -0,0 +1,24 @@
+# processing/results.py
+
+# Columns written to the output file; row results also carry the matched 'Category'
+OUTPUT_COLUMNS = ['Product Title', 'Product Type']
+
+def blank_result():
+    """Result for an empty sample row, which is kept so output rows line up with the input."""
+    return {
+        'Product Title': '',
+        'Product Type': '',
+        'Category': ''
+    }
+
+def failed_result(error):
+    """
+    Result for a row whose LLM call failed with LLMCallError `error`. The
+    'Error' entry says which stage failed and how; the journal does not count
+    the row as finished, so processing the same files again retries it.
+    """
+    return {**blank_result(), 'Error': {'stage': error.stage, 'kind': error.kind, 'message': str(error)}}
+
+def format_failure(failure):
+    """One-line text of a result's 'Error' entry, for the output file."""
+    return f"{failure['kind']} in {failure['stage']}: {failure['message']}"
@@ -0,0 +1,90 @@
+# processing/similarity.py
+
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from utils.helpers import clean_text
+
+def char_ngrams(text, n=3):
+    """Returns the character n-grams of a lowercased, space-padded text."""
+    text = f" {' '.join(clean_text(str(text)).lower().split())} "
+    if len(text) < n:
+        return [text]
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+class ProductIndex:
+    """
+    TF-IDF index over character n-grams for one list of products.
+    Stored as an inverted index (n-gram -> product ids, weights) so
+    memory stays proportional to the catalog rather than products x vocabulary.
+    """
+
+    def __init__(self, products, n=3):
+        self.products = list(products)
+        self.n = n
+        document_grams = [Counter(char_ngrams(product, n)) for product in self.products]
+
+        document_frequency = Counter()
+        for grams in document_grams:
+            document_frequency.update(grams.keys())
+        total = len(self.products)
+        self.idf = {
+            gram: math.log((1 + total) / (1 + count)) + 1.0
+            for gram, count in document_frequency.items()
+        }
+
+        postings = defaultdict(lambda: ([], []))
+        for product_id, grams in enumerate(document_grams):
+            weights = {gram: count * self.idf[gram] for gram, count in grams.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for gram, weight in weights.items():
+                ids, values = postings[gram]
+                ids.append(product_id)
+                values.append(weight / norm)
+        self.postings = {
+            gram: (np.array(ids, dtype=np.int32), np.array(values, dtype=np.float32))
+            for gram, (ids, values) in postings.items()
+        }
+
+    def scores(self, text):
+        """Cosine similarity of `text` against every product."""
+        grams = Counter(char_ngrams(text, self.n))
+        weights = {gram: count * self.idf[gram] for gram, count in grams.items() if gram in self.idf}
+        if not weights:
+            return np.zeros(len(self.products), dtype=np.float32)
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+
+        ids = [self.postings[gram][0] for gram in weights]
+        values = [self.postings[gram][1] * (weight / norm) for gram, weight in weights.items()]
+        return np.bincount(
+            np.concatenate(ids), weights=np.concatenate(values), minlength=len(self.products)
+        ).astype(np.float32)
+
+    def search(self, text, k):
+        """Returns up to `k` (product, score) pairs, best first."""
+        if not self.products:
+            return []
+        scores = self.scores(text)
+        k = min(k, len(self.products))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.products[i], float(scores[i])) for i in top]
+
+class CategoryIndex:
+    """Per-category ProductIndex built once from (category, products) pairs, e.g. CatalogIndex.groups()."""
+
+    def __init__(self, groups, n=3):
+        self.indexes = {category: ProductIndex(products, n) for category, products in groups}
+
+    def search(self, category, text, k):
+        index = self.indexes.get(category)
+        return index.search(text, k) if index is not None else []
+
+def is_confident(candidates, min_score, margin):
+    """True when the best candidate is good enough to skip the LLM."""
+    if not candidates or candidates[0][1] < min_score:
+        return False
+    runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+    return candidates[0][1] - runner_up >= margin
@@ -0,0 +1,66 @@
+# tests/conftest.py
+"""
+Points every setting that touches the network or the disk at a local mock LLM
+server and a temporary directory. config.settings reads the environment when it
+is first imported, so this runs before any project module is loaded.
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockLLMServer
+
+WORK_DIR = tempfile.mkdtemp(prefix='categorizer-tests-')
+MOCK_SERVER = MockLLMServer(latency='fixed:0', seed=0)
+
+os.environ.update({
+    'API': 'test',
+    # Every run asks the mock server again; the cache and memo tests open their own stores
+    'LLM_CACHE': '0',
+    'LLM_BASE_URL': MOCK_SERVER.url,
+    'LLM_CACHE_PATH': os.path.join(WORK_DIR, 'llm_cache.sqlite3'),
+    'MEMO_PATH': os.path.join(WORK_DIR, 'result_memo.sqlite3'),
+    'JOURNAL_DIR': os.path.join(WORK_DIR, 'journal'),
+    'CATALOG_PATH': os.path.join(WORK_DIR, 'catalog', 'catalog.json'),
+    'RUN_REPORT_DIR': '',
+    'RPM_PER_KEY': '1000000',
+    'TPM_PER_KEY': '1000000000',
+    'RETRY_BASE_DELAY': '0.01'
+})
+
+@pytest.fixture(scope='session')
+def mock_server():
+    """The mock OpenAI-compatible server every LLM call of the tests goes to."""
+    MOCK_SERVER.start()
+    yield MOCK_SERVER
+    MOCK_SERVER.stop()
+
+@pytest.fixture(scope='session')
+def products():
+    from benchmarks.bench_matcher import make_catalog
+
+    return make_catalog(60, random.Random(0))
+
+@pytest.fixture(scope='session')
+def catalog_df(mock_server, products):
+    """The catalog products categorized by the mock server."""
+    from processing.processor import categorize_products
+
+    return categorize_products([product] for product in products)
+
+@pytest.fixture
+def write_samples(tmp_path):
+    """Writes sample titles as a one-column CSV file and returns its path."""
+    def write(titles, name='samples.csv'):
+        path = str(tmp_path / name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows([title] for title in titles)
+        return path
+    return write
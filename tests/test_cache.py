@@ -0,0 +1,79 @@
+# tests/test_cache.py
+
+import random
+import time
+
+import pytest
+
+from benchmarks.bench_pipeline import make_samples
+from processing import cache as cache_module
+from processing import processor
+from processing.cache import ResponseCache
+
+KEY_ARGS = ('category', 1, 'llama-3.1-8b-instant', 0, "Disc frana VW Golf\nFrane, Filtre")
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), enabled=True, max_entries=0, max_age_days=0)
+    yield cache
+    cache.conn.close()
+
+def test_key_ignores_formatting_only_differences():
+    key = ResponseCache.make_key(*KEY_ARGS)
+    assert key == ResponseCache.make_key(*KEY_ARGS[:4], "  Disc   frana VW Golf\n\nFrane,\tFiltre ")
+    assert key == ResponseCache.make_key(*KEY_ARGS[:4], "Disc frana  VW Golf Frane, Filtre\n")
+
+@pytest.mark.parametrize('position, value', [
+    (0, 'similar_products'), (1, 2), (2, 'llama-3.3-70b-versatile'), (3, None), (4, "Disc frana VW Passat")
+])
+def test_key_changes_with_everything_that_determines_the_answer(position, value):
+    args = list(KEY_ARGS)
+    args[position] = value
+    assert ResponseCache.make_key(*args) != ResponseCache.make_key(*KEY_ARGS)
+
+def test_get_and_set(cache):
+    key = ResponseCache.make_key(*KEY_ARGS)
+    assert cache.get(key) is None
+    cache.set(key, 'Frane')
+    assert cache.get(key) == 'Frane'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+def test_expired_and_evicted_entries_miss(cache):
+    cache.set('old', 'a')
+    cache.conn.execute("UPDATE responses SET created = ?, accessed = ? WHERE key = 'old'",
+                       (time.time() - 2 * 86400,) * 2)
+    cache.set('new', 'b')
+    cache.max_age = 86400
+    assert cache.get('old') is None
+    assert cache.get('new') == 'b'
+
+    cache.max_age = 0
+    cache.set('newest', 'c')
+    cache.max_entries = 2
+    cache.evict()
+    assert cache.get('old') is None  # Least recently used
+    assert cache.get('new') == 'b' and cache.get('newest') == 'c'
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), enabled=False)
+    cache.set('key', 'value')
+    assert cache.get('key') is None
+    assert not (tmp_path / 'cache.sqlite3').exists()
+
+def test_cached_answer_uses_the_prompt_version(cache, monkeypatch):
+    monkeypatch.setattr(cache_module, '_cache', cache)
+    key, content = processor.cached_answer('category', 'small', "Disc frana", {'temperature': 0})
+    assert content is None
+    cache.set(key, 'Frane')
+    assert processor.cached_answer('category', 'small', "Disc  frana", {'temperature': 0}) == (key, 'Frane')
+    monkeypatch.setitem(processor.PROMPT_VERSIONS, 'category', processor.PROMPT_VERSIONS['category'] + 1)
+    assert processor.cached_answer('category', 'small', "Disc frana", {'temperature': 0})[1] is None
+
+def test_rerun_is_answered_from_the_cache(catalog_df, products, write_samples, cache, mock_server, monkeypatch):
+    monkeypatch.setattr(cache_module, '_cache', cache)
+    path = write_samples(make_samples(products, 10, random.Random(2)))
+    first = processor.process_files(None, path, True, catalog_df, async_mode=True, batch_size=0, resume=False)
+    requests = mock_server.stats()['requests']
+    again = processor.process_files(None, path, True, catalog_df, async_mode=True, batch_size=0, resume=False)
+    assert mock_server.stats()['requests'] == requests
+    assert again.equals(first)
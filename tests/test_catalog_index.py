@@ -0,0 +1,34 @@
+# tests/test_catalog_index.py
+
+import pandas as pd
+
+from processing.catalog_index import CatalogIndex
+
+CATALOG = pd.DataFrame({
+    'Product': ['Disc frana', 'Filtru ulei', 'Placute frana', 'Filtru aer', 'Bec H7'],
+    'Category': ['Frane', 'Filtre', 'Frane', 'Filtre', None]
+})
+
+def test_groups_keep_catalog_order():
+    catalog = CatalogIndex(CATALOG)
+    assert catalog.categories == ('Frane', 'Filtre')
+    assert list(catalog.groups()) == [('Frane', ('Disc frana', 'Placute frana')),
+                                      ('Filtre', ('Filtru ulei', 'Filtru aer'))]
+    assert len(catalog) == 4  # Products without a category are in no group
+
+def test_lookups_match_filtering_the_dataframe():
+    catalog = CatalogIndex(CATALOG, product_prompts=True)
+    for category in ('Frane', 'Filtre'):
+        products = CATALOG[CATALOG['Category'] == category]['Product'].tolist()
+        assert list(catalog.category_products(category)) == products
+        assert catalog.products_text(category) == ', '.join(products)
+    assert catalog.category_products('Motor') == ()
+    assert catalog.products_text('Motor') == ''
+    assert catalog.categories_text == 'Frane, Filtre'
+
+def test_has_product():
+    catalog = CatalogIndex(CATALOG)
+    assert catalog.has_product('Frane', 'Disc frana')
+    assert not catalog.has_product('Filtre', 'Disc frana')
+    assert not catalog.has_product('Motor', 'Disc frana')
+    assert not catalog.has_product(None, 'Bec H7')
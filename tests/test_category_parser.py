@@ -0,0 +1,75 @@
+# tests/test_category_parser.py
+
+import pytest
+
+from processing import processor
+from processing.processor import CategoryLineParser, parse_category_line
+
+ANSWER = """Here are the categories:
+- Disc frana: Sistem de frânare
+Filtru ulei: Componente motor
+Bec H7: Not a category
+Disc frana: Componente motor
+Amortizor: Suspensie și direcție
+Note: every product was categorized."""
+
+EXPECTED = [('Disc frana', 'Sistem de frânare'), ('Filtru ulei', 'Componente motor'),
+            ('Amortizor', 'Suspensie și direcție')]
+
+def parse(chunks, products=('Disc frana', 'Filtru ulei', 'Amortizor', 'Bec H7')):
+    pairs = []
+    parser = CategoryLineParser(products, lambda product, category: pairs.append((product, category)))
+    done = [parser.feed(chunk) for chunk in chunks]
+    return pairs, done, parser
+
+@pytest.mark.parametrize('line, expected', [
+    ("- Disc frana: Sistem de frânare", ('Disc frana', 'Sistem de frânare')),
+    ("  Filtru ulei :  Componente motor ", ('Filtru ulei', 'Componente motor')),
+    ("Filtru ulei - Componente motor", None),
+    ("Filtru ulei: Motor", None),
+    (": Componente motor", None),
+    ("", None),
+])
+def test_parse_category_line(line, expected):
+    assert parse_category_line(line) == expected
+
+def test_first_valid_pair_of_each_product_wins():
+    pairs, _, parser = parse([ANSWER])
+    parser.finish()
+    assert pairs == EXPECTED
+    # The introduction, the invalid category, the repeated product and the note
+    assert parser.skipped == 4
+    assert parser.pending == {'Bec H7'}
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16, 1000])
+def test_chunked_answers_parse_like_whole_ones(size):
+    chunks = [ANSWER[i:i + size] for i in range(0, len(ANSWER), size)]
+    pairs, _, parser = parse(chunks)
+    parser.finish()
+    assert pairs == EXPECTED
+
+def test_feed_reports_when_every_product_is_assigned():
+    lines = ANSWER.split('\n')
+    pairs, done, parser = parse([line + '\n' for line in lines], products=('Disc frana', 'Filtru ulei'))
+    assert done == [False, False, True, True, True, True, True]
+    assert pairs == EXPECTED[:2]
+
+def test_last_line_is_parsed_on_finish():
+    pairs, done, parser = parse(["Filtru ulei: Componente motor\nAmortizor: Suspensie și direcție"],
+                                products=('Filtru ulei', 'Amortizor'))
+    assert done == [False] and pairs == EXPECTED[1:2]
+    assert parser.finish()
+    assert pairs == EXPECTED[1:]
+
+def test_restart_drops_the_partial_line():
+    pairs, _, parser = parse(["Filtru ulei: Componente motor\nAmortizor: Sistem de "])
+    parser.restart()
+    parser.feed("Amortizor: Suspensie și direcție\n")
+    assert pairs == EXPECTED[1:]
+
+def test_streamed_and_whole_answers_categorize_alike(products, mock_server, monkeypatch):
+    streamed = processor.categorize_products([product] for product in products)
+    monkeypatch.setattr(processor, 'CATEGORIZE_STREAM', False)
+    whole = processor.categorize_products([product] for product in products)
+    assert streamed.equals(whole)
+    assert streamed['Product'].tolist() == list(dict.fromkeys(products))
@@ -0,0 +1,83 @@
+# tests/test_cli.py
+
+import argparse
+import random
+
+import pandas as pd
+import pytest
+
+import cli
+from benchmarks.bench_pipeline import make_samples
+
+@pytest.fixture
+def inputs(products, write_samples, tmp_path, mock_server):
+    """(sample file, product type file, catalog path) for runs through cli.main."""
+    titles = make_samples(products, 20, random.Random(3))
+    # Repeated titles and a blank cell, which shards must keep in place
+    titles[7] = titles[2]
+    titles[12] = ''
+    return write_samples(titles), write_samples(products, 'product_types.csv'), str(tmp_path / 'catalog.json')
+
+def test_parse_shard():
+    assert cli.parse_shard('2/4') == (2, 4)
+    for value in ('0/4', '5/4', '2', 'a/b'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            cli.parse_shard(value)
+
+@pytest.mark.parametrize('rows, shards', [(20, 3), (2, 4), (0, 2), (7, 7)])
+def test_shard_bounds_cover_every_row_once(rows, shards):
+    bounds = cli.shard_bounds(rows, shards)
+    assert len(bounds) == shards
+    assert [row for start, end in bounds for row in range(start, end)] == list(range(rows))
+
+def test_merged_shards_equal_a_single_run(inputs, tmp_path):
+    sample, product_types, catalog = inputs
+    single = str(tmp_path / 'single.parquet')
+    cli.main(['run', sample, '-o', single, '--product-types', product_types, '--catalog', catalog,
+              '--batch-size', '0', '--no-resume'])
+
+    parts = []
+    for k in (3, 1, 2):
+        part = str(tmp_path / f'part-{k}.parquet')
+        cli.main(['run', sample, '-o', part, '--shard', f'{k}/3', '--catalog', catalog, '--batch-size', '0',
+                  '--no-resume', '--work-dir', str(tmp_path / f'work-{k}')])
+        parts.append(part)
+    merged = str(tmp_path / 'merged.parquet')
+    cli.main(['merge', *parts, '-o', merged])
+
+    expected = pd.read_parquet(single)
+    assert len(expected) == 20
+    pd.testing.assert_frame_equal(pd.read_parquet(merged), expected)
+
+def test_process_pool_equals_a_single_run(inputs, tmp_path):
+    sample, product_types, catalog = inputs
+    single = str(tmp_path / 'single.parquet')
+    cli.main(['run', sample, '-o', single, '--product-types', product_types, '--catalog', catalog,
+              '--batch-size', '0', '--no-resume'])
+    pooled = str(tmp_path / 'pooled.parquet')
+    cli.main(['run', sample, '-o', pooled, '--catalog', catalog, '--processes', '2', '--batch-size', '0',
+              '--no-resume'])
+    pd.testing.assert_frame_equal(pd.read_parquet(pooled), pd.read_parquet(single))
+
+def test_merge_rejects_incomplete_splits(inputs, tmp_path):
+    sample, product_types, catalog = inputs
+    cli.update_catalog(product_types, catalog)
+    parts = {}
+    for k in (1, 2):
+        parts[k] = str(tmp_path / f'part-{k}.parquet')
+        cli.main(['run', sample, '-o', parts[k], '--shard', f'{k}/3', '--catalog', catalog, '--batch-size', '0',
+                  '--no-resume', '--work-dir', str(tmp_path / f'work-{k}')])
+    other = str(tmp_path / 'other.parquet')
+    cli.main(['run', sample, '-o', other, '--shard', '1/2', '--catalog', catalog, '--batch-size', '0',
+              '--no-resume', '--work-dir', str(tmp_path / 'work-other')])
+    plain = str(tmp_path / 'plain.parquet')
+    pd.DataFrame({'Product Title': ['x'], 'Product Type': ['y']}).to_parquet(plain)
+
+    with pytest.raises(ValueError, match='Missing shards: 3/3'):
+        cli.merge_parts([parts[1], parts[2]])
+    with pytest.raises(ValueError, match='given twice'):
+        cli.merge_parts([parts[1], parts[1], parts[2]])
+    with pytest.raises(ValueError, match='different splits'):
+        cli.merge_parts([parts[1], parts[2], other])
+    with pytest.raises(ValueError, match='not a shard result'):
+        cli.merge_parts([plain])
@@ -0,0 +1,105 @@
+# tests/test_dedup.py
+
+import asyncio
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_pipeline import make_samples
+from processing import processor
+from processing.dedup import TitleDeduplicator
+from processing.llm_client import LLMCallError
+from processing.results import failed_result
+
+def failing_first(calls, fail=1):
+    """A process_sample_row_async stand-in whose first `fail` calls fail."""
+    async def process_row(title, catalog, index=None, classifier=None, memo=None, title_key=None):
+        calls.append(title)
+        await asyncio.sleep(0.01)
+        if len(calls) <= fail:
+            return failed_result(LLMCallError("Server error", kind='server', stage='category_lookup'))
+        return {'Product Title': title.lower(), 'Product Type': 'Disc frana', 'Category': 'Frane'}
+    return process_row
+
+def test_deduplicator_shares_and_discards():
+    dedup = TitleDeduplicator()
+    key, earlier = dedup.lookup('Disc  FRÂNĂ')
+    assert (key, earlier) == ('disc frana', None)
+    result = {'Category': 'Frane'}
+    dedup.add(key, result)
+    assert dedup.lookup('disc frana') == ('disc frana', result)
+    dedup.discard(key, {'Category': 'Frane'})  # Another result of the title: still shared
+    assert dedup.results[key] is result
+    dedup.discard(key, result)
+    assert dedup.lookup('disc frana') == ('disc frana', None)
+    assert dedup.stats()['rows'] == 3
+
+def test_async_repeats_share_a_successful_row(mock_server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(processor, 'process_sample_row_async', failing_first(calls, fail=0))
+    rows = [('Disc frana', 'disc frana')] * 4 + [('Filtru ulei', 'filtru ulei')]
+    results = asyncio.run(processor.process_sample_rows_async(rows, None, 4, dedup=TitleDeduplicator()))
+    assert calls == ['Disc frana', 'Filtru ulei']
+    assert [result['Product Title'] for result in results] == ['disc frana'] * 4 + ['filtru ulei']
+
+def test_async_repeats_of_a_failed_row_get_their_own_attempt(mock_server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(processor, 'process_sample_row_async', failing_first(calls))
+    rows = [('Disc frana', 'disc frana')] * 4
+    dedup = TitleDeduplicator()
+    results = asyncio.run(processor.process_sample_rows_async(rows, None, 4, dedup=dedup))
+    assert 'Error' in results[0]
+    assert all('Error' not in result for result in results[1:])
+    # The first repeat retried; the others shared its result
+    assert len(calls) == 2
+    assert 'Error' not in dedup.results['disc frana'].result()
+
+def test_async_failed_row_is_not_shared_with_later_rows(mock_server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(processor, 'process_sample_row_async', failing_first(calls))
+    # With one row in flight the repeat is only read after the first row failed
+    rows = [('Disc frana', 'disc frana'), ('Disc frana', 'disc frana')]
+    results = asyncio.run(processor.process_sample_rows_async(rows, None, 1, dedup=TitleDeduplicator()))
+    assert 'Error' in results[0] and 'Error' not in results[1]
+    assert len(calls) == 2
+
+def test_batched_repeats_of_a_failed_row_get_their_own_attempt(catalog_df, write_samples, monkeypatch):
+    match_category = processor.match_category
+    calls = []
+
+    def fail_first_match(llm_category, catalog):
+        calls.append(llm_category)
+        if len(calls) == 1:
+            raise LLMCallError("Server error", kind='server', stage='category_lookup')
+        return match_category(llm_category, catalog)
+    monkeypatch.setattr(processor, 'match_category', fail_first_match)
+
+    title = f"{catalog_df['Product'][0]} VW Golf 2008"
+    path = write_samples([title] * 3)
+    results_df = processor.process_files(None, path, True, catalog_df, async_mode=True, batch_size=10,
+                                         resume=False)
+    assert results_df['Error'].tolist()[0] != ''
+    assert results_df['Error'].tolist()[1:] == ['', '']
+    assert (results_df['Product Type'][1:] != '').all()
+    # Row 0 failed, row 1 retried and row 2 shared its result
+    assert len(calls) == 2
+
+@pytest.mark.parametrize('async_mode, batch_size', [(False, 0), (True, 0), (True, 4)])
+def test_repeated_titles_are_processed_once(catalog_df, products, write_samples, mock_server, async_mode,
+                                            batch_size):
+    titles = list(dict.fromkeys(make_samples(products, 5, random.Random(4))))
+    variants = [titles[0].upper(), f"  {titles[1]}  ", f"<b>{titles[2]}</b>", titles[0]]
+    requests = mock_server.stats()['requests']
+    unique = processor.process_files(None, write_samples(titles, 'unique.csv'), True, catalog_df,
+                                     async_mode=async_mode, batch_size=batch_size, resume=False)
+    unique_requests = mock_server.stats()['requests'] - requests
+
+    requests = mock_server.stats()['requests']
+    repeated = processor.process_files(None, write_samples(titles + variants), True, catalog_df,
+                                       async_mode=async_mode, batch_size=batch_size, resume=False)
+    assert mock_server.stats()['requests'] - requests == unique_requests
+    assert repeated.attrs['run_stats']['dedup']['unique_titles'] == len(titles)
+    pd.testing.assert_frame_equal(repeated.iloc[:len(titles)], unique)
+    for row, source in zip(range(len(titles), len(titles) + len(variants)), (0, 1, 2, 0)):
+        assert repeated.loc[row].tolist() == unique.loc[source].tolist()
@@ -0,0 +1,53 @@
+# tests/test_extractor.py
+
+import pytest
+
+from processing.extractor import TitleExtractor, format_title, missing_fields
+
+@pytest.fixture(scope='module')
+def extractor():
+    return TitleExtractor()
+
+@pytest.mark.parametrize('text, expected', [
+    ("Kit ambreiaj LUK 624 3183 09 VW Golf 2004-2010",
+     "kit ambreiaj, MODECAR, VW, Golf, 2004-2010, LUK 624 3183 09, null"),
+    ("Filtru ulei Bosch VW Golf 2012", "filtru ulei, MODECAR, VW, Golf, 2012, Bosch, null"),
+    ("Placute frana Brembo Dacia Logan", "placute frana, MODECAR, Dacia, Logan, null, Brembo, null"),
+    ("Bosch filtru aer Audi A4 2008 cod 0986AF2345",
+     "filtru aer, MODECAR, Audi, A4, 2008, Bosch, 0986AF2345"),
+    ("Disc frana fata VW Passat 2005-2010 cod 1K0615301AA",
+     "disc frana fata, MODECAR, VW, Passat, 2005-2010, null, 1K0615301AA"),
+    ("Amortizor spate Sachs 314 895 Ford Focus 2007",
+     "amortizor spate, MODECAR, Ford, Focus, 2007, Sachs 314 895, null"),
+    ("Bec H7 12V Opel Astra", "bec, MODECAR, Opel, Astra, null, H7 12V, null"),
+    ("Filtru ulei pentru Skoda Octavia 2015", "filtru ulei, MODECAR, Skoda, Octavia, 2015, null, null"),
+    ("Oglinda stanga Volkswagen Passat", "oglinda stanga, MODECAR, VW, Passat, null, null, null"),
+    ("Far dreapta Qashqai 2010-2013", "far dreapta, MODECAR, Nissan, Qashqai, 2010-2013, null, null"),
+])
+def test_representative_titles(extractor, text, expected):
+    assert format_title(extractor.extract(text)) == expected
+
+@pytest.mark.parametrize('text', [
+    "filtru ulei bosch VW Golf",
+    "kit ambreiaj luk 624 3183 09 VW Golf",
+    "placute frana brembo Dacia Logan",
+    "bujie NGK BKR6E Opel Corsa"
+])
+def test_product_type_has_no_brands_or_numbers(extractor, text):
+    product_type = extractor.extract(text)['product_type']
+    assert product_type is not None
+    assert not any(char.isdigit() for char in product_type)
+    assert not extractor.brand_pattern.search(product_type)
+
+def test_single_year_is_not_made_a_range(extractor):
+    assert extractor.extract("Radiator apa Dacia Logan 2017")['years'] == '2017'
+
+def test_title_starting_with_numbers_asks_for_the_product_type(extractor):
+    fields = extractor.extract("624 3183 09 LUK VW Golf")
+    assert fields['product_type'] is None
+    assert missing_fields(fields) == ['product_type']
+
+def test_title_without_anything_known_is_left_to_the_llm(extractor):
+    fields = extractor.extract("kit ambreiaj luk 624 3183 09")
+    assert fields['product_type'] is None
+    assert missing_fields(fields) == ['product_type', 'make', 'model']
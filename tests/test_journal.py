@@ -0,0 +1,101 @@
+# tests/test_journal.py
+
+import json
+import os
+import random
+
+import pytest
+
+from benchmarks.bench_pipeline import make_samples
+from processing import journal as journal_module
+from processing import processor
+from processing.journal import RunJournal
+from processing.llm_client import LLMCallError
+from processing.results import failed_result
+
+ROW = {'Product Title': 'disc frana, MODECAR, VW, Golf, 2004-2010, null, null', 'Product Type': 'Disc frana',
+       'Category': 'Frane'}
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, 'JOURNAL_DIR', str(tmp_path))
+    return tmp_path
+
+def test_read_skips_failed_rows_and_a_torn_line(journal_dir):
+    journal = RunJournal('run', resume=False)
+    journal.record(0, ROW)
+    journal.record(1, failed_result(LLMCallError("Server error", kind='server', stage='category_lookup')))
+    journal.record(2, ROW)
+    journal.record(1, ROW)  # Retried later in the same run
+    journal.record(3, failed_result(LLMCallError("Timed out", kind='timeout', stage='title_generation')))
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"index": 4, "Product Ti')
+
+    assert RunJournal.read(journal.path) == {0: ROW, 1: ROW, 2: ROW}
+    assert RunJournal('run').completed == {0: ROW, 1: ROW, 2: ROW}
+    assert RunJournal('run', resume=False).completed == {}
+
+def test_rows_are_synced_in_batches(journal_dir, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(journal_module.os, 'fsync', syncs.append)
+    journal = RunJournal('run', resume=False, sync_rows=3, sync_interval=3600)
+    for i in range(7):
+        journal.record(i, ROW)
+    assert len(syncs) == 2
+    # Every row is flushed to the OS as it is recorded, synced or not
+    with open(journal.path, encoding='utf-8') as f:
+        assert [json.loads(line)['index'] for line in f] == list(range(7))
+    journal.close()
+    assert len(syncs) == 3
+    journal.close()
+    assert len(syncs) == 3
+
+def test_finish_removes_the_journal(journal_dir):
+    journal = RunJournal('run', resume=False)
+    journal.record(0, ROW)
+    journal.finish()
+    assert not os.path.exists(journal.path)
+
+@pytest.mark.parametrize('async_mode', [False, True])
+def test_resume_retries_only_failed_rows(catalog_df, products, write_samples, journal_dir, monkeypatch,
+                                         async_mode):
+    titles = list(dict.fromkeys(make_samples(products, 12, random.Random(1))))
+    path = write_samples(titles)
+    failing = set(titles[3:5])
+    calls = []
+
+    if async_mode:
+        real = processor.process_sample_row_async
+
+        async def flaky(title, *args, **kwargs):
+            calls.append(title)
+            if title in failing:
+                return failed_result(LLMCallError("Server error", kind='server', stage='category_lookup'))
+            return await real(title, *args, **kwargs)
+        monkeypatch.setattr(processor, 'process_sample_row_async', flaky)
+    else:
+        real = processor.process_sample_row
+
+        def flaky(title, *args, **kwargs):
+            calls.append(title)
+            if title in failing:
+                return failed_result(LLMCallError("Server error", kind='server', stage='category_lookup'))
+            return real(title, *args, **kwargs)
+        monkeypatch.setattr(processor, 'process_sample_row', flaky)
+
+    first = processor.process_files(None, path, True, catalog_df, async_mode=async_mode, batch_size=0,
+                                     resume=False)
+    assert sorted(first.attrs['run_stats']['failed_rows']) == [3, 4]
+    assert sorted(calls) == sorted(titles)
+
+    calls.clear()
+    failing.clear()
+    resumed = processor.process_files(None, path, True, catalog_df, async_mode=async_mode, batch_size=0)
+    assert sorted(calls) == sorted(titles[3:5])
+    assert not resumed.attrs['run_stats']['failed_rows']
+    assert 'Error' not in resumed
+
+    fresh = processor.process_files(None, path, True, catalog_df, async_mode=async_mode, batch_size=0,
+                                    resume=False)
+    assert resumed.equals(fresh)
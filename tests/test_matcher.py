@@ -0,0 +1,41 @@
+# tests/test_matcher.py
+
+import random
+
+import pytest
+
+from benchmarks.bench_matcher import (
+    legacy_find_category_by_keywords, legacy_find_product_by_keywords, make_catalog, make_queries
+)
+from processing.matcher import KeywordMatcher, get_matcher
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_the_legacy_scans(seed):
+    rng = random.Random(seed)
+    products = make_catalog(300, rng)
+    matcher = KeywordMatcher(products)
+    for query in make_queries(products, 60, rng):
+        assert matcher.find(query) == legacy_find_product_by_keywords(query, products), query
+        assert matcher.find_exact(query) == legacy_find_category_by_keywords(query, products), query
+
+@pytest.mark.parametrize('items, text', [
+    # The first-listed item wins among several exact hits, wherever it is in the text
+    (['Frana', 'Disc frana'], "disc frana fata"),
+    (['Disc frana', 'Frana'], "disc frana fata"),
+    # Items differing only in case rank by their first spelling and return the last one
+    (['Filtru ulei', 'Filtru aer', 'FILTRU ULEI'], "Filtru aer si filtru ulei"),
+    # An empty item is contained in every answer
+    (['Filtru ulei', '', 'Disc frana'], "disc frana"),
+    # Fuzzy ties resolve by answer word, then item order
+    (['Amortizor', 'Amortizer'], "amortizxr spate"),
+    (['Bujie'], "nimic"),
+    ([], "disc frana"),
+])
+def test_edge_cases_match_the_legacy_scans(items, text):
+    matcher = KeywordMatcher(items)
+    assert matcher.find(text) == legacy_find_product_by_keywords(text, items)
+    assert matcher.find_exact(text) == legacy_find_category_by_keywords(text, items)
+
+def test_get_matcher_reuses_matchers():
+    assert get_matcher(['Disc frana', 'Filtru ulei']) is get_matcher(('Disc frana', 'Filtru ulei'))
+    assert get_matcher(['Disc frana']) is not get_matcher(['Filtru ulei'])
@@ -0,0 +1,74 @@
+# tests/test_memo.py
+
+import pytest
+
+from processing.memo import ResultMemo, band_keys, shingles
+
+ROW = {'Product Title': 'Kit ambreiaj LUK VW Golf 2004-2010', 'Category': 'Ambreiaj', 'Product Type': 'Kit ambreiaj'}
+
+@pytest.fixture
+def memo(tmp_path):
+    memo = ResultMemo(str(tmp_path / 'memo.sqlite3'), enabled=True, threshold=0.85,
+                      max_entries=0, max_age_days=0)
+    yield memo
+    memo.conn.close()
+
+def test_identical_title_reuses_the_whole_row(memo):
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW, version='v1')
+    assert memo.lookup('kit ambreiaj luk 624 3183 09 vw golf', version='v1') == (ROW, True)
+
+def test_reordered_words_are_a_near_hit(memo):
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW, version='v1')
+    result, exact = memo.lookup('LUK kit ambreiaj VW Golf 624 3183 09', version='v1')
+    assert result == ROW and not exact
+
+def test_other_part_number_is_not_reused(memo):
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW, version='v1')
+    assert memo.lookup('Kit ambreiaj LUK 624 3184 09 VW Golf', version='v1') == (None, False)
+
+def test_other_year_is_not_reused(memo):
+    memo.store('Kit ambreiaj LUK VW Golf 2004-2010', ROW, version='v1')
+    assert memo.lookup('Kit ambreiaj LUK VW Golf 2004-2011', version='v1') == (None, False)
+
+def test_rows_of_another_version_are_not_reused(memo):
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW, version='v1')
+    assert memo.lookup('Kit ambreiaj LUK 624 3183 09 VW Golf', version='v2') == (None, False)
+    assert memo.lookup('LUK kit ambreiaj VW Golf 624 3183 09', version='v2') == (None, False)
+
+    # Resolving it again replaces the stored row
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW, version='v2')
+    assert memo.lookup('Kit ambreiaj LUK 624 3183 09 VW Golf', version='v2') == (ROW, True)
+
+def test_accept_rejects_stored_rows(memo):
+    memo.store('Kit ambreiaj LUK 624 3183 09 VW Golf', ROW)
+    assert memo.lookup('Kit ambreiaj LUK 624 3183 09 VW Golf', accept=lambda result: False) == (None, False)
+
+def test_rows_without_a_version_column_are_not_reused(tmp_path):
+    path = str(tmp_path / 'memo.sqlite3')
+    memo = ResultMemo(path, enabled=True, max_entries=0, max_age_days=0)
+    memo.conn.execute("DROP TABLE memo")
+    memo.conn.execute(
+        "CREATE TABLE memo (key TEXT PRIMARY KEY, title TEXT NOT NULL, category TEXT NOT NULL, "
+        "product TEXT NOT NULL, bands BLOB NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+        "created REAL NOT NULL, accessed REAL NOT NULL)"
+    )
+    memo.conn.execute("INSERT INTO memo VALUES ('frana', 'Frana', 'Frane', 'Disc frana', ?, 0, 0, 0)",
+                      (band_keys(shingles('frana')).tobytes(),))
+    memo.conn.commit()
+    memo.conn.close()
+
+    memo = ResultMemo(path, enabled=True, max_entries=0, max_age_days=0)
+    assert memo.lookup('frana', version='v1') == (None, False)
+    memo.store('frana', ROW, version='v1')
+    assert memo.lookup('frana', version='v1') == (ROW, True)
+    memo.conn.close()
+
+def test_memo_version_follows_models_and_prompts(monkeypatch):
+    from processing import processor
+
+    version = processor.memo_version()
+    monkeypatch.setitem(processor.PROMPT_VERSIONS, 'category', processor.PROMPT_VERSIONS['category'] + 1)
+    assert processor.memo_version() != version
+    monkeypatch.undo()
+    monkeypatch.setitem(processor.STAGE_MODEL_TIERS, 'similar_products', ['small', 'large'])
+    assert processor.memo_version() != version
@@ -1,10 +1,16 @@
 # utils/helpers.py
 
+import html
 import re
+import unicodedata
+
+TAG_PATTERN = re.compile('<[^<]+?>')
 
 def clean_text(text):
-    """Remove HTML tags and trim whitespace."""
-    clean = re.sub('<[^<]+?>', '', text)
+    """Remove HTML tags and trim whitespace. Empty cells (None, NaN) give ''."""
+    if text is None or (isinstance(text, float) and text != text):
+        return ''
+    clean = TAG_PATTERN.sub('', str(text))
     return clean.strip()
 
 def remove_null(text):
@@ -18,3 +24,13 @@ def remove_null(text):
                 len(part.strip()) > 1]  # Ensure part has meaningful content
         return ', '.join(parts)
     return text
+
+def normalize_title(text):
+    """
+    Builds a match key for a title: HTML tags and entities stripped,
+    case and diacritics folded, whitespace collapsed.
+    """
+    text = html.unescape(clean_text(str(text)))
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
@@ -0,0 +1,111 @@
+# utils/normalize.py
+
+import html
+import unicodedata
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# RE2 patterns, compiled once per call by Arrow rather than once per value
+TAG_PATTERN = r'<[^<]+?>'
+# Everything str.split() treats as whitespace, except the plain space
+WHITESPACE_PATTERN = (r'[\t\n\x0b\f\r\x1c-\x1f\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}'
+                      r'\x{202f}\x{205f}\x{3000}]')
+# Combining diacritical marks, e.g. the comma below of 'ș' and 'ț' or the breve of 'ă'
+# after NFKD decomposition (U+034F has no combining class and is kept, like normalize_title does)
+COMBINING_PATTERN = r'[\x{0300}-\x{034e}\x{0350}-\x{036f}]'
+
+def _cell_text(value):
+    """A cell as text: None for empty cells, str() for numbers and other values."""
+    if value is None or (isinstance(value, float) and value != value) or value is pd.NA:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+def to_string_array(values):
+    """
+    Converts a column (list, pandas Series or Arrow array) to an Arrow string
+    array. Empty cells (None, NaN, NA) become null and non-string cells are
+    converted with str(), as Excel columns mix text and numbers.
+    """
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if isinstance(values, pa.Array) and (pa.types.is_string(values.type) or pa.types.is_large_string(values.type)):
+        return values
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.StringDtype):
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    if isinstance(values, pa.Array):
+        values = values.to_pylist()
+    try:
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Numbers or other objects among the text
+        return pa.array([_cell_text(value) for value in values], type=pa.string())
+
+def _replace_where(array, mask, function):
+    """
+    Replaces the rows of `array` selected by `mask` with function(subset), where
+    the subset is an Arrow array of just those rows.
+    """
+    mask = pc.fill_null(mask, False)
+    indices = pc.indices_nonzero(mask)
+    if not len(indices):
+        return array
+    return pc.replace_with_mask(array, mask, function(array.take(indices)))
+
+def _per_value(function):
+    """Applies a Python function to every value of an Arrow string array."""
+    return lambda subset: pa.array([function(value) for value in subset.to_pylist()], type=subset.type)
+
+def _collapse_spaces(array):
+    array = pc.replace_substring_regex(array, WHITESPACE_PATTERN, ' ')
+    array = _replace_where(array, pc.match_substring(array, '  '),
+                           lambda subset: pc.replace_substring_regex(subset, ' {2,}', ' '))
+    return pc.utf8_trim(array, ' ')
+
+def _fold_key(text):
+    """Case and diacritic folding of one display text, as normalize_title does it."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(char for char in text if not unicodedata.combining(char)).split())
+
+def _fold_non_ascii(display):
+    """
+    Folds the rows with non-ASCII letters: NFKD decomposition and dropping the
+    combining marks in Arrow, then Python for the few rows that are still not
+    ASCII (e.g. 'ß', whose casefold differs from its lowercase).
+    """
+    key = _collapse_spaces(pc.replace_substring_regex(
+        pc.utf8_normalize(pc.utf8_lower(display), 'NFKD'), COMBINING_PATTERN, ''
+    ))
+    still = pc.invert(pc.string_is_ascii(key))
+    return _replace_where(key, still, lambda subset: pa.array(
+        [_fold_key(text) for text in display.filter(pc.fill_null(still, False)).to_pylist()], type=key.type
+    ))
+
+def normalize_column(values):
+    """
+    Normalizes a whole column of titles in one pass and returns two Arrow
+    string arrays:
+    - display: HTML tags stripped, entities unescaped, whitespace collapsed
+    - key: the display text with case and diacritics folded, equal to
+      utils.helpers.normalize_title of the cell
+    Cells that are empty, or empty once cleaned, are null in both.
+
+    Tag stripping, whitespace collapse, lowercasing and diacritic folding
+    (Romanian ă, â, î, ș, ț and any other letter NFKD decomposes) run as Arrow
+    kernels over the column; only cells with entities ('&') and the rare
+    letters NFKD does not fold go through Python.
+    """
+    array = to_string_array(values)
+
+    display = _replace_where(array, pc.match_substring(array, '<'),
+                             lambda subset: pc.replace_substring_regex(subset, TAG_PATTERN, ''))
+    display = _replace_where(display, pc.match_substring(display, '&'), _per_value(html.unescape))
+    display = _collapse_spaces(display)
+    display = pc.if_else(pc.equal(pc.utf8_length(display), 0), pa.scalar(None, display.type), display)
+
+    key = pc.utf8_lower(display)
+    non_ascii = pc.invert(pc.fill_null(pc.string_is_ascii(display), True))
+    if pc.any(non_ascii).as_py():
+        key = pc.replace_with_mask(key, non_ascii, _fold_non_ascii(display.filter(non_ascii)))
+    return display, key
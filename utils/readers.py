@@ -0,0 +1,97 @@
+# utils/readers.py
+
+import csv
+import os
+
+import pandas as pd
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv', '.parquet')
+
+def _is_empty(value):
+    return value is None or (isinstance(value, float) and value != value) or value == ''
+
+def _chunked(values, chunk_size):
+    chunk = []
+    for value in values:
+        chunk.append(None if _is_empty(value) else value)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _iter_xlsx(path):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of building the workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(max_col=1, values_only=True):
+            yield row[0] if row else None
+    finally:
+        workbook.close()
+
+def _iter_xls(path):
+    # xlrd cannot stream, but reading a single column keeps the frame small
+    frame = pd.read_excel(path, header=None, usecols=[0])
+    yield from frame[0].tolist()
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            yield row[0] if row else None
+
+def _iter_parquet(path, chunk_size):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    first_column = parquet_file.schema_arrow.names[0]
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=[first_column]):
+        yield from batch.column(0).to_pylist()
+
+def read_first_column_chunks(path, chunk_size=1000):
+    """
+    Lazily yields the first column of an input file in lists of `chunk_size` values.
+    Supports .xlsx/.xlsm (streamed), .xls, .csv and .parquet. Empty cells are None.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: '{path}'")
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        values = _iter_xlsx(path)
+    elif extension == '.xls':
+        values = _iter_xls(path)
+    elif extension == '.csv':
+        values = _iter_csv(path)
+    elif extension == '.parquet':
+        values = _iter_parquet(path, chunk_size)
+    else:
+        raise ValueError(
+            f"Unsupported file type '{extension}'. Supported types: {', '.join(SUPPORTED_EXTENSIONS)}"
+        )
+    return _chunked(values, chunk_size)
+
+def count_rows(path):
+    """
+    Number of rows read_first_column_chunks yields for an input file, taken from
+    the file metadata where the format has it (.parquet, .xlsx) and counted otherwise.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    if extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            # Read from the sheet's <dimension> tag; missing when the writer left it out
+            max_row = workbook.worksheets[0].max_row
+        finally:
+            workbook.close()
+        if max_row is not None:
+            return max_row
+    return sum(len(chunk) for chunk in read_first_column_chunks(path))
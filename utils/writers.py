@@ -0,0 +1,135 @@
+# utils/writers.py
+
+import csv
+import os
+from contextlib import suppress
+
+OUTPUT_EXTENSIONS = ('.xlsx', '.csv', '.parquet')
+
+# Rows handed to a writer at a time when exporting a DataFrame
+EXPORT_CHUNK_ROWS = 10000
+
+def _cell(value):
+    """Empty cells for None and NaN; everything else is written as is."""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value
+
+class XlsxRowWriter:
+    """
+    Streams rows into a single-sheet workbook with openpyxl's write-only mode,
+    which writes each row to a temporary file as it is appended instead of
+    keeping the workbook in memory.
+    """
+
+    def __init__(self, path, columns):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+        self.path = path
+        self.illegal = ILLEGAL_CHARACTERS_RE
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(list(columns))
+
+    def write(self, rows):
+        for row in rows:
+            # Control characters cannot be stored in a sheet cell
+            self.sheet.append([
+                self.illegal.sub('', value) if isinstance(value, str) else _cell(value) for value in row
+            ])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+class CsvRowWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows([['' if _cell(value) is None else value for value in row] for row in rows])
+
+    def close(self):
+        self.file.close()
+
+class ParquetRowWriter:
+    """Writes every chunk of rows as one Parquet row group of string columns."""
+
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.columns = list(columns)
+        self.schema = pa.schema([(column, pa.string()) for column in self.columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        arrays = [
+            self.pa.array([None if _cell(row[i]) is None else str(row[i]) for row in rows], type=self.pa.string())
+            for i in range(len(self.columns))
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {
+    '.xlsx': XlsxRowWriter,
+    '.csv': CsvRowWriter,
+    '.parquet': ParquetRowWriter
+}
+
+def open_writer(path, columns):
+    """A row writer for `path`, chosen by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported output type '{extension}'. Use {', '.join(OUTPUT_EXTENSIONS)}.")
+    return WRITERS[extension](path, columns)
+
+def write_rows(path, columns, chunks, total=None, progress_callback=None, cancel_event=None):
+    """
+    Writes chunks of row tuples to an .xlsx, .csv or .parquet file, one chunk
+    in memory at a time. The file is written next to `path` and moved into
+    place once complete, so a failed or cancelled export leaves no partial file.
+    `progress_callback(rows_written, total)` is called after every chunk.
+    Returns the number of rows written, or None when `cancel_event` was set.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    root, extension = os.path.splitext(path)
+    temp_path = f"{root}.partial{extension}"
+    writer = open_writer(temp_path, columns)
+    written = 0
+    try:
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                writer.close()
+                os.remove(temp_path)
+                return None
+            writer.write(chunk)
+            written += len(chunk)
+            if progress_callback is not None:
+                progress_callback(written, total)
+        writer.close()
+    except BaseException:
+        with suppress(Exception):
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return written
+
+def frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Row tuples of a DataFrame, `chunk_rows` at a time."""
+    for start in range(0, len(df), chunk_rows):
+        yield list(df.iloc[start:start + chunk_rows].itertuples(index=False, name=None))
+
+def write_frame(df, path, progress_callback=None):
+    """Writes a DataFrame (without its index) with write_rows."""
+    return write_rows(path, list(df.columns), frame_chunks(df), len(df), progress_callback)